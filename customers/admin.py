@@ -1,12 +1,223 @@
 """
 Admin interface for Customer and Bill management.
 """
+from django.conf import settings
 from django.contrib import admin
-from django.utils.html import format_html
+from django.contrib.admin.options import csrf_protect_m
+from django.contrib.auth import get_permission_codename
+from django.db.models import QuerySet
+from django.utils.html import format_html, format_html_join
 from django.contrib import messages
-from django.http import HttpResponse
-from .models import Customer, Bill
-from .utils import generate_qr_code, send_customer_welcome_email, export_customers_to_excel
+from django.http import HttpResponse, StreamingHttpResponse
+from .middleware import EXHIBITION_SESSION_KEY
+from .archive import read_archived_record
+from .audit import audit_log
+from .badges import render_pages, stream_zip
+from .customer_index import customer_index
+from .fields import parse_hex_id
+from .forms import CustomerAdminForm
+from .models import Exhibition, Customer, Bill, ArchivedCustomer, AuditEvent
+from .purge import count_purge, purge_customers
+from .utils import generate_qr_code, queue_welcome_email, export_customers_to_excel
+
+
+class ExhibitionScopedAdminMixin:
+    """
+    Limit admin querysets to the exhibition the request is scoped to,
+    so changelists, searches and lookups only touch current-event rows.
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        exhibition = getattr(request, 'exhibition', None)
+        if exhibition is None:
+            return queryset
+        return queryset.filter(exhibition=exhibition)
+
+
+class CustomerIdSearchMixin:
+    """
+    Match a search term that looks like a Customer ID exactly against the
+    integer key (``customer_id_lookup``), instead of a text scan of the column.
+    """
+    customer_id_lookup = 'customer_id'
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        customer_id = parse_hex_id(search_term)
+        if customer_id:
+            results |= queryset.filter(**{self.customer_id_lookup: customer_id})
+        return results, may_have_duplicates
+
+
+class AuditedAdminMixin:
+    """Record saves and deletes (including inline ones) in the audit log."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        audit_log.record(
+            request.user.username,
+            AuditEvent.ACTION_UPDATE if change else AuditEvent.ACTION_CREATE,
+            obj,
+            changed=form.changed_data if change else []
+        )
+
+    def delete_model(self, request, obj):
+        audit_log.record(request.user.username, AuditEvent.ACTION_DELETE, obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        # One event for the whole selection; str() of every row would cost a query each
+        ids = [str(pk) for pk in queryset.values_list('pk', flat=True)]
+        audit_log.record(
+            request.user.username,
+            AuditEvent.ACTION_DELETE,
+            object_type=queryset.model._meta.model_name,
+            summary=f'{len(ids)} {queryset.model._meta.verbose_name_plural}',
+            ids=ids
+        )
+        super().delete_queryset(request, queryset)
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        for obj in formset.new_objects:
+            audit_log.record(request.user.username, AuditEvent.ACTION_CREATE, obj)
+        for obj, changed in formset.changed_objects:
+            audit_log.record(request.user.username, AuditEvent.ACTION_UPDATE, obj, changed=changed)
+        for obj in formset.deleted_objects:
+            audit_log.record(request.user.username, AuditEvent.ACTION_DELETE, obj)
+
+
+class PurgeAdminMixin:
+    """
+    Delete customers with customers.purge instead of Django's delete
+    collector: the confirmation page shows counts only, and bills are
+    deleted in short key-ordered chunks rather than loaded into memory,
+    each chunk in its own transaction (also from the single-object delete
+    page).
+    """
+
+    def get_deleted_objects(self, objs, request):
+        if isinstance(objs, QuerySet):
+            queryset = objs
+        else:
+            queryset = self.model.objects.filter(pk__in=[obj.pk for obj in objs])
+        customers, bills = count_purge(queryset)
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (Customer, Bill)
+            if not request.user.has_perm(
+                f'{model._meta.app_label}.{get_permission_codename("delete", model._meta)}'
+            )
+        }
+        model_count = {
+            Customer._meta.verbose_name_plural: customers,
+            Bill._meta.verbose_name_plural: bills,
+        }
+        summary = [f'{customers} customer(s) and their {bills} bill(s)']
+        return summary, model_count, perms_needed, []
+
+    @csrf_protect_m
+    def delete_view(self, request, object_id, extra_context=None):
+        # Django runs the delete view in one transaction, which would turn
+        # the purge's per-chunk transactions into savepoints of one long one.
+        return self._delete_view(request, object_id, extra_context)
+
+    def delete_model(self, request, obj):
+        for _ in purge_customers(self.model.objects.filter(pk=obj.pk)):
+            pass
+
+    def delete_queryset(self, request, queryset):
+        for _ in purge_customers(queryset):
+            pass
+
+
+def badge_zip_response(modeladmin, request, queryset, filename, command_hint):
+    """
+    Stream a ZIP of PDF badge sheets for a customer queryset.
+    Pages are rendered one at a time while the response is being sent, so
+    selections above BADGE_ADMIN_MAX_CUSTOMERS are refused with a pointer to
+    the generate_badges command, which renders in parallel.
+    """
+    limit = settings.BADGE_ADMIN_MAX_CUSTOMERS
+    badges = list(queryset.order_by('name', 'customer_id').values_list('customer_id', 'name')[:limit + 1])
+    if len(badges) > limit:
+        modeladmin.message_user(
+            request,
+            f'More than {limit} badges are too many to render here. '
+            f'Run "python manage.py generate_badges {command_hint} --output badges.zip" instead.',
+            messages.ERROR
+        )
+        return None
+    audit_log.record(
+        request.user.username,
+        AuditEvent.ACTION_EXPORT,
+        object_type='customer',
+        summary=f'{len(badges)} badge(s)',
+        export='badges'
+    )
+    response = StreamingHttpResponse(
+        stream_zip(render_pages(badges, fmt='pdf')),
+        content_type='application/zip'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin.register(Exhibition)
+class ExhibitionAdmin(admin.ModelAdmin):
+    """Admin interface for Exhibition model."""
+    list_display = ('name', 'slug', 'start_date', 'end_date', 'is_active', 'is_closed')
+    list_filter = ('is_active', 'is_closed')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('is_active', 'created_at')
+    actions = ['make_active', 'view_in_admin', 'reset_admin_view', 'print_badges']
+
+    def make_active(self, request, queryset):
+        """Make the selected exhibition the active one for everyone."""
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one exhibition to activate.', messages.ERROR)
+            return
+        exhibition = queryset.get()
+        exhibition.activate()
+        self.message_user(request, f'{exhibition.name} is now the active exhibition.', messages.SUCCESS)
+    make_active.short_description = "Make selected exhibition active"
+
+    def view_in_admin(self, request, queryset):
+        """Scope this admin session to the selected exhibition."""
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one exhibition to view.', messages.ERROR)
+            return
+        exhibition = queryset.get()
+        request.session[EXHIBITION_SESSION_KEY] = exhibition.pk
+        self.message_user(
+            request,
+            f'Customers and bills are now shown for {exhibition.name}.',
+            messages.SUCCESS
+        )
+    view_in_admin.short_description = "View customers and bills of selected exhibition"
+
+    def reset_admin_view(self, request, queryset):
+        """Return this admin session to the active exhibition."""
+        request.session.pop(EXHIBITION_SESSION_KEY, None)
+        self.message_user(request, 'Showing the active exhibition again.', messages.SUCCESS)
+    reset_admin_view.short_description = "Return to the active exhibition"
+
+    def print_badges(self, request, queryset):
+        """Download badge sheets for every customer of the selected exhibition."""
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one exhibition to print badges for.', messages.ERROR)
+            return
+        exhibition = queryset.get()
+        return badge_zip_response(
+            self,
+            request,
+            Customer.objects.filter(exhibition=exhibition),
+            f'badges_{exhibition.slug}.zip',
+            f'--exhibition {exhibition.slug}'
+        )
+    print_badges.short_description = "Print badges for all customers of selected exhibition"
 
 
 class BillInline(admin.TabularInline):
@@ -19,7 +230,8 @@ class BillInline(admin.TabularInline):
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(AuditedAdminMixin, PurgeAdminMixin, CustomerIdSearchMixin, ExhibitionScopedAdminMixin,
+                    admin.ModelAdmin):
     """
     Admin interface for Customer model.
     Handles Flow 1: Creating customers, generating IDs, QR codes, and sending emails.
@@ -35,8 +247,8 @@ class CustomerAdmin(admin.ModelAdmin):
         'created_at'
     )
     
-    list_filter = ('email_sent', 'created_at')
-    search_fields = ('customer_id', 'name', 'email', 'phone')
+    list_filter = ('email_sent', 'receipts_opt_in', 'created_at')
+    search_fields = ('name', 'email', 'phone')  # Customer IDs: see CustomerIdSearchMixin
     readonly_fields = (
         'customer_id', 
         'created_at', 
@@ -51,7 +263,7 @@ class CustomerAdmin(admin.ModelAdmin):
             'fields': ('customer_id', 'name', 'email', 'phone')
         }),
         ('Email Status', {
-            'fields': ('email_sent',),
+            'fields': ('email_sent', 'receipts_opt_in'),
             'description': 'QR code is automatically generated and sent via email (not saved to database)'
         }),
         ('Billing Summary', {
@@ -63,8 +275,24 @@ class CustomerAdmin(admin.ModelAdmin):
         }),
     )
     
+    form = CustomerAdminForm
     inlines = [BillInline]
-    actions = ['export_to_excel']
+    actions = ['export_to_excel', 'print_badges']
+
+    def get_fieldsets(self, request, obj=None):
+        """Offer the duplicate override only when registering a new customer."""
+        fieldsets = super().get_fieldsets(request, obj)
+        if obj is not None:
+            return fieldsets
+        (title, options), *rest = fieldsets
+        options = dict(options, fields=options['fields'] + ('register_duplicate',))
+        return ((title, options), *rest)
+
+    def get_form(self, request, obj=None, **kwargs):
+        """Let the form check duplicates within the exhibition being viewed."""
+        form = super().get_form(request, obj, **kwargs)
+        form.exhibition = request.exhibition
+        return form
 
     def export_to_excel(self, request, queryset):
         """
@@ -79,6 +307,14 @@ class CustomerAdmin(admin.ModelAdmin):
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
         response['Content-Disposition'] = 'attachment; filename="customers_export.xlsx"'
+
+        audit_log.record(
+            request.user.username,
+            AuditEvent.ACTION_EXPORT,
+            object_type='customer',
+            summary='Excel export',
+            customer_ids=list(queryset.values_list('customer_id', flat=True))
+        )
         
         # Show success message
         self.message_user(
@@ -91,31 +327,27 @@ class CustomerAdmin(admin.ModelAdmin):
     
     export_to_excel.short_description = "Export selected customers to Excel"
 
+    def print_badges(self, request, queryset):
+        """Download badge sheets for the selected customers."""
+        return badge_zip_response(self, request, queryset, 'badges.zip', '--ids <Customer IDs>')
+    print_badges.short_description = "Print badges for selected customers"
+
     def save_model(self, request, obj, form, change):
         """
         Override save to send email with QR code for new customers.
         QR code is generated on-the-fly and not saved to database.
         """
         is_new = obj.pk is None
+        if is_new and not obj.exhibition_id:
+            obj.exhibition_id = request.exhibition.pk
         
         # Save the object first to get the customer_id
         super().save_model(request, obj, form, change)
         
         if is_new:
             # Send welcome email in background to avoid timeout
-            import threading
-            
-            def send_email_background():
-                email_sent = send_customer_welcome_email(obj)
-                if email_sent:
-                    obj.email_sent = True
-                    obj.save(update_fields=['email_sent'])
-            
-            # Start email sending in background thread
-            email_thread = threading.Thread(target=send_email_background)
-            email_thread.daemon = True
-            email_thread.start()
-            
+            queue_welcome_email(obj)
+
             messages.success(
                 request,
                 f'Customer {obj.name} created successfully with ID: {obj.customer_id}. '
@@ -135,18 +367,19 @@ class CustomerAdmin(admin.ModelAdmin):
 
     def bill_count(self, obj):
         """Display number of bills for the customer."""
-        return obj.get_bill_count()
+        return obj.bill_count
     bill_count.short_description = 'Number of Bills'
+    bill_count.admin_order_field = 'bill_count'
 
     def total_amount(self, obj):
         """Display total billing amount for the customer."""
-        total = obj.get_total_bills()
-        return f'${total:,.2f}'
+        return f'${obj.bill_total:,.2f}'
     total_amount.short_description = 'Total Billing'
+    total_amount.admin_order_field = 'bill_total'
 
 
 @admin.register(Bill)
-class BillAdmin(admin.ModelAdmin):
+class BillAdmin(AuditedAdminMixin, CustomerIdSearchMixin, ExhibitionScopedAdminMixin, admin.ModelAdmin):
     """
     Admin interface for Bill model.
     Handles Flow 2: Entering customer ID, fetching info, and adding bills.
@@ -162,8 +395,8 @@ class BillAdmin(admin.ModelAdmin):
     )
     
     list_filter = ('created_at',)
+    customer_id_lookup = 'customer'
     search_fields = (
-        'customer__customer_id',
         'customer__name',
         'customer__email',
         'description'
@@ -201,6 +434,12 @@ class BillAdmin(admin.ModelAdmin):
             )
         return form
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Only offer customers of the exhibition being viewed."""
+        if db_field.name == 'customer':
+            kwargs['queryset'] = Customer.objects.filter(exhibition=request.exhibition)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def save_model(self, request, obj, form, change):
         """Save bill and record who created it."""
         if not change:  # New bill
@@ -216,7 +455,7 @@ class BillAdmin(admin.ModelAdmin):
 
     def customer_id_display(self, obj):
         """Display customer ID."""
-        return obj.customer.customer_id
+        return obj.customer_id
     customer_id_display.short_description = 'Customer ID'
 
     def customer_name(self, obj):
@@ -230,9 +469,11 @@ class BillAdmin(admin.ModelAdmin):
     customer_email.short_description = 'Customer Email'
 
     def customer_info_display(self, obj):
-        """Display detailed customer information."""
-        if obj.customer:
-            customer = obj.customer
+        """Display detailed customer information (from the shared customer index)."""
+        if obj.customer_id:
+            customer = customer_index.get(obj.customer_id)
+            if customer is None:
+                return "Customer not found"
             return format_html(
                 '<div style="background-color: #f0f0f0; padding: 15px; '
                 'border-radius: 5px; margin: 10px 0;">'
@@ -248,13 +489,95 @@ class BillAdmin(admin.ModelAdmin):
                 customer.name,
                 customer.email,
                 customer.phone,
-                customer.get_bill_count(),
-                customer.get_total_bills()
+                customer.bill_count,
+                customer.bill_total
             )
         return "No customer selected"
     customer_info_display.short_description = 'Customer Information'
 
 
+@admin.register(ArchivedCustomer)
+class ArchivedCustomerAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for customers moved to cold storage by archive_data.
+    Look up archived customers by their Customer ID.
+    """
+    list_display = (
+        'customer_id',
+        'name',
+        'email',
+        'exhibition_name',
+        'bill_count',
+        'bill_total',
+        'archived_at'
+    )
+    search_fields = ('=customer_id', 'name', 'email')
+    list_filter = ('exhibition_name',)
+    readonly_fields = ('archived_bills',)
+
+    fieldsets = (
+        ('Customer Information', {
+            'fields': ('customer_id', 'name', 'email', 'phone', 'exhibition_name', 'registered_at')
+        }),
+        ('Billing Summary', {
+            'fields': ('bill_count', 'bill_total', 'archived_bills')
+        }),
+        ('Archive', {
+            'fields': ('archive_file', 'archive_line', 'archived_at'),
+            'classes': ('collapse',)
+        }),
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def archived_bills(self, obj):
+        """Display the bills stored in the archive file."""
+        try:
+            record = read_archived_record(obj)
+        except OSError:
+            return 'Archive file is not available'
+        if not record or not record['bills']:
+            return 'No bills'
+        return format_html(
+            '<table><tr><th>Date</th><th>Amount</th><th>Description</th><th>Created By</th></tr>{}</table>',
+            format_html_join(
+                '',
+                '<tr><td>{}</td><td>${}</td><td>{}</td><td>{}</td></tr>',
+                (
+                    (bill['created_at'], bill['amount'], bill['description'] or '', bill['created_by'] or '')
+                    for bill in record['bills']
+                )
+            )
+        )
+    archived_bills.short_description = 'Archived Bills'
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    """Read-only admin for the audit log."""
+    list_display = ('created_at', 'actor', 'action', 'object_type', 'object_id', 'summary')
+    list_filter = ('action', 'object_type')
+    search_fields = ('=actor', '=object_id', 'summary')
+    date_hierarchy = 'created_at'
+    show_full_result_count = False  # Avoid a full COUNT(*) on a large, growing table
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Customize admin site
 admin.site.site_header = "Exhibition Customer Management System"
 admin.site.site_title = "Exhibition Admin"
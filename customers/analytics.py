@@ -0,0 +1,309 @@
+"""
+Billing analytics for post-event reports.
+
+``load_columns`` streams four bill columns (customer, amount in cents,
+creation time, created_by) from a server-side cursor into NumPy arrays, and
+every report is then computed with vectorized group-bys over those arrays
+(``numpy.unique`` + ``numpy.bincount``) instead of one aggregate query per
+customer. ``get_columns`` keeps the loaded snapshot per process and reuses it
+until the bills change (checked with one count/max query).
+
+NumPy is an optional dependency used only here; it is imported lazily.
+"""
+import importlib.util
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .fields import int_to_hex
+from .lazy import numpy as np
+from .models import Bill, Customer
+
+
+# Rows fetched from the server-side cursor at a time
+CHUNK_SIZE = 50000
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+HISTOGRAM_BINS = 20
+TOP_SPENDERS = 20
+
+# Amounts as integer cents and times as Unix seconds, computed by the database
+_COLUMNS_SQL = {
+    'postgresql': (
+        'SELECT customer_id, CAST(ROUND(amount * 100) AS BIGINT), '
+        'CAST(EXTRACT(EPOCH FROM created_at) AS BIGINT), created_by FROM {table}'
+    ),
+    'sqlite': (
+        'SELECT customer_id, CAST(ROUND(amount * 100) AS INTEGER), '
+        "CAST(strftime('%%s', created_at) AS INTEGER), created_by FROM {table}"
+    ),
+}
+
+
+def numpy_available():
+    """Whether the optional NumPy dependency is installed."""
+    return importlib.util.find_spec('numpy') is not None
+
+
+@dataclass(frozen=True)
+class BillColumns:
+    """Bill columns as parallel arrays, one element per bill."""
+    customer_ids: object    # int64, the stored (integer) Customer ID
+    cents: object           # int64
+    timestamps: object      # int64, Unix seconds
+    creators: object        # int32 codes into creator_labels
+    creator_labels: tuple
+    loaded_at: datetime
+
+    def __len__(self):
+        return len(self.cents)
+
+
+def load_columns(exhibition_id=None, chunk_size=CHUNK_SIZE):
+    """Load the bills (of one exhibition, or all) in one streamed query."""
+    sql = _COLUMNS_SQL.get(connection.vendor, _COLUMNS_SQL['sqlite']).format(
+        table=connection.ops.quote_name(Bill._meta.db_table)
+    )
+    params = []
+    if exhibition_id is not None:
+        sql += ' WHERE exhibition_id = %s'
+        params.append(exhibition_id)
+
+    loaded_at = timezone.now()
+    labels = {}
+    customer_parts, cent_parts, time_parts, creator_parts = [], [], [], []
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            customer_ids, cents, timestamps, creators = zip(*rows)
+            customer_parts.append(np.array(customer_ids, dtype=np.int64))
+            cent_parts.append(np.array(cents, dtype=np.int64))
+            time_parts.append(np.array(timestamps, dtype=np.int64))
+            creator_parts.append(np.fromiter(
+                (labels.setdefault(creator or '', len(labels)) for creator in creators),
+                dtype=np.int32,
+                count=len(rows)
+            ))
+
+    def concatenate(parts, dtype):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    return BillColumns(
+        customer_ids=concatenate(customer_parts, np.int64),
+        cents=concatenate(cent_parts, np.int64),
+        timestamps=concatenate(time_parts, np.int64),
+        creators=concatenate(creator_parts, np.int32),
+        creator_labels=tuple(labels),
+        loaded_at=loaded_at,
+    )
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_columns(exhibition_id=None, refresh=False):
+    """
+    Return the cached column snapshot, reloading it when bills were added,
+    changed or deleted since it was loaded (or when ``refresh`` is set).
+    """
+    bills = Bill.objects.all() if exhibition_id is None else Bill.objects.filter(exhibition_id=exhibition_id)
+    fingerprint = tuple(bills.aggregate(count=Count('pk'), seq=Max('change_seq')).values())
+    with _snapshots_lock:
+        cached = _snapshots.get(exhibition_id)
+        if cached is not None and cached[0] == fingerprint and not refresh:
+            return cached[1]
+    columns = load_columns(exhibition_id)
+    with _snapshots_lock:
+        _snapshots[exhibition_id] = (fingerprint, columns)
+    return columns
+
+
+def _money(cents):
+    return f'{int(round(cents)) / 100:.2f}'
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+class _Groups:
+    """Bills grouped by customer and by hour, shared by the reports."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.customers, self.customer_index = np.unique(columns.customer_ids, return_inverse=True)
+        self.customer_bills = np.bincount(self.customer_index, minlength=len(self.customers))
+        self.customer_spend = np.bincount(
+            self.customer_index, weights=columns.cents, minlength=len(self.customers)
+        ).round().astype(np.int64)
+
+        # Hours are bucketed on Unix time; each distinct hour is converted to
+        # local time once, which also gives every bill its local day.
+        self.hours, self.hour_index = np.unique(columns.timestamps // 3600, return_inverse=True)
+        tz = timezone.get_current_timezone()
+        self.hour_starts = [datetime.fromtimestamp(int(hour) * 3600, tz=tz) for hour in self.hours]
+        hour_days = np.array([start.date().toordinal() for start in self.hour_starts], dtype=np.int64)
+        self.days = hour_days[self.hour_index] if len(hour_days) else np.zeros(0, dtype=np.int64)
+
+
+def summary(groups):
+    columns = groups.columns
+    bills, customers = len(columns), len(groups.customers)
+    revenue = int(columns.cents.sum())
+    return {
+        'bills': bills,
+        'customers': customers,
+        'revenue': _money(revenue),
+        'average_bill': _money(revenue / bills) if bills else _money(0),
+        'average_spend': _money(revenue / customers) if customers else _money(0),
+    }
+
+
+def amount_percentiles(groups, percentiles=PERCENTILES):
+    """Percentiles of single bill amounts."""
+    if not len(groups.columns):
+        return {}
+    values = np.percentile(groups.columns.cents, percentiles)
+    return {f'p{p}': _money(value) for p, value in zip(percentiles, values)}
+
+
+def spend_histogram(groups, bins=HISTOGRAM_BINS):
+    """How many customers spent how much in total, in equal-width bins."""
+    if not len(groups.customers):
+        return []
+    counts, edges = np.histogram(groups.customer_spend, bins=bins)
+    return [
+        {'range': f'{_money(low)}-{_money(high)}', 'customers': int(count)}
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    ]
+
+
+def hourly_cohorts(groups):
+    """
+    Per hour: bills, revenue, distinct customers, and the cohort of
+    customers whose first bill fell in that hour.
+    """
+    hour_count = len(groups.hours)
+    if not hour_count:
+        return []
+    hour_index, customer_index = groups.hour_index, groups.customer_index
+    bills = np.bincount(hour_index, minlength=hour_count)
+    revenue = np.bincount(hour_index, weights=groups.columns.cents, minlength=hour_count)
+    pairs = np.unique(hour_index.astype(np.int64) * len(groups.customers) + customer_index)
+    customers = np.bincount(pairs // len(groups.customers), minlength=hour_count)
+
+    first_hour = np.full(len(groups.customers), hour_count, dtype=np.int64)
+    np.minimum.at(first_hour, customer_index, hour_index)
+    new_customers = np.bincount(first_hour, minlength=hour_count)
+    cohort_spend = np.bincount(first_hour, weights=groups.customer_spend, minlength=hour_count)
+
+    return [
+        {
+            'hour': groups.hour_starts[i].isoformat(),
+            'bills': int(bills[i]),
+            'revenue': _money(revenue[i]),
+            'customers': int(customers[i]),
+            'new_customers': int(new_customers[i]),
+            'cohort_spend': _money(cohort_spend[i]),
+        }
+        for i in range(hour_count)
+    ]
+
+
+def top_spenders(groups, limit=TOP_SPENDERS):
+    """The customers with the highest total spend."""
+    count = min(limit, len(groups.customers))
+    if not count:
+        return []
+    spend = groups.customer_spend
+    top = np.argpartition(-spend, count - 1)[:count]
+    top = top[np.lexsort((groups.customers[top], -spend[top]))]
+    customer_ids = [int_to_hex(int(customer)) for customer in groups.customers[top]]
+    names = dict(Customer.objects.filter(pk__in=customer_ids).values_list('customer_id', 'name'))
+    return [
+        {
+            'customer_id': customer_id,
+            'name': names.get(customer_id, ''),
+            'bills': int(groups.customer_bills[i]),
+            'spend': _money(spend[i]),
+        }
+        for customer_id, i in zip(customer_ids, top)
+    ]
+
+
+def repeat_visits(groups):
+    """
+    Share of customers with more than one bill, and with bills on more
+    than one (local) day of the event.
+    """
+    customer_count = len(groups.customers)
+    if not customer_count:
+        return {'repeat_buyers': 0, 'repeat_buyer_rate': 0.0, 'repeat_visitors': 0, 'repeat_visit_rate': 0.0}
+    days = groups.days - groups.days.min()
+    visits = np.unique(groups.customer_index.astype(np.int64) * (int(days.max()) + 1) + days)
+    visit_days = np.bincount(visits // (int(days.max()) + 1), minlength=customer_count)
+    repeat_buyers = int((groups.customer_bills > 1).sum())
+    repeat_visitors = int((visit_days > 1).sum())
+    return {
+        'repeat_buyers': repeat_buyers,
+        'repeat_buyer_rate': _rate(repeat_buyers, customer_count),
+        'repeat_visitors': repeat_visitors,
+        'repeat_visit_rate': _rate(repeat_visitors, customer_count),
+    }
+
+
+def by_creator(groups):
+    """Bills and revenue per staff member or vendor that entered them."""
+    columns = groups.columns
+    label_count = len(columns.creator_labels)
+    if not label_count:
+        return []
+    bills = np.bincount(columns.creators, minlength=label_count)
+    revenue = np.bincount(columns.creators, weights=columns.cents, minlength=label_count)
+    order = np.argsort(-revenue, kind='stable')
+    return [
+        {'created_by': columns.creator_labels[i], 'bills': int(bills[i]), 'revenue': _money(revenue[i])}
+        for i in order
+    ]
+
+
+def build_report(columns):
+    """All reports over ``columns``, as a JSON-serializable dict."""
+    started = time.perf_counter()
+    groups = _Groups(columns)
+    report = {
+        'summary': summary(groups),
+        'amount_percentiles': amount_percentiles(groups),
+        'spend_histogram': spend_histogram(groups),
+        'hourly_cohorts': hourly_cohorts(groups),
+        'top_spenders': top_spenders(groups),
+        'repeat_visits': repeat_visits(groups),
+        'by_creator': by_creator(groups),
+    }
+    report['summary']['snapshot_loaded_at'] = columns.loaded_at.isoformat()
+    report['summary']['compute_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
+
+
+def report_rows(report):
+    """
+    Flatten a report to (section, key, metric, value) rows for CSV export.
+    Sections that are lists are keyed by the first field of each entry.
+    """
+    for section, value in report.items():
+        if isinstance(value, dict):
+            for metric, metric_value in value.items():
+                yield section, '', metric, metric_value
+            continue
+        for entry in value:
+            (_, key), *metrics = entry.items()
+            for metric, metric_value in metrics:
+                yield section, key, metric, metric_value
@@ -6,3 +6,5 @@ class CustomersConfig(AppConfig):
     name = 'customers'
     verbose_name = 'Customer Management'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,167 @@
+"""
+Cold archival of customers and bills.
+
+Customers (with their bills) are written to gzip-compressed JSONL files under
+``settings.ARCHIVE_ROOT``, one customer per line, and indexed in the
+ArchivedCustomer table. The live rows are then deleted in bounded chunks so
+no single transaction holds locks on the bill table for long.
+"""
+import gzip
+import io
+import json
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .changefeed import record_tombstones
+from .models import ArchivedCustomer, Bill, Customer, PendingReceipt, Tombstone
+from .statements import invalidate_statements
+
+
+def archive_path(filename):
+    """Absolute path of an archive file."""
+    return os.path.join(settings.ARCHIVE_ROOT, filename)
+
+
+def _serialize_customer(customer, bills):
+    return {
+        'customer_id': customer.customer_id,
+        'name': customer.name,
+        'email': customer.email,
+        'phone': customer.phone,
+        'exhibition': customer.exhibition.slug,
+        'email_sent': customer.email_sent,
+        'created_at': customer.created_at.isoformat(),
+        'updated_at': customer.updated_at.isoformat(),
+        'bills': [
+            {
+                'amount': str(bill.amount),
+                'description': bill.description,
+                'created_at': bill.created_at.isoformat(),
+                'created_by': bill.created_by,
+            }
+            for bill in bills
+        ],
+    }
+
+
+class ArchiveWriter:
+    """Append customer records to one gzip-compressed JSONL archive file."""
+
+    def __init__(self, filename):
+        os.makedirs(settings.ARCHIVE_ROOT, exist_ok=True)
+        self.filename = filename
+        self.line = 0
+        self._raw = open(archive_path(filename), 'xb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._file = io.TextIOWrapper(self._gzip, encoding='utf-8')
+
+    def write(self, record):
+        """Write one record and return its line number."""
+        self._file.write(json.dumps(record, separators=(',', ':')))
+        self._file.write('\n')
+        self.line += 1
+        return self.line
+
+    def sync(self):
+        """
+        Flush everything written so far to disk.
+        Called before deleting the live rows, so archived data is durable
+        before it disappears from the database.
+        """
+        self._file.flush()
+        self._gzip.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def close(self):
+        self._file.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def archive_customers(queryset, writer, chunk_size=500):
+    """
+    Archive every customer in ``queryset`` and delete it from the live tables.
+    Works through the customers in primary key order, ``chunk_size`` at a
+    time, each chunk in its own short transaction. Yields the number of
+    customers archived per chunk.
+    """
+    while True:
+        with transaction.atomic():
+            customers = list(
+                queryset.select_related('exhibition')
+                .select_for_update(of=('self',))
+                .order_by('pk')[:chunk_size]
+            )
+            if not customers:
+                return
+
+            customer_pks = [customer.pk for customer in customers]
+            bills_by_customer = {}
+            for bill in Bill.objects.filter(customer__in=customer_pks).order_by('created_at'):
+                bills_by_customer.setdefault(bill.customer_id, []).append(bill)
+
+            index_rows = []
+            for customer in customers:
+                bills = bills_by_customer.get(customer.pk, [])
+                line = writer.write(_serialize_customer(customer, bills))
+                index_rows.append(
+                    ArchivedCustomer(
+                        customer_id=customer.customer_id,
+                        name=customer.name,
+                        email=customer.email,
+                        phone=customer.phone,
+                        exhibition_name=customer.exhibition.name,
+                        bill_count=len(bills),
+                        bill_total=sum((bill.amount for bill in bills), Decimal('0')),
+                        registered_at=customer.created_at,
+                        archive_file=writer.filename,
+                        archive_line=line,
+                    )
+                )
+            writer.sync()
+
+            ArchivedCustomer.objects.bulk_create(index_rows)
+            record_tombstones(
+                [
+                    ('bill', bill.pk, bill.exhibition_id)
+                    for bills in bills_by_customer.values() for bill in bills
+                ] + [
+                    ('customer', customer.customer_id, customer.exhibition_id)
+                    for customer in customers
+                ],
+                reason=Tombstone.REASON_ARCHIVED
+            )
+            # Raw deletes skip the delete collector, which would otherwise load
+            # every bill into memory; bills go first so no cascade is needed.
+            Bill.objects.filter(customer__in=customer_pks)._raw_delete(Bill.objects.db)
+            PendingReceipt.objects.filter(customer__in=customer_pks).delete()
+            Customer.objects.filter(pk__in=customer_pks)._raw_delete(Customer.objects.db)
+            invalidate_statements(customer_pks)
+
+        yield len(customers)
+
+
+def archive_filename(label):
+    """Build a unique archive filename for one archiving run."""
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    return f'{label}-{stamp}.jsonl.gz'
+
+
+def read_archived_record(archived_customer):
+    """Load the full archived record (including bills) for an index row."""
+    path = archive_path(archived_customer.archive_file)
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line_number, line in enumerate(archive, 1):
+            if line_number == archived_customer.archive_line:
+                return json.loads(line)
+    return None
@@ -0,0 +1,157 @@
+"""
+Batched asynchronous audit log.
+
+Admin actions record events into a bounded in-process queue; a background
+thread writes them with ``bulk_create`` either every
+``AUDIT_LOG_FLUSH_INTERVAL`` seconds or as soon as ``AUDIT_LOG_BATCH_SIZE``
+events are waiting. Recording an event never touches the database, so the
+admin hot path does not pay for auditing. A batch that cannot be written
+is kept and written first on the next attempt. If the queue is full
+(database down for a long time) new events are dropped and counted rather
+than blocking requests.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from .models import AuditEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """In-process queue of audit events with a background batch writer."""
+
+    def __init__(self):
+        self._queue = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._retry = []    # Batch whose write failed, retried first
+        self.dropped = 0
+
+    def _ensure_queue(self):
+        # A forked worker inherits the master's queue object but not its
+        # thread, so everything is (re)created per process.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=settings.AUDIT_LOG_QUEUE_SIZE)
+                    self._thread = None
+                    self._stopping.clear()
+                    self._retry = []
+                    self.dropped = 0
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _ensure_thread(self):
+        if not settings.AUDIT_LOG_BACKGROUND:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(
+                        target=self._run,
+                        name='audit-log-writer',
+                        daemon=True
+                    )
+                    self._thread.start()
+
+    def record(self, actor, action, obj=None, object_type='', object_id='', summary='', **details):
+        """
+        Queue an audit event. ``obj`` is a model instance; its type, primary
+        key and string form are recorded unless given explicitly.
+        """
+        if obj is not None:
+            object_type = object_type or obj._meta.model_name
+            object_id = object_id or str(obj.pk)
+            summary = summary or str(obj)
+        event = AuditEvent(
+            actor=str(actor)[:150],
+            action=action,
+            object_type=object_type,
+            object_id=str(object_id)[:64],
+            summary=str(summary)[:255],
+            details=details,
+            created_at=timezone.now(),
+        )
+
+        events = self._ensure_queue()
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if events.qsize() >= settings.AUDIT_LOG_BATCH_SIZE:
+            if settings.AUDIT_LOG_BACKGROUND:
+                self._wakeup.set()
+            else:
+                self.flush()
+        self._ensure_thread()
+
+    def flush(self):
+        """Write every queued event. Returns the number of events written."""
+        events = self._ensure_queue()
+        batch_size = settings.AUDIT_LOG_BATCH_SIZE
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch, self._retry = self._retry, []
+                while len(batch) < batch_size:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    AuditEvent.objects.bulk_create(batch)
+                except DatabaseError:
+                    self._retry = batch
+                    raise
+                written += len(batch)
+
+    def _run(self):
+        interval = settings.AUDIT_LOG_FLUSH_INTERVAL
+        while not self._stopping.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except DatabaseError:
+                logger.exception('Could not write audit events; will retry')
+            finally:
+                # This thread's connection would otherwise stay open forever.
+                connections.close_all()
+
+    def stop(self, timeout=5):
+        """Stop the writer thread and write whatever is still queued."""
+        if self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except DatabaseError:
+            lost = len(self._retry) + self._queue.qsize()
+            logger.exception(f'Could not write audit events on shutdown; {lost} event(s) lost')
+        if self.dropped:
+            logger.warning(f'{self.dropped} audit event(s) were dropped because the queue was full')
+
+
+audit_log = AuditLog()
+
+atexit.register(audit_log.stop)
@@ -0,0 +1,152 @@
+"""
+Printable badge sheets.
+
+Each sheet is an A4 page with a grid of badges (QR code, name and Customer
+ID), rendered as PNG or PDF with Pillow. Pages are independent, so large runs
+are spread across a process pool, and the result is streamed out as a ZIP
+archive while later pages are still rendering.
+"""
+import zipfile
+from io import BytesIO
+
+from .lazy import qrcode
+
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+PAGE_MARGIN = 60
+DPI = 150
+
+FORMATS = ('pdf', 'png')
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:  # Pillow without sized default fonts
+            return ImageFont.load_default()
+
+
+def _fit_text(draw, text, font, width):
+    """Shorten ``text`` with an ellipsis until it fits ``width`` pixels."""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def render_page(badges, fmt='pdf', columns=3, rows=4):
+    """
+    Render one sheet of badges.
+    ``badges`` is a sequence of (customer_id, name) pairs, at most
+    ``columns * rows`` of them. Returns the page as PDF or PNG bytes.
+    """
+    from PIL import Image, ImageDraw
+
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    cell_width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // columns
+    cell_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // rows
+    name_font = _font(max(cell_height // 14, 12))
+    id_font = _font(max(cell_height // 11, 14))
+    qr_size = min(cell_width, cell_height) * 2 // 3
+
+    for index, (customer_id, name) in enumerate(badges):
+        left = PAGE_MARGIN + (index % columns) * cell_width
+        top = PAGE_MARGIN + (index // columns) * cell_height
+        draw.rectangle(
+            (left + 4, top + 4, left + cell_width - 4, top + cell_height - 4),
+            outline=180
+        )
+
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=1, border=2)
+        qr.add_data(customer_id)
+        qr.make(fit=True)
+        qr_image = qr.make_image(fill_color='black', back_color='white').get_image().convert('L')
+        qr_image = qr_image.resize((qr_size, qr_size), Image.NEAREST)
+        page.paste(qr_image, (left + (cell_width - qr_size) // 2, top + 16))
+
+        text_width = cell_width - 24
+        name = _fit_text(draw, name, name_font, text_width)
+        y = top + 24 + qr_size
+        draw.text((left + cell_width // 2, y), name, font=name_font, fill=0, anchor='mt')
+        y += name_font.size + 10
+        draw.text((left + cell_width // 2, y), customer_id, font=id_font, fill=0, anchor='mt')
+
+    buffer = BytesIO()
+    if fmt == 'pdf':
+        page.save(buffer, format='PDF', resolution=DPI)
+    else:
+        page.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def _render_page_task(args):
+    return render_page(*args)
+
+
+def paginate(badges, per_page):
+    """Split an iterable of (customer_id, name) pairs into pages."""
+    page = []
+    for badge in badges:
+        page.append(badge)
+        if len(page) == per_page:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def render_pages(badges, fmt='pdf', columns=3, rows=4, workers=None):
+    """
+    Yield rendered pages in order.
+    With ``workers`` > 1 pages are rendered in a process pool; otherwise they
+    are rendered lazily in this process, one page per iteration.
+    """
+    tasks = ((page, fmt, columns, rows) for page in paginate(badges, columns * rows))
+    if not workers or workers <= 1:
+        for task in tasks:
+            yield _render_page_task(task)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_page_task, tasks, chunksize=4)
+
+
+class _ZipStream:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(pages, fmt='pdf', prefix='badges'):
+    """
+    Yield a ZIP archive of rendered pages chunk by chunk.
+    Pages are stored uncompressed (PNG and PDF are already compressed).
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for number, page in enumerate(pages, 1):
+            archive.writestr(f'{prefix}-{number:04d}.{fmt}', page)
+            yield stream.drain()
+    yield stream.drain()
@@ -0,0 +1,231 @@
+"""
+Streaming import of bills from POS CSV exports.
+
+The file is read row by row and inserted in batches: customer IDs are
+checked against one in-memory set of the exhibition's IDs (the Customer ID
+is the primary key bills reference) loaded with a single query,
+duplicate lines (within the file or from an earlier import) are detected by
+a content hash, rows go in with ``bulk_create`` (or ``COPY`` on PostgreSQL),
+and customer aggregates (and pending receipts) are refreshed once per
+batch.
+"""
+import csv
+import hashlib
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fields import hex_to_int
+from .models import Bill, Customer
+from .receipts import record_pending_receipts
+from .sequences import next_change_seqs
+from .statements import invalidate_statements
+
+
+REQUIRED_COLUMNS = ('customer_id', 'amount')
+OPTIONAL_COLUMNS = ('description', 'created_at', 'created_by')
+
+# The smallest amount that no longer fits Bill.amount
+_AMOUNT_FIELD = Bill._meta.get_field('amount')
+AMOUNT_LIMIT = Decimal(10) ** (_AMOUNT_FIELD.max_digits - _AMOUNT_FIELD.decimal_places)
+
+
+class ImportFormatError(Exception):
+    """The CSV file cannot be imported."""
+
+
+@dataclass
+class ImportResult:
+    """Counters reported at the end of an import."""
+    imported: int = 0
+    duplicates: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rejected(self):
+        return len(self.errors)
+
+
+def line_hash(customer_id, amount, description, created_at, created_by):
+    """
+    Content hash identifying one POS line. ``created_at`` is None for lines
+    without a sale time, so the import time given to their bills does not
+    make the same line hash differently on every import.
+    """
+    content = '\x1f'.join([
+        customer_id,
+        str(amount),
+        description or '',
+        created_at.isoformat() if created_at is not None else '',
+        created_by or '',
+    ])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _parse_amount(value):
+    amount = Decimal(value.strip().replace(',', '').lstrip('$'))
+    if not amount.is_finite() or not 0 < amount < AMOUNT_LIMIT or amount.as_tuple().exponent < -2:
+        raise InvalidOperation
+    return amount.quantize(Decimal('0.01'))
+
+
+def _parse_created_at(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed = datetime.strptime(value, '%Y-%m-%d')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class BillImporter:
+    """Import bills for one exhibition from a CSV stream."""
+
+    def __init__(self, exhibition, created_by, batch_size=1000, use_copy=None, dry_run=False):
+        self.exhibition = exhibition
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.imported_at = timezone.now()
+        self.result = ImportResult()
+        self._seen_hashes = set()
+        self._customer_ids = None
+
+    def load_customer_map(self):
+        """Load every Customer ID of the exhibition with one query."""
+        self._customer_ids = set(
+            Customer.objects.filter(exhibition=self.exhibition)
+            .values_list('customer_id', flat=True)
+            .iterator(chunk_size=10000)
+        )
+        return len(self._customer_ids)
+
+    def run(self, stream, progress=None):
+        """Import every row of ``stream`` (a text file object)."""
+        reader = csv.DictReader(stream)
+        columns = [name.strip().lower() for name in (reader.fieldnames or [])]
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ImportFormatError(f'Missing column(s): {", ".join(missing)}')
+        reader.fieldnames = columns
+
+        if self._customer_ids is None:
+            self.load_customer_map()
+
+        batch = []
+        for line_number, row in enumerate(reader, 2):
+            bill = self._build_bill(line_number, row)
+            if bill is None:
+                continue
+            batch.append(bill)
+            if len(batch) >= self.batch_size:
+                self._insert(batch)
+                batch = []
+                if progress:
+                    progress(self.result)
+        if batch:
+            self._insert(batch)
+            if progress:
+                progress(self.result)
+        return self.result
+
+    def _build_bill(self, line_number, row):
+        customer_id = (row.get('customer_id') or '').strip().upper()
+        if customer_id not in self._customer_ids:
+            self.result.errors.append((line_number, f'Unknown customer ID "{customer_id}"'))
+            return None
+        try:
+            amount = _parse_amount(row.get('amount') or '')
+        except (InvalidOperation, ValueError):
+            self.result.errors.append((line_number, f'Invalid amount "{row.get("amount")}"'))
+            return None
+        try:
+            created_at = _parse_created_at(row.get('created_at'))
+        except ValueError:
+            self.result.errors.append((line_number, f'Invalid date "{row.get("created_at")}"'))
+            return None
+
+        description = (row.get('description') or '').strip() or None
+        created_by = (row.get('created_by') or '').strip() or self.created_by
+        digest = line_hash(customer_id, amount, description, created_at, created_by)
+        if digest in self._seen_hashes:
+            self.result.duplicates += 1
+            return None
+        self._seen_hashes.add(digest)
+
+        return Bill(
+            customer_id=customer_id,
+            exhibition_id=self.exhibition.pk,
+            amount=amount,
+            description=description,
+            created_at=created_at or self.imported_at,
+            created_by=created_by,
+            import_hash=digest,
+        )
+
+    def _insert(self, batch):
+        with transaction.atomic():
+            already_imported = set(
+                Bill.objects.filter(
+                    exhibition=self.exhibition,
+                    import_hash__in=[bill.import_hash for bill in batch]
+                ).values_list('import_hash', flat=True)
+            )
+            new_bills = [bill for bill in batch if bill.import_hash not in already_imported]
+            self.result.duplicates += len(batch) - len(new_bills)
+            if new_bills and not self.dry_run:
+                # Stamped per batch: the change feed's settle window counts from here
+                updated_at = timezone.now()
+                for bill, seq in zip(new_bills, next_change_seqs(len(new_bills))):
+                    bill.change_seq = seq
+                    bill.updated_at = updated_at
+                if self.use_copy:
+                    self._copy(new_bills)
+                else:
+                    Bill.objects.bulk_create(new_bills, batch_size=self.batch_size)
+                customer_ids = {bill.customer_id for bill in new_bills}
+                Customer.objects.refresh_bill_totals(customer_ids)
+                invalidate_statements(customer_ids)
+                record_pending_receipts(Bill.objects.filter(
+                    exhibition=self.exhibition,
+                    import_hash__in=[bill.import_hash for bill in new_bills]
+                ))
+            self.result.imported += len(new_bills)
+
+    def _copy(self, bills):
+        """Insert a batch with PostgreSQL COPY."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for bill in bills:
+            writer.writerow([
+                hex_to_int(bill.customer_id),
+                bill.exhibition_id,
+                bill.amount,
+                '' if bill.description is None else bill.description,
+                bill.created_at.isoformat(),
+                bill.created_by,
+                bill.import_hash,
+                bill.updated_at.isoformat(),
+                bill.change_seq,
+            ])
+        buffer.seek(0)
+        table = connection.ops.quote_name(Bill._meta.db_table)
+        with connection.cursor() as cursor:
+            # An unquoted empty field is NULL in CSV COPY, matching a missing description
+            cursor.copy_expert(
+                f'COPY {table} (customer_id, exhibition_id, amount, description, '
+                f'created_at, created_by, import_hash, updated_at, change_seq) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
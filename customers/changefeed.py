@@ -0,0 +1,105 @@
+"""
+Incremental change feed of customers and bills.
+
+Every save stamps the row with the next value of the change sequence
+(customers.sequences) and every removal leaves a Tombstone with its own
+sequence value. A consumer remembers the last sequence it has seen (its
+cursor) and asks for everything after it; each source is read through its
+change_seq index, so the cost is proportional to the number of changes,
+not to the size of the tables.
+
+Sequence values are allocated before the writing transaction commits, so a
+change can become visible after one with a higher value. Changes younger
+than CHANGE_FEED_SETTLE_SECONDS are therefore held back until every
+transaction that could have allocated a lower value has finished.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Bill, Customer, Tombstone
+from .sequences import next_change_seqs
+
+
+def serialize_customer(customer):
+    return {
+        'customer_id': customer.customer_id,
+        'exhibition_id': customer.exhibition_id,
+        'name': customer.name,
+        'email': customer.email,
+        'phone': customer.phone,
+        'email_sent': customer.email_sent,
+        'created_at': customer.created_at.isoformat(),
+        'updated_at': customer.updated_at.isoformat(),
+    }
+
+
+def serialize_bill(bill):
+    return {
+        'id': bill.pk,
+        'customer_id': bill.customer_id,
+        'exhibition_id': bill.exhibition_id,
+        'amount': str(bill.amount),
+        'description': bill.description,
+        'created_at': bill.created_at.isoformat(),
+        'created_by': bill.created_by,
+        'updated_at': bill.updated_at.isoformat(),
+    }
+
+
+def record_tombstones(objects, reason=Tombstone.REASON_DELETED):
+    """
+    Create tombstones for removed customers and/or bills in one insert.
+    ``objects`` is a list of (object_type, object_key, exhibition_id) tuples.
+    """
+    if not objects:
+        return []
+    seqs = next_change_seqs(len(objects))
+    return Tombstone.objects.bulk_create([
+        Tombstone(
+            object_type=object_type,
+            object_key=str(object_key),
+            exhibition_id=exhibition_id,
+            reason=reason,
+            change_seq=seq,
+        )
+        for (object_type, object_key, exhibition_id), seq in zip(objects, seqs)
+    ])
+
+
+def read_changes(cursor=0, limit=1000, exhibition=None):
+    """
+    Return (records, next_cursor) for up to ``limit`` changes after ``cursor``.
+    Each record is a dict with ``seq``, ``type`` (customer or bill), ``op``
+    (upsert or delete) and either ``data`` or ``key``.
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+
+    customers = Customer.objects.filter(change_seq__gt=cursor, updated_at__lte=horizon)
+    bills = Bill.objects.filter(change_seq__gt=cursor, updated_at__lte=horizon)
+    tombstones = Tombstone.objects.filter(change_seq__gt=cursor, deleted_at__lte=horizon)
+    if exhibition is not None:
+        customers = customers.filter(exhibition=exhibition)
+        bills = bills.filter(exhibition=exhibition)
+        tombstones = tombstones.filter(exhibition_id=exhibition.pk)
+
+    # Each source is already ordered by change_seq; merge and keep the first ``limit``.
+    sources = [
+        (
+            {'seq': c.change_seq, 'type': 'customer', 'op': 'upsert', 'data': serialize_customer(c)}
+            for c in customers.order_by('change_seq')[:limit]
+        ),
+        (
+            {'seq': b.change_seq, 'type': 'bill', 'op': 'upsert', 'data': serialize_bill(b)}
+            for b in bills.order_by('change_seq')[:limit]
+        ),
+        (
+            {'seq': t.change_seq, 'type': t.object_type, 'op': 'delete', 'key': t.object_key, 'reason': t.reason}
+            for t in tombstones.order_by('change_seq')[:limit]
+        ),
+    ]
+    records = list(heapq.merge(*sources, key=lambda record: record['seq']))[:limit]
+    next_cursor = records[-1]['seq'] if records else cursor
+    return records, next_cursor
@@ -0,0 +1,296 @@
+"""
+Read-only customer index shared by all worker processes.
+
+``build_index`` (run by the build_customer_index command) writes every
+customer to one binary file, sorted by Customer ID, and swaps it into place
+with an atomic rename. Workers map the file read-only with ``mmap``, so the
+operating system keeps a single copy in the page cache no matter how many
+gunicorn workers read it, and a lookup is a binary search over that mapping.
+
+Rows changed since the file was built are served from a small per-process
+overlay: customers saved after the build (saves and bill total refreshes
+both take a new change sequence value) and customer tombstones newer than
+the build. The overlay is loaded incrementally, reading only rows past the
+change sequence it has already seen, and the file's identity is re-checked
+at most every CUSTOMER_INDEX_REFRESH_SECONDS, so a rebuilt file is picked up
+without a restart (and empties the overlay).
+
+File layout (little-endian)::
+
+    header   magic, version, count, change sequence watermark, build time
+    keys     count x uint32, Customer IDs in ascending order
+    offsets  count x uint32, file offset of each record
+    records  exhibition id, bill count, bill total (cents), name, email, phone
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .fields import parse_hex_id
+from .models import Customer, Tombstone
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CIDX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQd')
+KEY = struct.Struct('<I')
+RECORD = struct.Struct('<QIqHBB')
+CENT = Decimal('0.01')
+
+CustomerEntry = namedtuple(
+    'CustomerEntry',
+    ['customer_id', 'exhibition_id', 'name', 'email', 'phone', 'bill_count', 'bill_total']
+)
+
+
+def _pack_record(exhibition_id, name, email, phone, bill_count, bill_total):
+    name = name.encode()[:0xFFFF]
+    email = email.encode()[:0xFF]
+    phone = phone.encode()[:0xFF]
+    cents = int((bill_total or 0) * 100)
+    return RECORD.pack(
+        exhibition_id, bill_count, cents, len(name), len(email), len(phone)
+    ) + name + email + phone
+
+
+def build_index(path=None):
+    """
+    Write the index of all customers to ``path`` (default
+    CUSTOMER_INDEX_PATH) and atomically replace the previous file.
+    Returns the number of customers written.
+    """
+    path = path or settings.CUSTOMER_INDEX_PATH
+
+    # Anything that changes from here on is left to the readers' overlay.
+    # The settle window covers writes whose transactions are still open.
+    built_at = timezone.now()
+    since = built_at - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    watermark = max(
+        Tombstone.objects.filter(deleted_at__lte=since).aggregate(seq=Max('change_seq'))['seq'] or 0,
+        Customer.objects.filter(updated_at__lte=since).aggregate(seq=Max('change_seq'))['seq'] or 0,
+    )
+
+    rows = Customer.objects.order_by().values_list(
+        'customer_id', 'exhibition_id', 'name', 'email', 'phone', 'bill_count', 'bill_total'
+    ).iterator(chunk_size=5000)
+    entries = sorted(
+        (int(customer_id, 16), _pack_record(*row))
+        for customer_id, *row in rows
+    )
+
+    count = len(entries)
+    offset = HEADER.size + 2 * KEY.size * count
+    offsets = []
+    for _, record in entries:
+        offsets.append(offset)
+        offset += len(record)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, count, watermark, built_at.timestamp()))
+            f.write(struct.pack(f'<{count}I', *(key for key, _ in entries)))
+            f.write(struct.pack(f'<{count}I', *offsets))
+            for _, record in entries:
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return count
+
+
+_MISSING = object()
+
+_Mapping = namedtuple('_Mapping', ['mm', 'identity', 'count', 'watermark', 'built_at'])
+
+
+class CustomerIndex:
+    """
+    Lookups against the mapped index file plus the overlay of recent
+    changes. Safe to share between threads; each process opens its own
+    mapping on first use. A replaced mapping is not closed explicitly but
+    released once no lookup still holds it.
+    """
+
+    def __init__(self, path=None, refresh_seconds=None):
+        self._path = path
+        self._refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._mapping = None
+        self._overlay = {}
+        self._deleted = set()
+        self._overlay_seq = 0   # Every change up to here is in the overlay
+        self._checked_at = None
+
+    @property
+    def path(self):
+        return self._path or settings.CUSTOMER_INDEX_PATH
+
+    @property
+    def refresh_seconds(self):
+        if self._refresh_seconds is None:
+            return settings.CUSTOMER_INDEX_REFRESH_SECONDS
+        return self._refresh_seconds
+
+    @property
+    def available(self):
+        """Whether an index file is mapped (after refreshing if due)."""
+        self._refresh_if_due()
+        return self._mapping is not None
+
+    def get(self, customer_id, exhibition_id=None):
+        """
+        Return the CustomerEntry for ``customer_id``, or None if there is
+        no such customer (in ``exhibition_id``, when given). Falls back to
+        the database when no index file has been built.
+        """
+        customer_id = parse_hex_id(customer_id)
+        if customer_id is None:
+            return None
+        self._refresh_if_due()
+        mapping = self._mapping
+        if mapping is None:
+            entry = self._from_database(customer_id)
+        else:
+            entry = self._overlay.get(customer_id, _MISSING)
+            if entry is _MISSING:
+                entry = None if customer_id in self._deleted else self._search(mapping, customer_id)
+        if entry is not None and exhibition_id is not None and entry.exhibition_id != exhibition_id:
+            return None
+        return entry
+
+    def invalidate(self):
+        """Re-check the file and overlay on the next lookup."""
+        self._checked_at = None
+
+    def _refresh_if_due(self):
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._checked_at != checked_at:
+                return  # Another thread refreshed while we waited
+            self._reopen_if_replaced()
+            if self._mapping is not None:
+                self._load_overlay(self._mapping)
+            self._checked_at = time.monotonic()
+
+    def _reopen_if_replaced(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._mapping = None
+            return
+        identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        if self._mapping is not None and self._mapping.identity == identity:
+            return
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, watermark, built_at = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            logger.warning(f'Ignoring customer index {self.path}: unknown format')
+            self._mapping = None
+            return
+        # Fresh dicts rather than clearing, as lookups may hold the old ones
+        self._overlay = {}
+        self._deleted = set()
+        self._overlay_seq = watermark
+        self._mapping = _Mapping(
+            mm, identity, count, watermark, datetime.fromtimestamp(built_at, tz=dt_timezone.utc)
+        )
+
+    def _load_overlay(self, mapping):
+        """
+        Add the changes after ``_overlay_seq`` to the overlay. Changes
+        younger than the settle window are read again next time, as a lower
+        sequence value may still be uncommitted; the cursor only moves past
+        older ones.
+        """
+        horizon = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+        tombstones = list(
+            Tombstone.objects.filter(change_seq__gt=self._overlay_seq, object_type='customer')
+            .values_list('object_key', 'change_seq', 'deleted_at')
+        )
+        rows = list(
+            Customer.objects.filter(change_seq__gt=self._overlay_seq).order_by().values_list(
+                'customer_id', 'exhibition_id', 'name', 'email', 'phone', 'bill_count', 'bill_total',
+                'change_seq', 'updated_at'
+            )
+        )
+        # Deleted customers are gone from the table, so rows win over tombstones
+        for customer_id, _, _ in tombstones:
+            self._deleted.add(customer_id)
+            self._overlay.pop(customer_id, None)
+        for *entry, _, _ in rows:
+            self._overlay[entry[0]] = CustomerEntry(*entry)
+            self._deleted.discard(entry[0])
+
+        changes = [(seq, changed_at) for _, seq, changed_at in tombstones]
+        changes += [(row[-2], row[-1]) for row in rows]
+        unsettled = min((seq for seq, changed_at in changes if changed_at > horizon), default=None)
+        settled = [
+            seq for seq, changed_at in changes
+            if changed_at <= horizon and (unsettled is None or seq < unsettled)
+        ]
+        if settled:
+            self._overlay_seq = max(settled)
+
+    @staticmethod
+    def _search(mapping, customer_id):
+        mm, count = mapping.mm, mapping.count
+        key = int(customer_id, 16)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(mm, HEADER.size + KEY.size * middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == count or KEY.unpack_from(mm, HEADER.size + KEY.size * low)[0] != key:
+            return None
+        offset = KEY.unpack_from(mm, HEADER.size + KEY.size * (count + low))[0]
+        exhibition_id, bill_count, cents, *lengths = RECORD.unpack_from(mm, offset)
+        fields = []
+        start = offset + RECORD.size
+        for length in lengths:
+            fields.append(mm[start:start + length].decode(errors='ignore'))
+            start += length
+        name, email, phone = fields
+        return CustomerEntry(
+            customer_id, exhibition_id, name, email, phone, bill_count,
+            (Decimal(cents) / 100).quantize(CENT)
+        )
+
+    @staticmethod
+    def _from_database(customer_id):
+        row = Customer.objects.filter(pk=customer_id).values_list(
+            'customer_id', 'exhibition_id', 'name', 'email', 'phone', 'bill_count', 'bill_total'
+        ).first()
+        return CustomerEntry(*row) if row else None
+
+
+customer_index = CustomerIndex()
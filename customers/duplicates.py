@@ -0,0 +1,114 @@
+"""
+Duplicate customer detection.
+
+Email addresses and phone numbers are stored in normalized form (lowercased
+email, digit-only E.164 phone) next to the raw values, with indexes leading
+with the exhibition, so a registration can check for an existing customer
+with two index probes instead of a scan.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+
+
+_NON_DIGITS = re.compile(r'\D')
+
+# A 20-character phone number plus '+' and a country code of up to 3 digits
+NORMALIZED_PHONE_MAX_LENGTH = 24
+
+
+def normalize_email(email):
+    """Lowercase and strip an email address."""
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    """
+    Normalize a phone number to digit-only E.164 (``+<country><number>``).
+    Numbers without an international prefix get PHONE_DEFAULT_COUNTRY_CODE
+    (with the trunk prefix 0 removed) when it is configured.
+    """
+    raw = (phone or '').strip()
+    digits = _NON_DIGITS.sub('', raw)
+    if not digits:
+        return ''
+    country_code = settings.PHONE_DEFAULT_COUNTRY_CODE
+    if raw.startswith('+'):
+        normalized = '+' + digits
+    elif digits.startswith('00'):
+        normalized = '+' + digits[2:]
+    elif country_code:
+        normalized = '+' + country_code + digits.lstrip('0')
+    else:
+        normalized = '+' + digits
+    return normalized[:NORMALIZED_PHONE_MAX_LENGTH]
+
+
+def find_existing_customer(exhibition, email, phone, exclude_pk=None):
+    """
+    Return a customer of ``exhibition`` registered with the same email or
+    phone number, or None.
+    """
+    from .models import Customer
+
+    email = normalize_email(email)
+    phone = normalize_phone(phone)
+    queryset = Customer.objects.filter(exhibition=exhibition)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    # Two separate probes so each one uses its own index.
+    if email:
+        customer = queryset.filter(email_normalized=email).order_by('created_at').first()
+        if customer is not None:
+            return customer
+    if phone:
+        return queryset.filter(phone_normalized=phone).order_by('created_at').first()
+    return None
+
+
+def _key(exhibition_id, kind, value):
+    digest = hashlib.blake2b(f'{exhibition_id}:{kind}:{value}'.encode(), digest_size=8)
+    return digest.digest()
+
+
+def group_duplicates(rows):
+    """
+    Group customers that share an email or a phone number within an exhibition.
+
+    ``rows`` is an iterable of (pk, exhibition_id, email_normalized,
+    phone_normalized) tuples, consumed in a single pass. Customers are linked
+    through compact hashes of their keys and merged with union-find, so a
+    customer sharing an email with one record and a phone with another ends
+    up in one group. Returns a list of groups (lists of pks, in input order)
+    with more than one member.
+    """
+    parent = {}
+    first_with_key = {}
+    order = []
+
+    def find(pk):
+        root = pk
+        while parent[root] != root:
+            root = parent[root]
+        while parent[pk] != root:
+            parent[pk], pk = root, parent[pk]
+        return root
+
+    for pk, exhibition_id, email, phone in rows:
+        parent[pk] = pk
+        order.append(pk)
+        for kind, value in (('e', email), ('p', phone)):
+            if not value:
+                continue
+            key = _key(exhibition_id, kind, value)
+            other = first_with_key.setdefault(key, pk)
+            if other != pk:
+                root, other_root = find(pk), find(other)
+                if root != other_root:
+                    parent[root] = other_root
+
+    groups = {}
+    for pk in order:
+        groups.setdefault(find(pk), []).append(pk)
+    return [members for members in groups.values() if len(members) > 1]
@@ -0,0 +1,87 @@
+"""
+Custom model fields for the customers app.
+"""
+import re
+
+from django.core import exceptions
+from django.db import models
+from django import forms
+
+
+HEX_ID_RE = re.compile(r'^[0-9A-F]{8}$')
+
+
+def parse_hex_id(value):
+    """Return ``value`` as an upper-case 8-character hex ID, or None if it is not one."""
+    value = (value or '').strip().upper()
+    return value if HEX_ID_RE.match(value) else None
+
+
+def hex_to_int(value):
+    """Convert an 8-character hex ID to the signed 32-bit integer stored in the database."""
+    number = int(value, 16)
+    return number - (1 << 32) if number >= (1 << 31) else number
+
+
+def int_to_hex(value):
+    """Render a stored signed 32-bit integer as its 8-character hex ID."""
+    return format(value & 0xFFFFFFFF, '08X')
+
+
+class HexIdField(models.IntegerField):
+    """
+    An 8-character hexadecimal ID (e.g. ``1A2B3C4D``) stored as a 32-bit
+    integer, so the column and every index and foreign key on it take four
+    bytes instead of a variable-length string.
+
+    In Python the value is always the upper-case hex string; integers are
+    accepted too and lookups take either form.
+    """
+    description = '8-character hexadecimal ID stored as a 32-bit integer'
+    default_error_messages = {
+        'invalid': '“%(value)s” is not a valid 8-character hexadecimal ID.',
+    }
+
+    @property
+    def validators(self):
+        # IntegerField adds min/max validators that compare integers; the
+        # Python value here is a string and to_python already range-checks it.
+        return [*self.default_validators, *self._validators]
+
+    def to_python(self, value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, int):
+            if not -(1 << 31) <= value < (1 << 32):
+                raise exceptions.ValidationError(
+                    self.error_messages['invalid'], code='invalid', params={'value': value}
+                )
+            return int_to_hex(value)
+        value = str(value).strip().upper()
+        if not HEX_ID_RE.match(value):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return int_to_hex(value)
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return hex_to_int(self.to_python(value))
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj) or ''
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.CharField,
+            'max_length': 8,
+            'min_length': 8,
+            **kwargs,
+        })
@@ -0,0 +1,66 @@
+"""
+Forms for customers app.
+"""
+from django import forms
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .duplicates import find_existing_customer
+from .models import Customer, Exhibition
+
+
+class CustomerAdminForm(forms.ModelForm):
+    """
+    Customer form that refuses to register someone twice for the same
+    exhibition, pointing the desk at the existing Customer ID instead.
+    """
+    register_duplicate = forms.BooleanField(
+        required=False,
+        label='Register anyway',
+        help_text='Create a new customer even though the email or phone is already registered'
+    )
+
+    # Set by CustomerAdmin.get_form to the exhibition of the request
+    exhibition = None
+
+    class Meta:
+        model = Customer
+        fields = ('name', 'email', 'phone', 'receipts_opt_in')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk is not None or cleaned_data.get('register_duplicate'):
+            return cleaned_data
+
+        exhibition = self.exhibition or Exhibition.objects.get_active()
+        existing = find_existing_customer(
+            exhibition,
+            cleaned_data.get('email'),
+            cleaned_data.get('phone')
+        )
+        if existing is not None:
+            raise forms.ValidationError(
+                format_html(
+                    'This person is already registered as <a href="{}">{}</a> ({}). '
+                    'Use the existing Customer ID, or tick "Register anyway".',
+                    reverse('admin:customers_customer_change', args=[existing.pk]),
+                    existing.customer_id,
+                    existing.name
+                ),
+                code='duplicate'
+            )
+        return cleaned_data
+
+
+class RegistrationForm(CustomerAdminForm):
+    """
+    Walk-in registration at the kiosk: the same fields and duplicate check
+    as the admin form, laid out for typing one registration after another.
+    """
+
+    class Meta(CustomerAdminForm.Meta):
+        widgets = {
+            'name': forms.TextInput(attrs={'autofocus': True, 'autocomplete': 'off'}),
+            'email': forms.EmailInput(attrs={'autocomplete': 'off'}),
+            'phone': forms.TextInput(attrs={'autocomplete': 'off', 'inputmode': 'tel'}),
+        }
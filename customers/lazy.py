@@ -0,0 +1,40 @@
+"""
+Lazy imports for heavy optional-path dependencies.
+
+openpyxl (Excel export), qrcode/Pillow (QR codes) and numpy (analytics) add a noticeable amount
+to the import time of every worker and management command, while most
+requests never use them. Modules wrapped in LazyModule are imported the first
+time one of their attributes is accessed.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Proxy that imports ``name`` on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+
+qrcode = LazyModule('qrcode')
+openpyxl = LazyModule('openpyxl')
+openpyxl_styles = LazyModule('openpyxl.styles')
+openpyxl_utils = LazyModule('openpyxl.utils')
+numpy = LazyModule('numpy')
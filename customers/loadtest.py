@@ -0,0 +1,320 @@
+"""
+In-process load testing of the WSGI application.
+
+Requests are built as WSGI environs and handed straight to
+``exhibition_project.wsgi.application`` (or sent over localhost to a
+threaded wsgiref server running the same application) from a thread pool,
+so the whole middleware/admin stack is exercised without external tools or
+network access. Each scenario mirrors a real desk action.
+"""
+import http.client
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import connections
+from django.middleware.csrf import CSRF_ALLOWED_CHARS
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from .middleware import EXHIBITION_SESSION_KEY
+
+
+SCENARIOS = ('register', 'bill', 'lookup', 'changelist', 'export')
+DEFAULT_MIX = {'register': 2, 'bill': 5, 'lookup': 5, 'changelist': 2, 'export': 1}
+
+LOADTEST_USERNAME = 'loadtest'
+
+
+def parse_mix(value):
+    """Parse ``register=2,bill=5,...`` into a weights dict."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario "{name}"; choose from {", ".join(SCENARIOS)}')
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('At least one scenario needs a positive weight')
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Session:
+    """An authenticated admin session (session cookie plus CSRF token)."""
+
+    def __init__(self, user, exhibition):
+        from importlib import import_module
+
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store[EXHIBITION_SESSION_KEY] = exhibition.pk
+        store.save()
+        self.store = store
+        self.csrf_token = get_random_string(32, allowed_chars=CSRF_ALLOWED_CHARS)
+        self.cookie = (
+            f'{settings.SESSION_COOKIE_NAME}={store.session_key}; '
+            f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}'
+        )
+
+    def close(self):
+        self.store.delete()
+
+
+class Scenarios:
+    """
+    Builds the request for each scenario as (method, path, query, form data,
+    expected status). Admin add forms redirect on success and re-render with
+    a 200 on validation errors, so those expect a 302.
+    """
+
+    def __init__(self, customers, export_size=50):
+        # (pk, customer_id) pairs of the seeded customers
+        self.customers = customers
+        self.export_size = export_size
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _next_number(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def register(self):
+        number = self._next_number()
+        token = get_random_string(8).lower()
+        return 'POST', reverse('admin:customers_customer_add'), '', {
+            'name': f'Load Test {number}',
+            'email': f'loadtest-{token}-{number}@example.com',
+            'phone': f'+1555{number:07d}',
+            'register_duplicate': 'on',
+            'bills-TOTAL_FORMS': '0',
+            'bills-INITIAL_FORMS': '0',
+        }, 302
+
+    def bill(self):
+        return 'POST', reverse('admin:customers_bill_add'), '', {
+            'customer': random.choice(self.customers)[0],
+            'amount': f'{random.randint(100, 50000) / 100:.2f}',
+            'description': 'Load test',
+        }, 302
+
+    def lookup(self):
+        return 'GET', reverse('admin:customers_customer_changelist'), urlencode({
+            'q': random.choice(self.customers)[1],
+        }), None, 200
+
+    def changelist(self):
+        return 'GET', reverse('admin:customers_customer_changelist'), '', None, 200
+
+    def export(self):
+        selected = random.sample(self.customers, min(self.export_size, len(self.customers)))
+        return 'POST', reverse('admin:customers_customer_changelist'), '', {
+            'action': 'export_to_excel',
+            '_selected_action': [pk for pk, _ in selected],
+            'index': '0',
+        }, 200
+
+
+class InProcessClient:
+    """Calls the WSGI application directly."""
+
+    def __init__(self, application, session):
+        self.application = application
+        self.session = session
+
+    def request(self, method, path, query='', data=None):
+        body = urlencode(data, doseq=True).encode() if data is not None else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': 'localhost',
+            'HTTP_COOKIE': self.session.cookie,
+            'HTTP_X_CSRFTOKEN': self.session.csrf_token,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        result = self.application(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0], size
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class HttpClient:
+    """Sends requests over localhost to a wsgiref server (one connection per thread)."""
+
+    def __init__(self, port, session):
+        self.port = port
+        self.session = session
+        self._local = threading.local()
+
+    def request(self, method, path, query='', data=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        body = urlencode(data, doseq=True) if data is not None else None
+        headers = {
+            'Host': 'localhost',
+            'Cookie': self.session.cookie,
+            'X-CSRFToken': self.session.csrf_token,
+            'Content-Type': 'application/x-www-form-urlencoded',
+        }
+        try:
+            connection.request(method, f'{path}?{query}' if query else path, body=body, headers=headers)
+            response = connection.getresponse()
+            size = len(response.read())
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+        return response.status, size
+
+
+def start_http_server(application):
+    """Serve the application on a free localhost port from a background thread."""
+    server = make_server(
+        '127.0.0.1', 0, application,
+        server_class=_ThreadingWSGIServer,
+        handler_class=_QuietHandler
+    )
+    thread = threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True)
+    thread.start()
+    return server
+
+
+def run_load(client, scenarios, mix, concurrency, duration=None, total_requests=None):
+    """
+    Drive ``client`` from ``concurrency`` threads until ``duration`` seconds
+    have passed or ``total_requests`` requests were sent.
+    Returns {scenario: [(latency_seconds, ok, bytes), ...]} and the elapsed time.
+    """
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    results = {name: [] for name in names}
+    results_lock = threading.Lock()
+    remaining = [total_requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def take_request():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        if total_requests is not None:
+            with results_lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+        return True
+
+    def worker():
+        local = {name: [] for name in names}
+        try:
+            while take_request():
+                name = random.choices(names, weights)[0]
+                method, path, query, data, expected = getattr(scenarios, name)()
+                started = time.perf_counter()
+                try:
+                    status, size = client.request(method, path, query, data)
+                    ok = status == expected
+                except Exception:
+                    ok, size = False, 0
+                local[name].append((time.perf_counter() - started, ok, size))
+        finally:
+            connections.close_all()
+            with results_lock:
+                for name in names:
+                    results[name].extend(local[name])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='loadtest') as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """Throughput and latency percentiles (milliseconds) per scenario and overall."""
+    def stats(samples):
+        latencies = sorted(latency * 1000 for latency, _, _ in samples)
+        count = len(samples)
+        return {
+            'requests': count,
+            'errors': sum(1 for _, ok, _ in samples if not ok),
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+            'bytes_per_request': round(sum(size for _, _, size in samples) / count) if count else 0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / count, 2) if count else None,
+                'p50': round(percentile(latencies, 0.50), 2) if count else None,
+                'p95': round(percentile(latencies, 0.95), 2) if count else None,
+                'p99': round(percentile(latencies, 0.99), 2) if count else None,
+                'max': round(latencies[-1], 2) if count else None,
+            },
+        }
+
+    all_samples = [sample for samples in results.values() for sample in samples]
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'total': stats(all_samples),
+        'scenarios': {name: stats(samples) for name, samples in results.items()},
+    }
+
+
+def get_loadtest_user():
+    """The superuser the load test acts as (created on first use)."""
+    User = get_user_model()
+    user, created = User.objects.get_or_create(
+        username=LOADTEST_USERNAME,
+        defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return user
@@ -0,0 +1,159 @@
+"""
+Non-blocking structured logging.
+
+Loggers hand records to ``BackgroundHandler``, a ``QueueHandler`` that only
+puts them on a bounded in-process queue; a ``QueueListener`` thread formats
+them as JSON lines and writes them to stderr, keeping them out of management
+command output. A request thread never waits on the stream. If the queue is
+full (stderr stalled) records are dropped and counted rather than blocking.
+
+Every record carries the ID of the request it was logged in (see
+``RequestLogMiddleware``), and ``SamplingFilter`` thins out high-volume
+records while always keeping warnings and slow operations.
+
+This module is loaded by the LOGGING setting, so it must not import models.
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+
+# ID of the request being handled by the current thread (or task)
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed with ``extra``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id',
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None) or request_id_var.get()
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a ``rate`` fraction of records. Warnings and above, and records
+    whose ``duration_ms`` is at least ``slow_ms``, are always kept.
+    """
+
+    def __init__(self, rate=1.0, slow_ms=None, name=''):
+        super().__init__(name)
+        self.rate = rate
+        self.slow_ms = slow_ms
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.slow_ms is not None and getattr(record, 'duration_ms', 0) >= self.slow_ms:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a listener thread that writes them to ``stream``
+    (default stderr). The queue and thread are created per process on first
+    use, so gunicorn workers forked from a preloaded master get their own.
+    """
+
+    def __init__(self, queue_size=10000, stream=None):
+        super().__init__(None)
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # The formatter configured for this handler is the output format.
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.queue = queue.Queue(maxsize=self.queue_size)
+                    self._listener = logging.handlers.QueueListener(self.queue, self.target)
+                    self._listener.start()
+                    self.dropped = 0
+                    self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Render the message and traceback now, in the logging thread, so
+        # the listener never touches the original arguments.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(
+                'customers.logs', logging.WARNING, __file__, 0,
+                f'{dropped} log record(s) were dropped because the queue was full', None, None
+            )
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+    def flush(self):
+        """Wait until every queued record has been written."""
+        if self._pid == os.getpid():
+            self.queue.join()
+            self.target.flush()
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None:
+                try:
+                    self._listener.stop()
+                except queue.Full:
+                    pass
+                self._listener = None
+                self._pid = None
+        self.target.close()
+        super().close()
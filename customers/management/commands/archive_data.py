@@ -0,0 +1,89 @@
+"""
+Management command to move old customers and bills into cold archive files.
+Usage:
+    python manage.py archive_data --exhibition SLUG
+    python manage.py archive_data --before 2024-01-01
+"""
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from customers.archive import ArchiveWriter, archive_customers, archive_filename
+from customers.audit import audit_log
+from customers.models import AuditEvent, Customer, Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Archives customers and bills of a closed exhibition or older than a cutoff date'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument(
+            '--exhibition',
+            metavar='SLUG',
+            help='Archive every customer of a closed exhibition'
+        )
+        target.add_argument(
+            '--before',
+            metavar='YYYY-MM-DD',
+            help='Archive customers registered before this date'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of customers archived and deleted per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many customers would be archived'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        if options['exhibition']:
+            try:
+                exhibition = Exhibition.objects.get(slug=options['exhibition'])
+            except Exhibition.DoesNotExist:
+                raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+            if not exhibition.is_closed:
+                raise CommandError(f'Close "{exhibition.name}" before archiving it.')
+            queryset = Customer.objects.filter(exhibition=exhibition)
+            label = exhibition.slug
+        else:
+            try:
+                cutoff_date = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format.')
+            cutoff = timezone.make_aware(datetime.combine(cutoff_date, time.min))
+            queryset = Customer.objects.filter(created_at__lt=cutoff)
+            label = f'before-{cutoff_date:%Y%m%d}'
+
+        total = queryset.count()
+        if options['dry_run'] or total == 0:
+            self.stdout.write(f'{total} customer(s) would be archived.')
+            return
+
+        filename = archive_filename(label)
+        archived = 0
+        with ArchiveWriter(filename) as writer:
+            for count in archive_customers(queryset, writer, options['chunk_size']):
+                archived += count
+                self.stdout.write(f'Archived {archived}/{total} customer(s)...')
+
+        audit_log.record(
+            'system:archive_data',
+            AuditEvent.ACTION_ARCHIVE,
+            object_type='customer',
+            summary=f'{archived} customer(s) archived to {filename}',
+            archive_file=filename
+        )
+        audit_log.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Archived {archived} customer(s) to {filename}.')
+        )
@@ -0,0 +1,61 @@
+"""
+Management command to write the post-event billing report as JSON or CSV.
+Usage:
+    python manage.py billing_report --exhibition SLUG --output report.json
+    python manage.py billing_report --all --format csv --output report.csv
+"""
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.analytics import build_report, get_columns, numpy_available, report_rows
+from customers.models import Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Writes bill percentiles, spend histogram, hourly cohorts, top spenders and repeat visits'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument('--exhibition', metavar='SLUG', help='Report on this exhibition (default: active)')
+        target.add_argument('--all', action='store_true', help='Report on the bills of every exhibition')
+        parser.add_argument('--format', choices=['json', 'csv'], default='json', help='Output format (default: json)')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        if not numpy_available():
+            raise CommandError('billing_report needs numpy: pip install numpy')
+
+        if options['all']:
+            exhibition_id = None
+        elif options['exhibition']:
+            exhibition = Exhibition.objects.filter(slug=options['exhibition']).first()
+            if exhibition is None:
+                raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+            exhibition_id = exhibition.pk
+        else:
+            exhibition_id = Exhibition.objects.get_active().pk
+
+        started = time.perf_counter()
+        columns = get_columns(exhibition_id)
+        loaded = time.perf_counter()
+        report = build_report(columns)
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            if options['format'] == 'json':
+                output.write(json.dumps(report, indent=2) + '\n')
+            else:
+                writer = csv.writer(output)
+                writer.writerow(['section', 'key', 'metric', 'value'])
+                writer.writerows(report_rows(report))
+        finally:
+            if options['output']:
+                output.close()
+
+        self.stderr.write(
+            f'{len(columns)} bill(s) loaded in {(loaded - started) * 1000:.0f} ms, '
+            f'report computed in {report["summary"]["compute_ms"]:.0f} ms.'
+        )
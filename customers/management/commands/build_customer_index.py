@@ -0,0 +1,39 @@
+"""
+Management command to rebuild the shared memory-mapped customer index.
+Usage:
+    python manage.py build_customer_index
+    python manage.py build_customer_index --output /var/lib/exhibition/customer_index.bin
+
+Run it periodically (e.g. every few minutes from cron) and after bulk
+imports; workers pick up the new file on their own.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from customers.customer_index import build_index
+
+
+class Command(BaseCommand):
+    help = 'Writes the Customer ID index that gunicorn workers share through mmap'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Path of the index file (default: CUSTOMER_INDEX_PATH)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.CUSTOMER_INDEX_PATH
+        started = time.perf_counter()
+        count = build_index(path)
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indexed {count} customer(s) in {elapsed:.2f}s '
+                f'({size / 1024:.0f} KiB) to {path}.'
+            )
+        )
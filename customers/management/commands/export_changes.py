@@ -0,0 +1,68 @@
+"""
+Management command to pull the change feed as JSON lines.
+Usage:
+    python manage.py export_changes --cursor 0 > changes.jsonl
+    python manage.py export_changes --cursor-file finance.cursor --output changes.jsonl
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.changefeed import read_changes
+from customers.models import Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Writes customers, bills and tombstones changed since a cursor as JSON lines'
+
+    def add_arguments(self, parser):
+        start = parser.add_mutually_exclusive_group()
+        start.add_argument('--cursor', type=int, default=None, help='Sequence to start after (default: 0)')
+        start.add_argument(
+            '--cursor-file',
+            help='File holding the last cursor; read at start and updated after a successful export'
+        )
+        parser.add_argument('--output', help='File to write (default: standard output)')
+        parser.add_argument('--exhibition', metavar='SLUG', help='Only changes of this exhibition')
+        parser.add_argument('--page-size', type=int, default=1000, help='Changes read per query (default: 1000)')
+
+    def handle(self, *args, **options):
+        cursor = options['cursor'] or 0
+        if options['cursor_file'] and os.path.exists(options['cursor_file']):
+            with open(options['cursor_file']) as cursor_file:
+                try:
+                    cursor = int(cursor_file.read().strip() or 0)
+                except ValueError:
+                    raise CommandError(f'{options["cursor_file"]} does not contain a cursor.')
+
+        exhibition = None
+        if options['exhibition']:
+            try:
+                exhibition = Exhibition.objects.get(slug=options['exhibition'])
+            except Exhibition.DoesNotExist:
+                raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+
+        output = open(options['output'], 'w') if options['output'] else None
+        write = (lambda line: output.write(line + '\n')) if output else self.stdout.write
+        written = 0
+        try:
+            while True:
+                records, cursor = read_changes(cursor, options['page_size'], exhibition)
+                for record in records:
+                    write(json.dumps(record, separators=(',', ':')))
+                written += len(records)
+                if len(records) < options['page_size']:
+                    break
+        finally:
+            if output:
+                output.close()
+
+        if options['cursor_file']:
+            # Write-then-rename so a crash never leaves a truncated cursor behind
+            tmp_path = options['cursor_file'] + '.tmp'
+            with open(tmp_path, 'w') as cursor_file:
+                cursor_file.write(str(cursor))
+            os.replace(tmp_path, options['cursor_file'])
+
+        self.stderr.write(f'Exported {written} change(s); next cursor is {cursor}.')
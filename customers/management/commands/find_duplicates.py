@@ -0,0 +1,90 @@
+"""
+Management command to report customers registered more than once.
+Usage:
+    python manage.py find_duplicates               # active exhibition
+    python manage.py find_duplicates --exhibition SLUG
+    python manage.py find_duplicates --all --json
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.duplicates import group_duplicates
+from customers.models import Customer, Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Groups customers that share an email address or phone number'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument(
+            '--exhibition',
+            metavar='SLUG',
+            help='Exhibition to check (default: the active exhibition)'
+        )
+        target.add_argument(
+            '--all',
+            action='store_true',
+            help='Check every exhibition (duplicates are still per exhibition)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Output the groups as JSON'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Customer.objects.all()
+        if not options['all']:
+            if options['exhibition']:
+                try:
+                    exhibition = Exhibition.objects.get(slug=options['exhibition'])
+                except Exhibition.DoesNotExist:
+                    raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+            else:
+                exhibition = Exhibition.objects.get_active()
+            queryset = queryset.filter(exhibition=exhibition)
+
+        rows = queryset.order_by('created_at').values_list(
+            'pk', 'exhibition_id', 'email_normalized', 'phone_normalized'
+        ).iterator(chunk_size=5000)
+        groups = group_duplicates(rows)
+
+        # Only the duplicated customers are loaded in full.
+        pks = [pk for group in groups for pk in group]
+        customers = {
+            customer.pk: customer
+            for customer in Customer.objects.filter(pk__in=pks).only(
+                'customer_id', 'name', 'email', 'phone', 'created_at'
+            )
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps([
+                [
+                    {
+                        'customer_id': customers[pk].customer_id,
+                        'name': customers[pk].name,
+                        'email': customers[pk].email,
+                        'phone': customers[pk].phone,
+                        'created_at': customers[pk].created_at.isoformat(),
+                    }
+                    for pk in group
+                ]
+                for group in groups
+            ], indent=2))
+            return
+
+        for number, group in enumerate(groups, 1):
+            original = customers[group[0]]
+            self.stdout.write(f'Group {number}: first registered as {original.customer_id}')
+            for pk in group:
+                customer = customers[pk]
+                self.stdout.write(
+                    f'  {customer.customer_id}  {customer.name}  {customer.email}  '
+                    f'{customer.phone}  {customer.created_at:%Y-%m-%d %H:%M}'
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f'Found {len(groups)} group(s) of duplicate customers.')
+        )
@@ -0,0 +1,109 @@
+"""
+Management command to import bills from a vendor's POS CSV export.
+The CSV needs a header with at least customer_id and amount; description,
+created_at (ISO 8601) and created_by are optional.
+Usage:
+    python manage.py import_bills sales.csv --created-by "Vendor A"
+    cat sales.csv | python manage.py import_bills - --exhibition SLUG
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.audit import audit_log
+from customers.bill_import import BillImporter, ImportFormatError
+from customers.models import AuditEvent, Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Streams bills from a POS CSV export into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file to import, or - for standard input')
+        parser.add_argument(
+            '--exhibition',
+            metavar='SLUG',
+            help='Exhibition the bills belong to (default: the active exhibition)'
+        )
+        parser.add_argument(
+            '--created-by',
+            default='pos-import',
+            help='Value for created_by when the file has no created_by column (default: pos-import)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows inserted per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use bulk INSERT instead of PostgreSQL COPY'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report counts without inserting anything'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        if options['exhibition']:
+            try:
+                exhibition = Exhibition.objects.get(slug=options['exhibition'])
+            except Exhibition.DoesNotExist:
+                raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+        else:
+            exhibition = Exhibition.objects.get_active()
+
+        importer = BillImporter(
+            exhibition,
+            created_by=options['created_by'],
+            batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+            dry_run=options['dry_run']
+        )
+
+        started = time.perf_counter()
+        customers = importer.load_customer_map()
+        self.stdout.write(f'Loaded {customers} customer ID(s) of {exhibition.name}.')
+
+        def progress(result):
+            self.stdout.write(f'Imported {result.imported} bill(s)...')
+
+        try:
+            if options['file'] == '-':
+                result = importer.run(sys.stdin, progress)
+            else:
+                with open(options['file'], newline='', encoding='utf-8-sig') as stream:
+                    result = importer.run(stream, progress)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for line_number, message in result.errors[:20]:
+            self.stderr.write(f'Line {line_number}: {message}')
+        if result.rejected > 20:
+            self.stderr.write(f'... and {result.rejected - 20} more rejected line(s).')
+
+        if not options['dry_run'] and result.imported:
+            audit_log.record(
+                'system:import_bills',
+                AuditEvent.ACTION_CREATE,
+                object_type='bill',
+                summary=f'{result.imported} bill(s) imported from {options["file"]}',
+                exhibition=exhibition.slug
+            )
+            audit_log.flush()
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {result.imported} bill(s) in {elapsed:.1f}s; '
+                f'skipped {result.duplicates} duplicate(s), rejected {result.rejected} line(s).'
+            )
+        )
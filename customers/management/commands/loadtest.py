@@ -0,0 +1,161 @@
+"""
+Management command to load test the WSGI application with a realistic desk mix.
+Usage:
+    python manage.py loadtest --duration 30 --concurrency 8
+    python manage.py loadtest --requests 2000 --mix register=1,bill=4,lookup=4 --output results.json
+    python manage.py loadtest --transport http --concurrency 16 --no-input
+
+The run writes to the configured database. Its exhibition and customers are
+deleted afterwards, but change feed tombstones and audit events stay, so
+point DATABASE_URL at a staging copy rather than the event database.
+"""
+import json
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from customers import loadtest
+from customers.audit import audit_log
+from customers.models import Customer, Exhibition
+
+
+class Command(BaseCommand):
+    help = 'Replays registrations, bill entries, lookups, changelist views and exports against the app'
+
+    def add_arguments(self, parser):
+        limit = parser.add_mutually_exclusive_group()
+        limit.add_argument('--duration', type=float, help='Seconds to run for (default: 10)')
+        limit.add_argument('--requests', type=int, help='Total number of requests to send')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads (default: 4)')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{name}={weight}' for name, weight in loadtest.DEFAULT_MIX.items()),
+            help='Scenario weights, e.g. register=2,bill=5,lookup=5,changelist=2,export=1'
+        )
+        parser.add_argument(
+            '--transport',
+            choices=('inprocess', 'http'),
+            default='inprocess',
+            help='Call the WSGI application directly or over a localhost HTTP server (default: inprocess)'
+        )
+        parser.add_argument(
+            '--seed-customers',
+            type=int,
+            default=200,
+            help='Customers created up front for bills, lookups and exports (default: 200)'
+        )
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+        parser.add_argument(
+            '--keep-data',
+            action='store_true',
+            help='Keep the load test exhibition and its customers afterwards'
+        )
+        parser.add_argument(
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Do not ask for confirmation'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        if options['seed_customers'] < 1:
+            raise CommandError('--seed-customers must be at least 1.')
+        duration = options['duration']
+        if duration is None and options['requests'] is None:
+            duration = 10
+
+        database = settings.DATABASES['default']
+        self.stdout.write(self.style.WARNING(
+            f'The load test writes to the {database["ENGINE"].rsplit(".", 1)[-1]} database '
+            f'"{database["NAME"]}". Change feed tombstones and audit events it creates are not '
+            f'removed afterwards; use a staging copy, not the event database.'
+        ))
+        if options['interactive']:
+            answer = input('Type "yes" to run against it: ')
+            if answer != 'yes':
+                raise CommandError('Load test cancelled.')
+
+        # Keep the run self-contained: mail goes to memory and requests are
+        # addressed to localhost whatever the deployment's ALLOWED_HOSTS are.
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+        if 'localhost' not in settings.ALLOWED_HOSTS and '*' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'localhost']
+
+        from exhibition_project.wsgi import application
+
+        tag = uuid.uuid4().hex[:8]
+        exhibition = Exhibition.objects.create(name=f'Load test {tag}', slug=f'loadtest-{tag}')
+        session = None
+        server = None
+        try:
+            for number in range(options['seed_customers']):
+                Customer.objects.create(
+                    exhibition=exhibition,
+                    name=f'Load Seed {number}',
+                    email=f'seed-{tag}-{number}@example.com',
+                    phone=f'+1444{number:07d}'
+                )
+            customers = list(
+                Customer.objects.filter(exhibition=exhibition).values_list('pk', 'customer_id')
+            )
+            session = loadtest.Session(loadtest.get_loadtest_user(), exhibition)
+            scenarios = loadtest.Scenarios(customers)
+
+            if options['transport'] == 'http':
+                server = loadtest.start_http_server(application)
+                client = loadtest.HttpClient(server.server_address[1], session)
+            else:
+                client = loadtest.InProcessClient(application, session)
+
+            self.stdout.write(
+                f'Running {options["transport"]} load test against "{exhibition.name}" '
+                f'with {options["concurrency"]} thread(s)...'
+            )
+            results, elapsed = loadtest.run_load(
+                client,
+                scenarios,
+                mix,
+                concurrency=options['concurrency'],
+                duration=duration,
+                total_requests=options['requests']
+            )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if session is not None:
+                session.close()
+            audit_log.flush()
+            # Welcome emails are sent from background threads that mark
+            # their customer afterwards; let them finish before it goes.
+            for thread in threading.enumerate():
+                if thread.name == 'welcome-email':
+                    thread.join()
+            if not options['keep_data']:
+                Customer.objects.filter(exhibition=exhibition).delete()
+                exhibition.delete()
+
+        summary = loadtest.summarize(results, elapsed)
+        summary['transport'] = options['transport']
+        summary['concurrency'] = options['concurrency']
+        summary['mix'] = mix
+        report = json.dumps(summary, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+        self.stdout.write(report)
+
+        total = summary['total']
+        style = self.style.SUCCESS if not total['errors'] else self.style.WARNING
+        self.stdout.write(style(
+            f'{total["requests"]} request(s) in {elapsed:.1f}s '
+            f'({total["throughput_rps"]} req/sec, {total["errors"]} error(s)).'
+        ))
@@ -0,0 +1,62 @@
+"""
+Management command to partition the bill table by exhibition (PostgreSQL).
+Usage:
+    python manage.py partition_bills               # convert and create partitions
+    python manage.py partition_bills --detach SLUG # detach a closed exhibition
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.models import Exhibition
+from customers import partitions
+
+
+class Command(BaseCommand):
+    help = 'Partitions customers_bill by exhibition, or detaches a closed exhibition'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--detach',
+            metavar='SLUG',
+            help='Detach the partition of a closed exhibition'
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.partitioning_supported():
+            raise CommandError('Bill partitioning requires PostgreSQL.')
+
+        if options['detach']:
+            self.detach(options['detach'])
+            return
+
+        exhibition_ids = list(Exhibition.objects.values_list('pk', flat=True))
+        if partitions.convert_bill_table(exhibition_ids):
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Converted {partitions.BILL_TABLE} into {len(exhibition_ids)} partition(s).'
+                )
+            )
+            return
+
+        created = [pk for pk in exhibition_ids if partitions.ensure_partition(pk)]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{partitions.BILL_TABLE} is already partitioned; '
+                f'created {len(created)} missing partition(s).'
+            )
+        )
+
+    def detach(self, slug):
+        try:
+            exhibition = Exhibition.objects.get(slug=slug)
+        except Exhibition.DoesNotExist:
+            raise CommandError(f'No exhibition with slug "{slug}".')
+        if not exhibition.is_closed:
+            raise CommandError(f'Close "{exhibition.name}" before detaching its bills.')
+
+        try:
+            table = partitions.detach_partition(exhibition.pk)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            self.style.SUCCESS(f'Detached bills of "{exhibition.name}" into table {table}.')
+        )
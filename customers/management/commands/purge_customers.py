@@ -0,0 +1,105 @@
+"""
+Management command to delete customers and all their bills in chunks.
+Usage:
+    python manage.py purge_customers --exhibition SLUG
+    python manage.py purge_customers --ids 1A2B3C4D 5E6F7A8B --no-input
+    python manage.py purge_customers --exhibition SLUG --dry-run
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.audit import audit_log
+from customers.fields import parse_hex_id
+from customers.models import AuditEvent, Customer, Exhibition
+from customers.purge import count_purge, purge_customers
+
+
+class Command(BaseCommand):
+    help = 'Deletes customers and their bills in short key-ordered transactions'
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument(
+            '--exhibition',
+            metavar='SLUG',
+            help='Delete every customer of this exhibition'
+        )
+        target.add_argument(
+            '--ids',
+            nargs='+',
+            metavar='CUSTOMER_ID',
+            help='Delete these Customer IDs'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Customers deleted per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--bill-chunk-size',
+            type=int,
+            default=5000,
+            help='Bills deleted per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many customers and bills would be deleted'
+        )
+        parser.add_argument(
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Do not ask for confirmation'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['bill_chunk_size'] < 1:
+            raise CommandError('--chunk-size and --bill-chunk-size must be at least 1.')
+
+        if options['exhibition']:
+            try:
+                exhibition = Exhibition.objects.get(slug=options['exhibition'])
+            except Exhibition.DoesNotExist:
+                raise CommandError(f'No exhibition with slug "{options["exhibition"]}".')
+            queryset = Customer.objects.filter(exhibition=exhibition)
+            label = f'exhibition {exhibition.slug}'
+        else:
+            ids = [parse_hex_id(customer_id) for customer_id in options['ids']]
+            if None in ids:
+                raise CommandError('Customer IDs must be 8 hexadecimal characters.')
+            queryset = Customer.objects.filter(customer_id__in=ids)
+            label = f'{len(options["ids"])} listed Customer ID(s)'
+
+        customers, bills = count_purge(queryset)
+        self.stdout.write(f'{customers} customer(s) and {bills} bill(s) would be deleted.')
+        if options['dry_run'] or customers == 0:
+            return
+        if options['interactive']:
+            answer = input('Type "yes" to delete them: ')
+            if answer != 'yes':
+                raise CommandError('Purge cancelled.')
+
+        deleted_customers = deleted_bills = 0
+        for customer_count, bill_count in purge_customers(
+            queryset,
+            chunk_size=options['chunk_size'],
+            bill_chunk_size=options['bill_chunk_size']
+        ):
+            deleted_customers += customer_count
+            deleted_bills += bill_count
+            self.stdout.write(
+                f'Deleted {deleted_customers}/{customers} customer(s), {deleted_bills} bill(s)...'
+            )
+
+        audit_log.record(
+            'system:purge_customers',
+            AuditEvent.ACTION_DELETE,
+            object_type='customer',
+            summary=f'{deleted_customers} customer(s) and {deleted_bills} bill(s) of {label}'
+        )
+        audit_log.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted_customers} customer(s) and {deleted_bills} bill(s).')
+        )
@@ -0,0 +1,79 @@
+"""
+Management command to email receipt digests to customers who opted in.
+Usage (every minute from cron):
+    python manage.py send_receipt_digests
+    python manage.py send_receipt_digests --window 300 --batch-size 200
+    python manage.py send_receipt_digests --dry-run
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.receipts import due_customers, send_receipt_digests
+
+
+class Command(BaseCommand):
+    help = "Emails each opted-in customer one digest of their bills from the last window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=None,
+            help='Seconds a customer\'s first pending bill waits before the digest is sent '
+                 f'(default: RECEIPT_DIGEST_WINDOW_SECONDS, {settings.RECEIPT_DIGEST_WINDOW_SECONDS})'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Customers mailed per batch '
+                 f'(default: RECEIPT_DIGEST_BATCH_SIZE, {settings.RECEIPT_DIGEST_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Send at most this many digests in this run'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many digests are due'
+        )
+
+    def handle(self, *args, **options):
+        if options['window'] is not None and options['window'] < 0:
+            raise CommandError('--window must not be negative.')
+        if any(options[name] is not None and options[name] < 1 for name in ('batch_size', 'limit')):
+            raise CommandError('--batch-size and --limit must be at least 1.')
+
+        if options['dry_run']:
+            due = due_customers(options['window'], options['limit'])
+            self.stdout.write(f'{len(due)} digest(s) due.')
+            return
+
+        def progress(result):
+            self.stdout.write(
+                f'Sent {result.digests} digest(s) covering {result.bills} bill(s) '
+                f'({result.rate:.1f} digests/sec)...'
+            )
+
+        result = send_receipt_digests(
+            window=options['window'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            progress=progress
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {result.digests} digest(s) covering {result.bills} bill(s) in {result.seconds:.1f}s '
+            f'({result.rate:.1f} digests/sec).'
+        ))
+        if result.skipped:
+            self.stdout.write(f'Dropped {result.skipped} digest(s) for customers who opted out or lost their bills.')
+        if result.failed:
+            self.stdout.write(self.style.WARNING(f'{result.failed} digest(s) could not be sent and will be retried.'))
+        if result.abandoned:
+            self.stdout.write(self.style.WARNING(
+                f'Gave up on {result.abandoned} digest(s) after {settings.RECEIPT_DIGEST_MAX_ATTEMPTS} failed attempts.'
+            ))
@@ -0,0 +1,40 @@
+"""
+Management command to prepare the container before gunicorn starts.
+Skips collectstatic when the static sources are unchanged and migrate when
+no migrations are pending, so restarts and scale-outs stay fast.
+Usage: python manage.py startup
+"""
+from django.core.management.base import BaseCommand
+
+from customers.startup import collectstatic_if_changed, migrate_if_pending, timed
+
+
+class Command(BaseCommand):
+    help = 'Runs migrate and collectstatic only when needed, timing each phase'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-static',
+            action='store_true',
+            help='Do not check static files (e.g. when they were collected at build time)'
+        )
+
+    def handle(self, *args, **options):
+        with timed('total', self.log):
+            with timed('migrate', self.log):
+                applied = migrate_if_pending()
+            if applied:
+                self.log(f'Applied {applied} pending migration(s).')
+            else:
+                self.log('No pending migrations; skipped migrate.')
+
+            if not options['skip_static']:
+                with timed('collectstatic', self.log):
+                    collected = collectstatic_if_changed()
+                if collected:
+                    self.log('Static files changed; ran collectstatic.')
+                else:
+                    self.log('Static files unchanged; skipped collectstatic.')
+
+    def log(self, message):
+        self.stdout.write(message)
@@ -0,0 +1,86 @@
+"""
+Middleware for the customers app.
+"""
+import logging
+import re
+import time
+import uuid
+
+from django.utils.functional import SimpleLazyObject
+
+from .logs import request_id_var
+from .models import Exhibition
+
+
+EXHIBITION_SESSION_KEY = 'exhibition_id'
+
+# Incoming request IDs (e.g. from a load balancer) are reused when they look sane
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_logger = logging.getLogger('customers.requests')
+
+
+def get_request_exhibition(request):
+    """
+    Return the exhibition a request is scoped to.
+    Admins can switch their own view to another exhibition (stored in the
+    session); everyone else sees the active exhibition.
+    """
+    session = getattr(request, 'session', None)
+    exhibition_id = session.get(EXHIBITION_SESSION_KEY) if session is not None else None
+    if exhibition_id:
+        exhibition = Exhibition.objects.filter(pk=exhibition_id).first()
+        if exhibition is not None:
+            return exhibition
+    return Exhibition.objects.get_active()
+
+
+class ExhibitionMiddleware:
+    """
+    Attach the scoped exhibition to the request as ``request.exhibition``.
+    The lookup is lazy, so requests that never touch customer data pay nothing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.exhibition = SimpleLazyObject(lambda: get_request_exhibition(request))
+        return self.get_response(request)
+
+
+class RequestLogMiddleware:
+    """
+    Give every request an ID (reusing a sane incoming ``X-Request-ID``),
+    make it available to every log record written while handling the
+    request, return it in the ``X-Request-ID`` response header and log one
+    structured line per request with its status and duration.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            response['X-Request-ID'] = request_id
+            request_logger.log(
+                logging.WARNING if response.status_code >= 500 else logging.INFO,
+                f'{request.method} {request.path} {response.status_code}',
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': duration_ms,
+                }
+            )
+            return response
+        finally:
+            request_id_var.reset(token)
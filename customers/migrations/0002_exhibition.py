@@ -0,0 +1,46 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exhibition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the exhibition', max_length=255)),
+                ('slug', models.SlugField(help_text='Short identifier used in commands and URLs', max_length=64, unique=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=False, help_text='New customers and bills are recorded against the active exhibition')),
+                ('is_closed', models.BooleanField(default=False, help_text='Closed exhibitions can be archived or detached')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Exhibition',
+                'verbose_name_plural': 'Exhibitions',
+                'ordering': ['-start_date', '-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='exhibition',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='single_active_exhibition'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='exhibition',
+            field=models.ForeignKey(db_index=False, help_text='Exhibition the customer registered for', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='customers', to='customers.exhibition'),
+        ),
+        migrations.AddField(
+            model_name='bill',
+            name='exhibition',
+            field=models.ForeignKey(db_index=False, help_text="Exhibition the bill belongs to (always the customer's exhibition)", null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bills', to='customers.exhibition'),
+        ),
+    ]
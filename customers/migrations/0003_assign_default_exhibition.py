@@ -0,0 +1,30 @@
+# Data migration: move existing customers and bills into a default exhibition
+
+from django.db import migrations
+
+
+def assign_default_exhibition(apps, schema_editor):
+    Exhibition = apps.get_model('customers', 'Exhibition')
+    Customer = apps.get_model('customers', 'Customer')
+    Bill = apps.get_model('customers', 'Bill')
+
+    if not Customer.objects.exists() and not Bill.objects.exists():
+        return
+
+    exhibition, _ = Exhibition.objects.get_or_create(
+        slug='default',
+        defaults={'name': 'Default Exhibition', 'is_active': True},
+    )
+    Customer.objects.filter(exhibition__isnull=True).update(exhibition=exhibition)
+    Bill.objects.filter(exhibition__isnull=True).update(exhibition=exhibition)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_exhibition'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_exhibition, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_assign_default_exhibition'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='exhibition',
+            field=models.ForeignKey(db_index=False, help_text='Exhibition the customer registered for', on_delete=django.db.models.deletion.PROTECT, related_name='customers', to='customers.exhibition'),
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='exhibition',
+            field=models.ForeignKey(db_index=False, help_text="Exhibition the bill belongs to (always the customer's exhibition)", on_delete=django.db.models.deletion.PROTECT, related_name='bills', to='customers.exhibition'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['exhibition', '-created_at'], name='customer_exh_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['exhibition', '-created_at'], name='bill_exh_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['exhibition', 'customer'], name='bill_exh_customer_idx'),
+        ),
+    ]
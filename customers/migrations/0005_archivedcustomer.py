@@ -0,0 +1,35 @@
+# Generated migration
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_exhibition_required_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCustomer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_id', models.CharField(db_index=True, help_text='Customer ID the customer was registered with', max_length=8)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('exhibition_name', models.CharField(blank=True, help_text='Exhibition the customer registered for', max_length=255)),
+                ('bill_count', models.PositiveIntegerField(default=0)),
+                ('bill_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('registered_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('archive_file', models.CharField(help_text='Archive file (relative to ARCHIVE_ROOT) holding the full record', max_length=255)),
+                ('archive_line', models.PositiveIntegerField(help_text='Line number of the record within the archive file')),
+            ],
+            options={
+                'verbose_name': 'Archived Customer',
+                'verbose_name_plural': 'Archived Customers',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
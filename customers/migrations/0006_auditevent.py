@@ -0,0 +1,33 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0005_archivedcustomer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.CharField(help_text='Username (or system:<command>) that performed the action', max_length=150)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('export', 'Export'), ('archive', 'Archive')], max_length=16)),
+                ('object_type', models.CharField(blank=True, max_length=64)),
+                ('object_id', models.CharField(blank=True, max_length=64)),
+                ('summary', models.CharField(blank=True, help_text='Human-readable description of the affected object', max_length=255)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the action happened (not when the event was written)')),
+            ],
+            options={
+                'verbose_name': 'Audit Event',
+                'verbose_name_plural': 'Audit Events',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['actor', '-created_at'], name='audit_actor_created_idx'), models.Index(fields=['-created_at'], name='audit_created_idx'), models.Index(fields=['object_type', 'object_id'], name='audit_object_idx')],
+            },
+        ),
+    ]
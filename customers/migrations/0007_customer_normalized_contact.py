@@ -0,0 +1,31 @@
+# Generated migration
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0006_auditevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=24),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['exhibition', 'email_normalized'], name='customer_exh_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['exhibition', 'phone_normalized'], name='customer_exh_phone_idx'),
+        ),
+    ]
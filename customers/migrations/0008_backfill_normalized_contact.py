@@ -0,0 +1,30 @@
+# Data migration: fill the normalized email/phone columns of existing customers
+
+from django.db import migrations
+
+from customers.duplicates import normalize_email, normalize_phone
+
+
+def backfill_normalized_contact(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('pk', 'email', 'phone').iterator(chunk_size=2000):
+        customer.email_normalized = normalize_email(customer.email)
+        customer.phone_normalized = normalize_phone(customer.phone)
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(batch, ['email_normalized', 'phone_normalized'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['email_normalized', 'phone_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0007_customer_normalized_contact'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_normalized_contact, migrations.RunPython.noop),
+    ]
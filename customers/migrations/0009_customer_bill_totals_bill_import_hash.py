@@ -0,0 +1,38 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0008_backfill_normalized_contact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Content hash of the imported POS line (duplicate detection)', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='bill_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='bill_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='bill',
+            constraint=models.UniqueConstraint(fields=('exhibition', 'import_hash'), name='bill_exh_import_hash_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Data migration: calculate bill_count and bill_total of existing customers
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_bill_totals(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    Bill = apps.get_model('customers', 'Bill')
+    bills = Bill.objects.filter(customer=models.OuterRef('pk')).order_by().values('customer')
+    Customer.objects.update(
+        bill_count=Coalesce(
+            models.Subquery(bills.annotate(count=models.Count('pk')).values('count')),
+            0
+        ),
+        bill_total=Coalesce(
+            models.Subquery(bills.annotate(total=models.Sum('amount')).values('total')),
+            Decimal('0'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0009_customer_bill_totals_bill_import_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Data migration: create the change sequence and number existing rows
+
+from django.db import migrations, models
+
+
+SEQUENCE_NAME = 'customers_change_seq'
+
+
+def number_existing_rows(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    Bill = apps.get_model('customers', 'Bill')
+    ChangeCounter = apps.get_model('customers', 'ChangeCounter')
+
+    Bill.objects.update(updated_at=models.F('created_at'))
+
+    seq = 0
+    for model, ordering in ((Customer, 'updated_at'), (Bill, 'created_at')):
+        batch = []
+        for obj in model.objects.only('pk').order_by(ordering, 'pk').iterator(chunk_size=2000):
+            seq += 1
+            obj.change_seq = seq
+            batch.append(obj)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, ['change_seq'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['change_seq'])
+
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}')
+        if seq:
+            schema_editor.execute('SELECT setval(%s, %s)', [SEQUENCE_NAME, seq])
+    else:
+        ChangeCounter.objects.update_or_create(pk=1, defaults={'value': seq})
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0011_change_feed'),
+    ]
+
+    operations = [
+        migrations.RunPython(number_existing_rows, drop_sequence),
+    ]
@@ -0,0 +1,23 @@
+# Generated migration
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0012_backfill_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='hex_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bill',
+            name='customer_ref',
+            field=models.IntegerField(null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Data migration: store every Customer ID as a 32-bit integer and point bills at it
+
+from django.db import migrations, models
+
+from customers.fields import HEX_ID_RE, hex_to_int
+
+
+def backfill_hex_id(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    Bill = apps.get_model('customers', 'Bill')
+
+    invalid = [
+        customer_id for customer_id in Customer.objects.values_list('customer_id', flat=True)
+        if not HEX_ID_RE.match(customer_id.upper())
+    ]
+    if invalid:
+        raise RuntimeError(
+            f'{len(invalid)} customer ID(s) are not 8 hex characters '
+            f'(e.g. {", ".join(invalid[:5])}); fix them before migrating.'
+        )
+
+    batch = []
+    for customer in Customer.objects.only('pk', 'customer_id').iterator(chunk_size=2000):
+        customer.hex_id = hex_to_int(customer.customer_id)
+        batch.append(customer)
+        if len(batch) == 2000:
+            Customer.objects.bulk_update(batch, ['hex_id'])
+            batch = []
+    Customer.objects.bulk_update(batch, ['hex_id'])
+
+    Bill.objects.update(
+        customer_ref=models.Subquery(
+            Customer.objects.filter(pk=models.OuterRef('customer_id')).values('hex_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0013_customer_hex_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hex_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated migration
+
+import customers.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0014_backfill_hex_id'),
+    ]
+
+    operations = [
+        # Drop the old surrogate-key relation and the character ID
+        migrations.RemoveIndex(
+            model_name='bill',
+            name='bill_exh_customer_idx',
+        ),
+        migrations.RemoveField(
+            model_name='bill',
+            name='customer',
+        ),
+        migrations.RemoveField(
+            model_name='customer',
+            name='customer_id',
+        ),
+        # Promote the integer ID to primary key, dropping the old one first
+        # (PostgreSQL allows only one primary key constraint at a time)
+        migrations.RemoveField(
+            model_name='customer',
+            name='id',
+        ),
+        migrations.RenameField(
+            model_name='customer',
+            old_name='hex_id',
+            new_name='customer_id',
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='customer_id',
+            field=customers.fields.HexIdField(editable=False, help_text='Unique 8-character customer ID', primary_key=True, serialize=False, verbose_name='Customer ID'),
+        ),
+        # Bills reference the Customer ID directly
+        migrations.RenameField(
+            model_name='bill',
+            old_name='customer_ref',
+            new_name='customer',
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='customer',
+            field=models.ForeignKey(help_text='Customer associated with this bill', on_delete=django.db.models.deletion.CASCADE, related_name='bills', to='customers.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['exhibition', 'customer'], name='bill_exh_customer_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated migration
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0016_customer_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='receipts_opt_in',
+            field=models.BooleanField(default=False, help_text='Email the customer a digest of their new bills', verbose_name='Email receipts'),
+        ),
+        migrations.CreateModel(
+            name='PendingReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bill_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('customer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pending_receipts', to='customers.customer')),
+            ],
+            options={
+                'verbose_name': 'Pending Receipt',
+                'verbose_name_plural': 'Pending Receipts',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['customer', 'created_at'], name='pending_receipt_customer_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Data migration: notify the live ticker of customer and bill changes (PostgreSQL)
+
+from django.db import migrations
+
+
+CHANNEL = 'customers_ticker'
+FUNCTION_NAME = 'customers_notify_ticker'
+TRIGGER_NAME = 'customers_ticker_notify'
+TABLES = ('customers_customer', 'customers_bill')
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE OR REPLACE FUNCTION {FUNCTION_NAME}() RETURNS trigger AS $$ '
+        f"BEGIN PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME); RETURN NULL; END; "
+        f'$$ LANGUAGE plpgsql'
+    )
+    # Statement-level, so a bulk import notifies once rather than per row
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE TRIGGER {TRIGGER_NAME} AFTER INSERT OR UPDATE OR DELETE ON {table} '
+            f'FOR EACH STATEMENT EXECUTE PROCEDURE {FUNCTION_NAME}()'
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON {table}')
+    schema_editor.execute(f'DROP FUNCTION IF EXISTS {FUNCTION_NAME}()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0017_receipts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
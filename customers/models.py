@@ -1,24 +1,194 @@
 """
 Models for Customer and Bill management.
 """
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
 from django.core.validators import EmailValidator
-import uuid
+import secrets
 from django.utils import timezone
 
+from .fields import HexIdField, int_to_hex
+from .sequences import next_change_seq, next_change_seq_expression, next_change_seq_per_row
+from .duplicates import NORMALIZED_PHONE_MAX_LENGTH, normalize_email, normalize_phone
+
+
+class ExhibitionManager(models.Manager):
+    """Manager for Exhibition with helpers for the active event."""
+
+    def get_active(self):
+        """
+        Return the exhibition new customers and bills are recorded against.
+        Falls back to the most recent exhibition, and creates a default one
+        the first time the system is used.
+        """
+        exhibition = self.filter(is_active=True).first() or self.order_by('-id').first()
+        if exhibition is None:
+            try:
+                with transaction.atomic():
+                    exhibition, _ = self.get_or_create(
+                        slug='default',
+                        defaults={'name': 'Default Exhibition', 'is_active': True}
+                    )
+            except IntegrityError:
+                # A concurrent first request created an (active) exhibition
+                exhibition = self.filter(is_active=True).first() or self.order_by('-id').first()
+        return exhibition
+
+
+class Exhibition(models.Model):
+    """
+    An exhibition (event). Customers and bills are scoped to one exhibition
+    so that a single deployment can be reused across events.
+    """
+    name = models.CharField(
+        max_length=255,
+        help_text="Name of the exhibition"
+    )
+
+    slug = models.SlugField(
+        max_length=64,
+        unique=True,
+        help_text="Short identifier used in commands and URLs"
+    )
+
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+
+    is_active = models.BooleanField(
+        default=False,
+        help_text="New customers and bills are recorded against the active exhibition"
+    )
+
+    is_closed = models.BooleanField(
+        default=False,
+        help_text="Closed exhibitions can be archived or detached"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ExhibitionManager()
+
+    class Meta:
+        ordering = ['-start_date', '-created_at']
+        verbose_name = 'Exhibition'
+        verbose_name_plural = 'Exhibitions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=models.Q(is_active=True),
+                name='single_active_exhibition'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def activate(self):
+        """Make this the active exhibition for everyone."""
+        with transaction.atomic():
+            Exhibition.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+            self.is_active = True
+            self.save(update_fields=['is_active'])
+
+
+def draw_customer_id():
+    """
+    A random Customer ID that no archived customer was registered with, so an
+    ID never refers to two people across the live and archived records.
+    """
+    while True:
+        customer_id = int_to_hex(secrets.randbits(32))
+        if not ArchivedCustomer.objects.filter(customer_id=customer_id).exists():
+            return customer_id
+
+
+class CustomerManager(models.Manager):
+    """Manager for Customer with bulk helpers for the billing aggregates."""
+
+    # Attempts at drawing a free random Customer ID before giving up
+    REGISTER_ID_ATTEMPTS = 5
+
+    def register(self, exhibition, name, email, phone, receipts_opt_in=False):
+        """
+        Create a customer with a single INSERT: the Customer ID is drawn at
+        random and redrawn on the rare collision instead of being probed
+        first, and the change sequence is allocated by the INSERT itself.
+        Only the archive, which the primary key does not cover, is checked
+        beforehand. Returns the new customer (its change_seq is loaded on
+        access).
+        """
+        for attempt in range(self.REGISTER_ID_ATTEMPTS):
+            customer = self.model(
+                customer_id=draw_customer_id(),
+                exhibition=exhibition,
+                name=name,
+                email=email,
+                phone=phone,
+                email_normalized=normalize_email(email),
+                phone_normalized=normalize_phone(phone),
+                receipts_opt_in=receipts_opt_in,
+                change_seq=next_change_seq_expression(),
+            )
+            try:
+                with transaction.atomic():
+                    self.bulk_create([customer])
+            except IntegrityError:
+                # The primary key is the only unique column, so the ID was taken
+                if attempt == self.REGISTER_ID_ATTEMPTS - 1:
+                    raise
+                continue
+            if hasattr(customer.change_seq, 'resolve_expression'):
+                del customer.change_seq  # Deferred: read back from the row when needed
+            return customer
+
+    def refresh_bill_totals(self, customer_pks):
+        """
+        Recalculate bill_count and bill_total for the given customers
+        with a single UPDATE. The rows get a new change sequence and
+        updated_at, like any other save, so the change feed and readers of
+        recently changed customers (e.g. the customer index overlay) see
+        the new totals.
+        """
+        customer_pks = list(customer_pks)
+        if not customer_pks:
+            return 0
+        bills = Bill.objects.filter(customer=models.OuterRef('pk')).order_by().values('customer')
+        return self.filter(pk__in=customer_pks).update(
+            change_seq=next_change_seq_per_row(customer_pks),
+            updated_at=timezone.now(),
+            bill_count=Coalesce(
+                models.Subquery(bills.annotate(count=models.Count('pk')).values('count')),
+                0
+            ),
+            bill_total=Coalesce(
+                models.Subquery(bills.annotate(total=models.Sum('amount')).values('total')),
+                Decimal('0'),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+
 
 class Customer(models.Model):
     """
     Customer model to store customer information.
     """
-    # Unique customer ID (8-character alphanumeric)
-    customer_id = models.CharField(
-        max_length=8, 
-        unique=True, 
+    # Unique customer ID (8 hex characters, stored as a 32-bit integer).
+    # It is the primary key, so bills reference it directly.
+    customer_id = HexIdField(
+        primary_key=True,
         editable=False,
-        db_index=True,
+        verbose_name="Customer ID",
         help_text="Unique 8-character customer ID"
     )
+
+    exhibition = models.ForeignKey(
+        Exhibition,
+        on_delete=models.PROTECT,
+        related_name='customers',
+        db_index=False,  # Covered by the indexes leading with exhibition
+        help_text="Exhibition the customer registered for"
+    )
     
     # Customer details
     name = models.CharField(
@@ -35,6 +205,10 @@ class Customer(models.Model):
         max_length=20,
         help_text="Contact phone number"
     )
+
+    # Normalized copies used for duplicate detection
+    email_normalized = models.CharField(max_length=254, editable=False, blank=True)
+    phone_normalized = models.CharField(max_length=NORMALIZED_PHONE_MAX_LENGTH, editable=False, blank=True)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -46,26 +220,77 @@ class Customer(models.Model):
         help_text="Whether welcome email with QR code has been sent"
     )
 
+    # Receipt digests (see customers.receipts)
+    receipts_opt_in = models.BooleanField(
+        default=False,
+        verbose_name="Email receipts",
+        help_text="Email the customer a digest of their new bills"
+    )
+
+    # Billing aggregates, kept up to date when bills are saved or deleted.
+    # Ordinary saves leave them alone (see save())
+    bill_count = models.PositiveIntegerField(default=0, editable=False)
+    bill_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    # Position in the change feed, bumped on every save
+    change_seq = models.BigIntegerField(default=0, editable=False, db_index=True)
+
+    objects = CustomerManager()
+
+    # Maintained by CustomerManager.refresh_bill_totals, not by save()
+    BILL_TOTAL_FIELDS = ('bill_count', 'bill_total')
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
+        indexes = [
+            models.Index(fields=['exhibition', '-created_at'], name='customer_exh_created_idx'),
+            models.Index(fields=['exhibition', 'email_normalized'], name='customer_exh_email_idx'),
+            models.Index(fields=['exhibition', 'phone_normalized'], name='customer_exh_phone_idx'),
+            models.Index(fields=['updated_at'], name='customer_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.customer_id})"
 
     def save(self, *args, **kwargs):
-        """Generate unique customer ID before saving."""
+        """
+        Generate unique customer ID, assign the exhibition and normalize
+        contact details before saving.
+        """
         if not self.customer_id:
             self.customer_id = self.generate_unique_id()
+            # The ID was just generated, so skip the UPDATE Django would try first
+            if not kwargs.get('update_fields'):
+                kwargs.setdefault('force_insert', True)
+        if not self.exhibition_id:
+            self.exhibition = Exhibition.objects.get_active()
+        self.email_normalized = normalize_email(self.email)
+        self.phone_normalized = normalize_phone(self.phone)
+        self.change_seq = next_change_seq()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Don't write back totals a bill at another desk may have moved since loading
+            skip = self.get_deferred_fields() | set(self.BILL_TOTAL_FIELDS)
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skip and field.name not in skip
+            ]
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'change_seq', 'updated_at'}
+            if 'email' in update_fields:
+                update_fields.add('email_normalized')
+            if 'phone' in update_fields:
+                update_fields.add('phone_normalized')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
 
     @staticmethod
     def generate_unique_id():
-        """Generate a unique 8-character alphanumeric ID."""
+        """Generate a unique 8-character hexadecimal ID."""
         while True:
-            # Generate 8-character UUID-based ID
-            new_id = str(uuid.uuid4().hex)[:8].upper()
+            new_id = draw_customer_id()
             if not Customer.objects.filter(customer_id=new_id).exists():
                 return new_id
 
@@ -88,6 +313,14 @@ class Bill(models.Model):
         related_name='bills',
         help_text="Customer associated with this bill"
     )
+
+    exhibition = models.ForeignKey(
+        Exhibition,
+        on_delete=models.PROTECT,
+        related_name='bills',
+        db_index=False,  # Covered by the indexes leading with exhibition
+        help_text="Exhibition the bill belongs to (always the customer's exhibition)"
+    )
     
     amount = models.DecimalField(
         max_digits=10,
@@ -101,7 +334,8 @@ class Bill(models.Model):
         help_text="Optional description of the bill"
     )
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so imported bills keep the time of the original sale
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     created_by = models.CharField(
         max_length=255,
         blank=True,
@@ -109,11 +343,230 @@ class Bill(models.Model):
         help_text="Admin user who created this bill"
     )
 
+    import_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Content hash of the imported POS line (duplicate detection)"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Position in the change feed, bumped on every save
+    change_seq = models.BigIntegerField(default=0, editable=False, db_index=True)
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Bill'
         verbose_name_plural = 'Bills'
+        indexes = [
+            models.Index(fields=['exhibition', '-created_at'], name='bill_exh_created_idx'),
+            models.Index(fields=['exhibition', 'customer'], name='bill_exh_customer_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['exhibition', 'import_hash'],
+                name='bill_exh_import_hash_uniq'
+            ),
+        ]
 
     def __str__(self):
         return f"Bill for {self.customer.name} - ${self.amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded customer so moving a bill refreshes both totals."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_customer_id = instance.__dict__.get('customer_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Keep the bill in the same exhibition as its customer and bump its change sequence."""
+        customer_changed = self.customer_id != getattr(self, '_loaded_customer_id', None)
+        if self.customer_id and (customer_changed or not self.exhibition_id):
+            self.exhibition_id = self.customer.exhibition_id
+        self.change_seq = next_change_seq()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'change_seq', 'updated_at'}
+            if 'customer' in update_fields or 'customer_id' in update_fields:
+                update_fields.add('exhibition')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+
+class ArchivedCustomer(models.Model):
+    """
+    Index of customers moved out of the live tables by ``archive_data``.
+    The full customer record and its bills live in a compressed JSONL file;
+    this table keeps just enough to look them up by customer ID.
+    """
+    customer_id = models.CharField(
+        max_length=8,
+        db_index=True,
+        help_text="Customer ID the customer was registered with"
+    )
+
+    name = models.CharField(max_length=255)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+
+    exhibition_name = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Exhibition the customer registered for"
+    )
+
+    bill_count = models.PositiveIntegerField(default=0)
+    bill_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    registered_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    archive_file = models.CharField(
+        max_length=255,
+        help_text="Archive file (relative to ARCHIVE_ROOT) holding the full record"
+    )
+
+    archive_line = models.PositiveIntegerField(
+        help_text="Line number of the record within the archive file"
+    )
+
+    class Meta:
+        ordering = ['-archived_at']
+        verbose_name = 'Archived Customer'
+        verbose_name_plural = 'Archived Customers'
+
+    def __str__(self):
+        return f"{self.name} ({self.customer_id})"
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only record of who did what.
+    Written in batches by customers.audit.AuditLog, never updated.
+    """
+    ACTION_CREATE = 'create'
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    ACTION_EXPORT = 'export'
+    ACTION_ARCHIVE = 'archive'
+    ACTION_CHOICES = [
+        (ACTION_CREATE, 'Create'),
+        (ACTION_UPDATE, 'Update'),
+        (ACTION_DELETE, 'Delete'),
+        (ACTION_EXPORT, 'Export'),
+        (ACTION_ARCHIVE, 'Archive'),
+    ]
+
+    actor = models.CharField(
+        max_length=150,
+        help_text="Username (or system:<command>) that performed the action"
+    )
+
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+
+    object_type = models.CharField(max_length=64, blank=True)
+    object_id = models.CharField(max_length=64, blank=True)
+
+    summary = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Human-readable description of the affected object"
+    )
+
+    details = models.JSONField(default=dict, blank=True)
+
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the action happened (not when the event was written)"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Audit Event'
+        verbose_name_plural = 'Audit Events'
+        indexes = [
+            models.Index(fields=['actor', '-created_at'], name='audit_actor_created_idx'),
+            models.Index(fields=['-created_at'], name='audit_created_idx'),
+            models.Index(fields=['object_type', 'object_id'], name='audit_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor} {self.action} {self.object_type} {self.object_id}".strip()
+
+
+class Tombstone(models.Model):
+    """
+    Marker left in the change feed when a customer or bill is removed
+    from the live tables (deleted, purged or archived).
+    """
+    REASON_DELETED = 'deleted'
+    REASON_ARCHIVED = 'archived'
+    REASON_CHOICES = [
+        (REASON_DELETED, 'Deleted'),
+        (REASON_ARCHIVED, 'Archived'),
+    ]
+
+    object_type = models.CharField(max_length=16)
+    object_key = models.CharField(
+        max_length=64,
+        help_text="customer_id for customers, primary key for bills"
+    )
+    exhibition_id = models.BigIntegerField(null=True)
+    reason = models.CharField(max_length=16, choices=REASON_CHOICES, default=REASON_DELETED)
+    change_seq = models.BigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['change_seq']
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_key} ({self.reason})"
+
+
+class ChangeCounter(models.Model):
+    """
+    Single-row counter for the change feed sequence on databases without
+    native sequences (PostgreSQL uses ``customers_change_seq`` instead).
+    """
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Change Counter'
+
+
+class PendingReceipt(models.Model):
+    """
+    A bill still to be included in its customer's next receipt digest.
+    Rows are written when bills are created for customers who opted in and
+    removed once the digest is sent. The bill is referenced by its plain
+    key, so deleting a bill never has to touch this table.
+    """
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='pending_receipts',
+        db_index=False  # Covered by pending_receipt_customer_idx
+    )
+    bill_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # Failed sends back off instead of blocking the queue (see customers.receipts)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Pending Receipt'
+        verbose_name_plural = 'Pending Receipts'
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='pending_receipt_customer_idx'),
+        ]
+
+    def __str__(self):
+        return f"Receipt for bill {self.bill_id} ({self.customer_id})"
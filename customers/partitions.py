@@ -0,0 +1,177 @@
+"""
+PostgreSQL declarative partitioning of the bill table by exhibition.
+
+Partitioning is opt-in (see the ``partition_bills`` management command).
+Once ``customers_bill`` is partitioned, every exhibition gets its own
+partition, so queries for the current event only touch that event's rows and
+past events can be detached without rewriting the table.
+"""
+from django.db import connection, transaction
+
+
+BILL_TABLE = 'customers_bill'
+DEFAULT_PARTITION = 'customers_bill_default'
+
+
+def partitioning_supported():
+    """Partitioning is only available on PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def partition_name(exhibition_id):
+    """Name of the partition holding the bills of one exhibition."""
+    return f'{BILL_TABLE}_ex_{int(exhibition_id)}'
+
+
+def is_partitioned():
+    """Return True if the bill table has already been converted."""
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table pt '
+            'JOIN pg_class c ON c.oid = pt.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [BILL_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def ensure_partition(exhibition_id):
+    """
+    Create the partition for an exhibition if the bill table is partitioned.
+    Rows already sitting in the default partition are moved across.
+    """
+    if not is_partitioned():
+        return False
+
+    name = partition_name(exhibition_id)
+    exhibition_id = int(exhibition_id)
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        # A partition cannot be attached while the default partition still
+        # holds rows for its key, so move them out first.
+        cursor.execute(
+            f'CREATE TEMP TABLE _bill_move ON COMMIT DROP AS '
+            f'SELECT * FROM {qn(DEFAULT_PARTITION)} WHERE exhibition_id = %s',
+            [exhibition_id]
+        )
+        cursor.execute(
+            f'DELETE FROM {qn(DEFAULT_PARTITION)} WHERE exhibition_id = %s',
+            [exhibition_id]
+        )
+        cursor.execute(
+            f'CREATE TABLE {qn(name)} PARTITION OF {qn(BILL_TABLE)} '
+            f'FOR VALUES IN ({exhibition_id})'
+        )
+        cursor.execute(f'INSERT INTO {qn(BILL_TABLE)} SELECT * FROM _bill_move')
+    return True
+
+
+def detach_partition(exhibition_id):
+    """
+    Detach an exhibition's partition from the bill table.
+    The detached table is kept (renamed with a ``_detached`` suffix) so it can
+    be dumped or dropped separately; its rows disappear from all bill queries.
+    """
+    if not is_partitioned():
+        raise RuntimeError('The bill table is not partitioned.')
+
+    name = partition_name(exhibition_id)
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is None:
+            raise RuntimeError(f'No partition {name} exists.')
+        cursor.execute(f'ALTER TABLE {qn(BILL_TABLE)} DETACH PARTITION {qn(name)}')
+        cursor.execute(f'ALTER TABLE {qn(name)} RENAME TO {qn(name + "_detached")}')
+    return name + '_detached'
+
+
+def convert_bill_table(exhibition_ids):
+    """
+    Convert ``customers_bill`` into a table partitioned by LIST (exhibition_id).
+
+    Runs in a single transaction holding an exclusive lock on the table. The
+    primary key becomes (exhibition_id, id), which PostgreSQL requires for a
+    partitioned table; ``id`` stays unique because it is still drawn from one
+    sequence. Non-unique indexes and foreign keys are recreated on the new
+    parent so they cascade to every partition, and triggers are recreated on
+    the parent.
+    """
+    if not partitioning_supported():
+        raise RuntimeError('Bill partitioning requires PostgreSQL.')
+    if is_partitioned():
+        return False
+
+    qn = connection.ops.quote_name
+    new = f'{BILL_TABLE}_partitioned'
+    seq = f'{BILL_TABLE}_id_seq'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(BILL_TABLE)} IN ACCESS EXCLUSIVE MODE')
+
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid), indisunique '
+            'FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [BILL_TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [BILL_TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal',
+            [BILL_TABLE]
+        )
+        triggers = [definition for definition, in cursor.fetchall()]
+
+        # Identity columns are not supported on partitioned tables before
+        # PostgreSQL 17, so ids come from a plain sequence instead.
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {qn(seq + "_p")}')
+        cursor.execute(
+            f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {qn(BILL_TABLE)}), 0) + 1, false)',
+            [seq + '_p']
+        )
+        cursor.execute(
+            f'CREATE TABLE {qn(new)} (LIKE {qn(BILL_TABLE)} INCLUDING DEFAULTS) '
+            f'PARTITION BY LIST (exhibition_id)'
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(new)} ALTER COLUMN id SET DEFAULT nextval('{seq}_p')"
+        )
+        cursor.execute(f'ALTER TABLE {qn(new)} ADD PRIMARY KEY (exhibition_id, id)')
+        cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(new)} DEFAULT')
+        for exhibition_id in exhibition_ids:
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(exhibition_id))} PARTITION OF {qn(new)} '
+                f'FOR VALUES IN ({int(exhibition_id)})'
+            )
+        cursor.execute(f'INSERT INTO {qn(new)} SELECT * FROM {qn(BILL_TABLE)}')
+
+        cursor.execute(f'DROP TABLE {qn(BILL_TABLE)}')
+        cursor.execute(f'ALTER TABLE {qn(new)} RENAME TO {qn(BILL_TABLE)}')
+        cursor.execute(f'ALTER SEQUENCE {qn(seq + "_p")} OWNED BY {qn(BILL_TABLE)}.id')
+
+        for definition, unique in indexes:
+            if unique and 'exhibition_id' not in definition:
+                # Unique indexes on a partitioned table must include the
+                # partition key; such an index cannot be carried over.
+                continue
+            # The definitions were captured under the original table name,
+            # which now refers to the partitioned parent.
+            cursor.execute(definition)
+        for constraint_name, definition in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE {qn(BILL_TABLE)} ADD CONSTRAINT {qn(constraint_name)} {definition}'
+            )
+        for definition in triggers:
+            # e.g. the live ticker's change notification
+            cursor.execute(definition)
+    return True
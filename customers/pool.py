@@ -0,0 +1,246 @@
+"""
+Per-process database connection pool.
+
+Django 4.2 keeps at most one persistent connection per thread and closes it
+again when the thread goes away (or never, for threads that forget to call
+``connections.close_all()``). The ``customers.pooled_postgresql`` engine
+instead checks connections out of a ``ConnectionPool`` when Django connects
+and hands them back when Django closes them, so requests and background
+threads share a small, bounded set of open connections per worker.
+
+Idle connections are health-checked before reuse once they have sat unused
+for a while, and replaced after a maximum lifetime. Connections still held
+by threads that have died are counted as leaks and closed, which frees their
+slot. ``pool_stats()`` reports checkouts, waits, timeouts and leaks for the
+monitoring endpoint.
+
+Threads started by request code should use ``start_background_thread`` so
+their connections go back to the pool when they finish.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections. ``checkout`` takes a ``connect``
+    callable to open a new connection and a ``check`` callable that returns
+    whether an idle connection still works.
+    """
+
+    def __init__(self, max_size=5, timeout=10.0, health_check_seconds=30, max_lifetime=3600):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_seconds = health_check_seconds
+        self.max_lifetime = max_lifetime
+        self._cond = threading.Condition()
+        self._idle = deque()    # (connection, opened_at, returned_at)
+        self._in_use = {}       # id(connection) -> (connection, opened_at, thread)
+        self._size = 0          # idle + in use + being opened
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.discarded = 0
+        self.leaks = 0
+
+    def checkout(self, connect, check):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                self._reclaim_leaks()
+                if self._idle:
+                    entry = self._idle.pop()  # Most recently used first; the rest can age out
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection free within {self.timeout}s '
+                        f'(pool size {self.max_size})'
+                    )
+                waited = True
+                # Leaked connections do not notify, so look again at least every second.
+                self._cond.wait(min(remaining, 1.0))
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - started
+
+        if entry is not None:
+            connection, opened_at, returned_at = entry
+            now = time.monotonic()
+            if now - opened_at >= self.max_lifetime or (
+                now - returned_at >= self.health_check_seconds and not check(connection)
+            ):
+                self._close(connection)
+                with self._cond:
+                    self.discarded += 1
+                entry = None
+        if entry is None:
+            try:
+                connection = connect()
+            except BaseException:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            opened_at = time.monotonic()
+            with self._cond:
+                self.opened += 1
+
+        with self._cond:
+            self._in_use[id(connection)] = (connection, opened_at, threading.current_thread())
+            self.checkouts += 1
+        return connection
+
+    def checkin(self, connection, discard=False):
+        """Return a checked-out connection; ``discard`` closes it instead."""
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is not None and entry[0] is not connection:
+                self._in_use[id(connection)] = entry
+                entry = None
+            if entry is not None:
+                if discard:
+                    self._size -= 1
+                    self.discarded += 1
+                else:
+                    self._idle.append((connection, entry[1], time.monotonic()))
+                self._cond.notify()
+        if entry is None or discard:
+            # Not ours (e.g. already reclaimed as a leak) or not reusable
+            self._close(connection)
+
+    def close(self):
+        """Close every idle connection (checked-out ones are closed on checkin)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._cond:
+            self._reclaim_leaks()
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_ms': round(self.wait_seconds * 1000, 1),
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'discarded': self.discarded,
+                'leaks': self.leaks,
+            }
+
+    def _reclaim_leaks(self):
+        # Called with the lock held
+        leaked = [
+            (key, connection, thread)
+            for key, (connection, _, thread) in self._in_use.items()
+            if not thread.is_alive()
+        ]
+        for key, connection, thread in leaked:
+            del self._in_use[key]
+            self._size -= 1
+            self.leaks += 1
+            logger.warning(
+                'Closed a database connection leaked by finished thread %s', thread.name,
+                extra={'thread_name': thread.name}
+            )
+            self._close(connection)
+        if leaked:
+            self._cond.notify_all()
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+# Pools inherited across fork() hold the parent's sockets. They are kept
+# referenced, never closed, so garbage collection cannot end the parent's
+# sessions from the child.
+_inherited_pools = []
+
+
+def get_pool(alias, settings_dict):
+    """Return this process's pool for the database ``alias``."""
+    global _pools_pid
+    pid = os.getpid()
+    if _pools_pid == pid and alias in _pools:
+        return _pools[alias]
+    with _pools_lock:
+        if _pools_pid != pid:
+            _inherited_pools.extend(_pools.values())
+            _pools.clear()
+            _pools_pid = pid
+        if alias not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[alias] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', 5),
+                timeout=options.get('TIMEOUT', 10.0),
+                health_check_seconds=options.get('HEALTH_CHECK_SECONDS', 30),
+                max_lifetime=options.get('MAX_LIFETIME', 3600),
+            )
+        return _pools[alias]
+
+
+def pool_stats():
+    """Stats of this process's pools, by database alias."""
+    if _pools_pid != os.getpid():
+        return {}
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def close_pools():
+    """Close every idle pooled connection of this process (e.g. before fork)."""
+    if _pools_pid != os.getpid():
+        return
+    for pool in list(_pools.values()):
+        pool.close()
+
+
+def start_background_thread(target, *args, name=None):
+    """
+    Run ``target(*args)`` in a daemon thread that keeps the caller's context
+    (request ID for logging) and returns its database connections when done.
+    """
+    def run():
+        try:
+            target(*args)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(run,), name=name, daemon=True)
+    thread.start()
+    return thread
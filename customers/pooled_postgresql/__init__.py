@@ -0,0 +1,5 @@
+"""
+PostgreSQL database engine whose connections come from customers.pool.
+Use it as ENGINE 'customers.pooled_postgresql' with CONN_MAX_AGE 0 and the
+pool's limits under a 'POOL' key of the database settings.
+"""
@@ -0,0 +1,65 @@
+"""
+Django's PostgreSQL backend with connections checked out of the process's
+connection pool instead of opened and closed per request.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from customers.pool import PoolTimeout, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        opened = []
+
+        def connect():
+            opened.append(True)
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        try:
+            connection = self.pool.checkout(connect, self._is_healthy)
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+        if not opened:
+            # The parent sets this while opening a connection; set it the same way on reuse.
+            self.isolation_level = IsolationLevel(
+                self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+            )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # A connection closed inside atomic() stays attached to this wrapper
+        # until the block exits, so it cannot go back to the pool.
+        reusable = not self.in_atomic_block and self._reset(self.connection)
+        self.pool.checkin(self.connection, discard=not reusable)
+
+    def _reset(self, connection):
+        """Roll back any open transaction; return whether the connection is reusable."""
+        extensions = self.Database.extensions
+        if connection.closed:
+            return False
+        try:
+            status = connection.info.transaction_status
+            if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+                connection.rollback()
+                status = connection.info.transaction_status
+        except self.Database.Error:
+            return False
+        return status == extensions.TRANSACTION_STATUS_IDLE
+
+    def _is_healthy(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except self.Database.Error:
+            return False
+        return self._reset(connection)
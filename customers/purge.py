@@ -0,0 +1,93 @@
+"""
+Bulk deletion of customers with their bills.
+
+Django's delete collector loads every related bill into memory and deletes
+everything in one transaction that holds locks on the bill table for its
+whole duration. ``purge_customers`` instead walks the customers in primary
+key order, deletes their bills in bounded chunks (one short transaction
+each, refreshing each customer's totals once its bills are gone) and then
+deletes the customers themselves. Tombstones are recorded for the change feed and cached
+statements are dropped, just as the delete signals would have done.
+"""
+from django.db import transaction
+
+from .changefeed import record_tombstones
+from .models import Bill, Customer, PendingReceipt
+from .statements import invalidate_statements
+
+
+def count_purge(queryset):
+    """Return (customers, bills) that purging ``queryset`` would delete."""
+    customers = queryset.count()
+    bills = Bill.objects.filter(customer__in=queryset.order_by().values('pk')).count()
+    return customers, bills
+
+
+def _delete_bills(bills):
+    """Delete (pk, exhibition_id) bills and leave tombstones for them."""
+    record_tombstones([('bill', pk, exhibition_id) for pk, exhibition_id in bills])
+    Bill.objects.filter(pk__in=[pk for pk, _ in bills])._raw_delete(Bill.objects.db)
+
+
+def purge_customers(queryset, chunk_size=500, bill_chunk_size=5000):
+    """
+    Delete the customers in ``queryset`` and all their bills.
+    This is a generator yielding (customers_deleted, bills_deleted) after
+    every transaction; iterate it to completion.
+    """
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        customer_pks = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not customer_pks:
+            return
+        last_pk = customer_pks[-1]
+
+        # Bills first, a bounded chunk per transaction. They go in customer
+        # order, so each customer's totals are refreshed once, by the chunk
+        # that deletes its last bill (only the chunk's last customer may
+        # have more bills in the next one)
+        unrefreshed = set()
+        try:
+            while True:
+                with transaction.atomic():
+                    bills = list(
+                        Bill.objects.filter(customer__in=customer_pks)
+                        .order_by('customer_id', 'pk')
+                        .values_list('pk', 'exhibition_id', 'customer_id')[:bill_chunk_size]
+                    )
+                    if bills:
+                        _delete_bills([(pk, exhibition_id) for pk, exhibition_id, _ in bills])
+                        unrefreshed.update(customer_pk for _, _, customer_pk in bills)
+                    finished = unrefreshed - {bills[-1][2]} if len(bills) == bill_chunk_size else unrefreshed
+                    Customer.objects.refresh_bill_totals(finished)
+                    unrefreshed -= finished
+                if not bills:
+                    break
+                yield 0, len(bills)
+        finally:
+            if unrefreshed:
+                # Stopped part-way through a customer's bills; keep its totals right
+                Customer.objects.refresh_bill_totals(unrefreshed)
+
+        # Then the customers; bills added in the meantime go with them
+        with transaction.atomic():
+            customers = list(
+                Customer.objects.filter(pk__in=customer_pks)
+                .select_for_update()
+                .values_list('pk', 'exhibition_id')
+            )
+            late_bills = list(
+                Bill.objects.filter(customer__in=customer_pks).values_list('pk', 'exhibition_id')
+            )
+            if late_bills:
+                _delete_bills(late_bills)
+            record_tombstones([
+                ('customer', customer_pk, exhibition_id) for customer_pk, exhibition_id in customers
+            ])
+            PendingReceipt.objects.filter(customer__in=customer_pks).delete()
+            Customer.objects.filter(pk__in=customer_pks)._raw_delete(Customer.objects.db)
+            invalidate_statements(customer_pks)
+        yield len(customers), len(late_bills)
@@ -0,0 +1,196 @@
+"""
+Opt-in receipt digests.
+
+Creating a bill for a customer who opted in only records a PendingReceipt.
+``send_receipt_digests`` (the send_receipt_digests command, run every minute
+or so from cron) picks the customers whose oldest pending receipt is older
+than the digest window and sends each of them one email covering all their
+pending bills, so a busy shopper gets one message instead of one per bill.
+
+The email template is compiled once per process, and every digest of a run
+goes out over the same SMTP connection. Each batch locks its pending rows
+(``SELECT ... FOR UPDATE SKIP LOCKED``) while it sends, so runs that overlap
+never mail the same digest twice. A digest that cannot be sent stays
+pending and is retried after a growing delay, so an address the mail server
+always rejects does not hold up everyone behind it; after
+RECEIPT_DIGEST_MAX_ATTEMPTS failures its receipts are dropped.
+"""
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Bill, Customer, PendingReceipt
+from .statements import statement_url
+
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = 'customers/receipt_digest.txt'
+
+
+@dataclass
+class DigestResult:
+    """Counters reported while and after sending digests."""
+    digests: int = 0
+    bills: int = 0
+    failed: int = 0
+    skipped: int = 0
+    abandoned: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self):
+        """Digests sent per second."""
+        return self.digests / self.seconds if self.seconds else 0.0
+
+
+@lru_cache(maxsize=None)
+def _digest_template():
+    return get_template(TEMPLATE_NAME)
+
+
+def record_pending_receipts(bills):
+    """
+    Queue receipts for the bills in the ``bills`` queryset whose customer
+    opted in. Used after bulk inserts, which send no signals.
+    """
+    rows = bills.filter(customer__receipts_opt_in=True).order_by().values_list('pk', 'customer_id')
+    return PendingReceipt.objects.bulk_create([
+        PendingReceipt(customer_id=customer_id, bill_id=bill_id) for bill_id, customer_id in rows
+    ])
+
+
+def due_customers(window=None, limit=None):
+    """Primary keys of customers whose oldest pending receipt is past the window."""
+    if window is None:
+        window = settings.RECEIPT_DIGEST_WINDOW_SECONDS
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=window)
+    due = (
+        PendingReceipt.objects.values('customer')
+        .annotate(first=Min('created_at'), retry_at=Max('next_attempt_at'))
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now), first__lte=cutoff)
+        .order_by('first')
+        .values_list('customer', flat=True)
+    )
+    return list(due[:limit])
+
+
+def render_digest(customer, bills):
+    """Build the digest email for ``customer`` listing ``bills``."""
+    body = _digest_template().render({
+        'customer': customer,
+        'bills': bills,
+        'statement_url': statement_url(customer.customer_id),
+    })
+    total = sum(bill.amount for bill in bills)
+    return EmailMessage(
+        subject=f'Your receipts: {len(bills)} bill(s), {total}',
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[customer.email],
+    )
+
+
+def send_receipt_digests(window=None, batch_size=None, limit=None, connection=None, progress=None):
+    """
+    Send the digests that are due. ``progress`` is called with the running
+    DigestResult after every batch of ``batch_size`` customers.
+    """
+    batch_size = batch_size or settings.RECEIPT_DIGEST_BATCH_SIZE
+    due = due_customers(window, limit)
+    result = DigestResult()
+    if not due:
+        return result
+
+    started = time.perf_counter()
+    connection = connection or get_connection()
+    with connection:
+        for start in range(0, len(due), batch_size):
+            _send_batch(due[start:start + batch_size], connection, result)
+            result.seconds = time.perf_counter() - started
+            if progress:
+                progress(result)
+    logger.info(
+        'Receipt digests sent',
+        extra={
+            'digests': result.digests,
+            'bills': result.bills,
+            'failed': result.failed,
+            'duration_ms': round(result.seconds * 1000, 1),
+        }
+    )
+    return result
+
+
+def _send_batch(customer_pks, connection, result):
+    # The receipts are locked until the batch is done; a run that overlaps
+    # skips them. Only the receipts read here are removed afterwards; bills
+    # created while the batch is being sent wait for the next digest.
+    with transaction.atomic():
+        pending = list(
+            PendingReceipt.objects.filter(customer__in=customer_pks)
+            .select_for_update(skip_locked=True)
+            .values_list('pk', 'customer_id', 'bill_id', 'attempts')
+        )
+        bills = Bill.objects.in_bulk([bill_id for _, _, bill_id, _ in pending])
+        customers = Customer.objects.select_related('exhibition').in_bulk(customer_pks)
+
+        receipts_by_customer = defaultdict(list)
+        for receipt_pk, customer_pk, bill_id, attempts in pending:
+            receipts_by_customer[customer_pk].append((receipt_pk, bills.get(bill_id), attempts))
+
+        done, failed = [], []
+        for customer_pk, receipts in receipts_by_customer.items():
+            customer = customers.get(customer_pk)
+            # Bills deleted (or moved to someone else) since are left out
+            customer_bills = sorted(
+                (bill for _, bill, _ in receipts if bill is not None and bill.customer_id == customer_pk),
+                key=lambda bill: bill.created_at
+            )
+            receipt_pks = [receipt_pk for receipt_pk, _, _ in receipts]
+            if customer is None or not customer.receipts_opt_in or not customer.email or not customer_bills:
+                result.skipped += 1
+                done.extend(receipt_pks)
+                continue
+            message = render_digest(customer, customer_bills)
+            message.connection = connection
+            try:
+                message.send()
+            except Exception:
+                attempts = max(attempts for _, _, attempts in receipts) + 1
+                logger.exception(
+                    'Could not send receipt digest',
+                    extra={'customer_id': customer.customer_id, 'attempts': attempts}
+                )
+                if attempts >= settings.RECEIPT_DIGEST_MAX_ATTEMPTS:
+                    logger.warning(
+                        'Gave up on receipt digest', extra={'customer_id': customer.customer_id}
+                    )
+                    result.abandoned += 1
+                    done.extend(receipt_pks)
+                else:
+                    result.failed += 1
+                    failed.append((receipt_pks, attempts))
+                continue
+            result.digests += 1
+            result.bills += len(customer_bills)
+            done.extend(receipt_pks)
+
+        PendingReceipt.objects.filter(pk__in=done).delete()
+        now = timezone.now()
+        for receipt_pks, attempts in failed:
+            delay = settings.RECEIPT_DIGEST_RETRY_SECONDS * 2 ** (attempts - 1)
+            PendingReceipt.objects.filter(pk__in=receipt_pks).update(
+                attempts=attempts, next_attempt_at=now + timedelta(seconds=delay)
+            )
@@ -0,0 +1,67 @@
+"""
+Change sequence allocation.
+
+Every save of a customer or bill, and every deletion tombstone, takes the
+next value of one monotonically increasing sequence; consumers of the change
+feed use it as their cursor. PostgreSQL allocates values from a native
+sequence (no row locks, no contention); other databases use the single-row
+ChangeCounter table.
+"""
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, F, Func, Value, When
+
+
+SEQUENCE_NAME = 'customers_change_seq'
+
+
+def next_change_seqs(count):
+    """Allocate ``count`` increasing sequence values."""
+    if count <= 0:
+        return []
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(%s) FROM generate_series(1, %s)',
+                [SEQUENCE_NAME, count]
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    ChangeCounter = apps.get_model('customers', 'ChangeCounter')
+    with transaction.atomic():
+        updated = ChangeCounter.objects.filter(pk=1).update(value=F('value') + count)
+        if not updated:
+            ChangeCounter.objects.create(pk=1, value=count)
+        last = ChangeCounter.objects.values_list('value', flat=True).get(pk=1)
+    return list(range(last - count + 1, last + 1))
+
+
+def next_change_seq():
+    """Allocate one sequence value."""
+    return next_change_seqs(1)[0]
+
+
+def next_change_seq_expression():
+    """
+    The next sequence value as an expression for an INSERT or UPDATE, so
+    PostgreSQL allocates it within that statement instead of a round trip
+    of its own. Other databases get a plain value.
+    """
+    if connection.vendor == 'postgresql':
+        return Func(Value(SEQUENCE_NAME), function='nextval', output_field=BigIntegerField())
+    return next_change_seq()
+
+
+def next_change_seq_per_row(pks):
+    """
+    An expression giving every row of an UPDATE over ``pks`` its own next
+    sequence value. PostgreSQL evaluates nextval once per row; elsewhere
+    the values are allocated up front and mapped by primary key.
+    """
+    if connection.vendor == 'postgresql':
+        return next_change_seq_expression()
+    pks = list(dict.fromkeys(pks))
+    return Case(
+        *[When(pk=pk, then=Value(seq)) for pk, seq in zip(pks, next_change_seqs(len(pks)))],
+        output_field=BigIntegerField()
+    )
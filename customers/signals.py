@@ -0,0 +1,59 @@
+"""
+Signal handlers for the customers app.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .changefeed import record_tombstones
+from .models import Bill, Customer, Exhibition, PendingReceipt
+from .partitions import ensure_partition
+from .statements import invalidate_statements
+
+
+@receiver(post_save, sender=Exhibition)
+def create_bill_partition(sender, instance, created, **kwargs):
+    """Give new exhibitions their own bill partition (PostgreSQL only)."""
+    if created:
+        ensure_partition(instance.pk)
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def refresh_customer_bill_totals(sender, instance, **kwargs):
+    """Keep the customer's bill_count and bill_total in step with its bills."""
+    customer_pks = {instance.customer_id, getattr(instance, '_loaded_customer_id', None)}
+    customer_pks.discard(None)
+    Customer.objects.refresh_bill_totals(customer_pks)
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def invalidate_bill_statement(sender, instance, **kwargs):
+    """Re-render the customer's statement after their bills change."""
+    invalidate_statements({instance.customer_id, getattr(instance, '_loaded_customer_id', None)})
+
+
+@receiver(post_save, sender=Bill)
+def queue_bill_receipt(sender, instance, created, **kwargs):
+    """Hold new bills of opted-in customers for their next receipt digest."""
+    if created and instance.customer.receipts_opt_in:
+        PendingReceipt.objects.create(customer_id=instance.customer_id, bill_id=instance.pk)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_statement(sender, instance, **kwargs):
+    """Re-render (or drop) the statement after the customer changes."""
+    invalidate_statements([instance.customer_id])
+
+
+@receiver(post_delete, sender=Customer)
+def tombstone_customer(sender, instance, **kwargs):
+    """Tell change feed consumers the customer is gone."""
+    record_tombstones([('customer', instance.customer_id, instance.exhibition_id)])
+
+
+@receiver(post_delete, sender=Bill)
+def tombstone_bill(sender, instance, **kwargs):
+    """Tell change feed consumers the bill is gone."""
+    record_tombstones([('bill', instance.pk, instance.exhibition_id)])
@@ -0,0 +1,141 @@
+"""
+Container startup helpers.
+
+Used by the ``startup`` management command (run once per boot, before
+gunicorn) and by the gunicorn config module (pre-fork warmup). Every phase is
+timed so slow boots can be traced back to the step that caused them.
+"""
+import hashlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from .pool import close_pools
+
+
+logger = logging.getLogger(__name__)
+
+STATIC_HASH_FILE = '.static-source-hash'
+
+
+@contextmanager
+def timed(phase, log=None):
+    """Log how long a startup phase took."""
+    log = log or logger.info
+    started = time.perf_counter()
+    yield
+    log(f'[startup] {phase} took {(time.perf_counter() - started) * 1000:.0f} ms')
+
+
+def static_source_hash():
+    """
+    Hash every static file collectstatic would copy (path and contents).
+    Identical sources produce identical collected output, so a matching hash
+    means collectstatic can be skipped.
+    """
+    digest = hashlib.sha256()
+    files = []
+    for finder in get_finders():
+        for path, storage in finder.list([]):
+            files.append((path, storage.path(path)))
+    for path, full_path in sorted(files):
+        digest.update(path.encode())
+        with open(full_path, 'rb') as source:
+            for block in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _static_hash_path():
+    return os.path.join(settings.STATIC_ROOT, STATIC_HASH_FILE)
+
+
+def collectstatic_if_changed():
+    """Run collectstatic unless the static sources are unchanged. Returns True if it ran."""
+    current = static_source_hash()
+    manifest = os.path.join(settings.STATIC_ROOT, 'staticfiles.json')
+    try:
+        with open(_static_hash_path()) as hash_file:
+            previous = hash_file.read().strip()
+    except OSError:
+        previous = None
+
+    if previous == current and os.path.exists(manifest):
+        return False
+
+    call_command('collectstatic', interactive=False, verbosity=0)
+    with open(_static_hash_path(), 'w') as hash_file:
+        hash_file.write(current)
+    return True
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    """Return the migrations that have not been applied yet."""
+    executor = MigrationExecutor(connections[database])
+    targets = executor.loader.graph.leaf_nodes()
+    return [migration for migration, backwards in executor.migration_plan(targets)]
+
+
+def migrate_if_pending(database=DEFAULT_DB_ALIAS):
+    """Run migrate only if there are unapplied migrations. Returns the number applied."""
+    pending = pending_migrations(database)
+    if pending:
+        call_command('migrate', database=database, interactive=False, verbosity=0)
+    return len(pending)
+
+
+def preload_modules():
+    """Import modules that are otherwise loaded on first use."""
+    import openpyxl.styles  # noqa: F401
+    import qrcode  # noqa: F401
+    from PIL import PngImagePlugin  # noqa: F401
+    import customers.admin  # noqa: F401
+
+
+def warm_qr_cache(limit=None):
+    """Render the QR codes of the most recent customers of the active exhibition."""
+    from .models import Customer, Exhibition
+    from .utils import generate_qr_code
+
+    limit = settings.STARTUP_WARM_QR_CODES if limit is None else limit
+    if limit <= 0:
+        return 0
+    exhibition = Exhibition.objects.get_active()
+    customer_ids = list(
+        Customer.objects.filter(exhibition=exhibition)
+        .order_by('-created_at')
+        .values_list('customer_id', flat=True)[:limit]
+    )
+    for customer_id in customer_ids:
+        generate_qr_code(customer_id)
+    return len(customer_ids)
+
+
+def warmup(log=None):
+    """
+    Pre-fork warmup run once in the gunicorn master, so every worker starts
+    with the heavy modules imported and the caches populated (shared
+    copy-on-write). Database connections (pooled ones included) are closed
+    afterwards because they must never be shared across fork().
+    """
+    with timed('warmup: import modules', log):
+        preload_modules()
+    try:
+        with timed('warmup: QR cache', log):
+            warm_qr_cache()
+    finally:
+        connections.close_all()
+        close_pools()
+
+
+def connect_worker(log=None):
+    """Open the worker's database connection before it takes its first request."""
+    with timed('worker: database connection', log):
+        connections[DEFAULT_DB_ALIAS].ensure_connection()
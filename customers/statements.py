@@ -0,0 +1,103 @@
+"""
+Self-service customer statements.
+
+Customers open their statement (bills and running total) from a signed link
+in the welcome email; no login is needed and the link cannot be guessed or
+altered. The statement body is rendered once into the cache and reused until
+one of the customer's bills changes, so repeated refreshes cost no queries.
+
+Cached statements are keyed by a per-customer generation that every bill
+change bumps, rather than deleted: a request that read the bills just before
+a change commits can only store its stale copy under the old generation,
+where nobody looks for it again.
+"""
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signing import BadSignature, Signer
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .fields import parse_hex_id
+from .models import Bill, Customer
+
+
+SIGNING_SALT = 'customers.statement'
+CACHE_KEY_PREFIX = 'customer-statement'
+
+
+def statement_token(customer_id):
+    """Signed token identifying a customer's statement."""
+    return Signer(salt=SIGNING_SALT).sign(customer_id)
+
+
+def customer_id_from_token(token):
+    """The Customer ID a token was signed for, or None if it is not valid."""
+    try:
+        return parse_hex_id(Signer(salt=SIGNING_SALT).unsign(token))
+    except BadSignature:
+        return None
+
+
+def statement_url(customer_id):
+    """Absolute statement URL, for emails."""
+    path = reverse('customer_statement', args=[statement_token(customer_id)])
+    return settings.APP_URL.rstrip('/') + path
+
+
+def _generation_key(customer_id):
+    return f'{CACHE_KEY_PREFIX}-generation:{customer_id}'
+
+
+def _generation(customer_id):
+    key = _generation_key(customer_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start anywhere, so a counter that was evicted never revives old entries
+        cache.add(key, secrets.randbits(32), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_statement(customer_id):
+    """
+    Return (etag, html) of the rendered statement body, or None if the
+    customer does not exist. Rendered at most once per change.
+    """
+    # Read before the bills, so a change committing in between retires this key
+    key = f'{CACHE_KEY_PREFIX}:{customer_id}:{_generation(customer_id)}'
+    statement = cache.get(key)
+    if statement is not None:
+        return statement
+
+    customer = Customer.objects.filter(pk=customer_id).select_related('exhibition').first()
+    if customer is None:
+        return None
+    bills = Bill.objects.filter(customer_id=customer_id).order_by('-created_at').only(
+        'amount', 'description', 'created_at'
+    )
+    html = render_to_string('customers/statement_fragment.html', {
+        'customer': customer,
+        'bills': bills,
+    })
+    statement = (hashlib.md5(html.encode()).hexdigest(), html)
+    cache.set(key, statement, settings.STATEMENT_CACHE_SECONDS)
+    return statement
+
+
+def invalidate_statements(customer_ids):
+    """Retire the cached statements of these customers once the current transaction commits."""
+    keys = [_generation_key(customer_id) for customer_id in customer_ids if customer_id]
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass  # No generation yet, so nothing is cached for this customer
+
+    if keys:
+        transaction.on_commit(bump)
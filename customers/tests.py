@@ -1,10 +1,51 @@
 """
 Tests for customers app.
 """
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
 from django.contrib.auth.models import User
-from .models import Customer, Bill
-from .utils import generate_qr_code
+from django.urls import reverse
+from django.utils import timezone
+from .middleware import EXHIBITION_SESSION_KEY
+from .analytics import build_report, get_columns, load_columns, numpy_available, report_rows
+from .archive import read_archived_record
+from .audit import audit_log
+from .badges import render_page, render_pages, stream_zip
+from .changefeed import read_changes
+from .customer_index import CustomerIndex, build_index
+from .duplicates import normalize_email, normalize_phone, group_duplicates
+from .loadtest import parse_mix, percentile
+from .pool import ConnectionPool, PoolTimeout, start_background_thread
+from .purge import count_purge, purge_customers
+from .receipts import send_receipt_digests
+from .logs import BackgroundHandler, JsonFormatter, SamplingFilter, request_id_var
+from .startup import collectstatic_if_changed, pending_migrations
+from .statements import get_statement, statement_token
+from .ticker import TickerHub, ticker_application, ticker_snapshot
+from .models import Exhibition, Customer, Bill, ArchivedCustomer, AuditEvent, PendingReceipt, Tombstone
+from .utils import generate_qr_code, send_customer_welcome_email
 
 
 class CustomerModelTest(TestCase):
@@ -32,6 +73,29 @@ class CustomerModelTest(TestCase):
             phone="+0987654321"
         )
         self.assertNotEqual(self.customer.customer_id, customer2.customer_id)
+
+    def test_customer_id_is_compact_primary_key(self):
+        """Test the Customer ID is the primary key and bills reference it directly."""
+        self.assertEqual(self.customer.pk, self.customer.customer_id)
+        self.assertRegex(self.customer.customer_id, r'^[0-9A-F]{8}$')
+        self.assertEqual(Customer.objects.get(pk=self.customer.customer_id.lower()), self.customer)
+        Bill.objects.create(customer=self.customer, amount=10)
+        with self.assertNumQueries(1):
+            self.assertEqual(Bill.objects.get().customer_id, self.customer.customer_id)
+        with self.assertRaises(ValidationError):
+            Customer.objects.filter(pk='NOT-HEX').exists()
+
+    def test_customer_id_round_trips_high_values(self):
+        """Test IDs above 7FFFFFFF survive the signed 32-bit column."""
+        customer = Customer.objects.create(
+            customer_id='FFFFFFFE',
+            name="High Customer",
+            email="high@example.com",
+            phone="+1000000000"
+        )
+        customer.refresh_from_db()
+        self.assertEqual(customer.customer_id, 'FFFFFFFE')
+        self.assertEqual(list(Customer.objects.filter(pk__in=['fffffffe']).values_list('pk', flat=True)), ['FFFFFFFE'])
     
     def test_get_total_bills(self):
         """Test total bills calculation."""
@@ -87,3 +151,1317 @@ class QRCodeUtilTest(TestCase):
         self.assertTrue(qr_file.name.startswith('qr_'))
         self.assertTrue(qr_file.name.endswith('.png'))
 
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ExhibitionScopingTest(TestCase):
+    """Test exhibition scoping of customers and bills."""
+
+    def setUp(self):
+        """Set up two exhibitions with one customer each."""
+        self.past = Exhibition.objects.create(name="Past Expo", slug="past-expo")
+        self.current = Exhibition.objects.create(name="Current Expo", slug="current-expo")
+        self.current.activate()
+        self.old_customer = Customer.objects.create(
+            name="Old Customer",
+            email="old@example.com",
+            phone="+1111111111",
+            exhibition=self.past
+        )
+        self.customer = Customer.objects.create(
+            name="New Customer",
+            email="new@example.com",
+            phone="+2222222222"
+        )
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+
+    def test_new_customer_uses_active_exhibition(self):
+        """Test customers default to the active exhibition."""
+        self.assertEqual(self.customer.exhibition, self.current)
+
+    def test_bill_inherits_customer_exhibition(self):
+        """Test bills are recorded against their customer's exhibition."""
+        bill = Bill.objects.create(customer=self.old_customer, amount=10)
+        self.assertEqual(bill.exhibition, self.past)
+
+    def test_moved_bill_follows_its_customer(self):
+        """Test a bill moved to another exhibition's customer moves with it."""
+        bill = Bill.objects.create(customer=self.old_customer, amount=10)
+        bill = Bill.objects.get(pk=bill.pk)
+        bill.customer = self.customer
+        bill.save(update_fields=['customer'])
+        bill.refresh_from_db()
+        self.assertEqual(bill.exhibition, self.current)
+
+    def test_activate_deactivates_others(self):
+        """Test only one exhibition is active at a time."""
+        self.past.activate()
+        self.assertEqual(Exhibition.objects.get_active(), self.past)
+        self.assertEqual(Exhibition.objects.filter(is_active=True).count(), 1)
+
+    def test_admin_changelist_is_scoped(self):
+        """Test the customer changelist only shows the active exhibition."""
+        response = self.client.get(reverse('admin:customers_customer_changelist'))
+        self.assertContains(response, self.customer.customer_id)
+        self.assertNotContains(response, self.old_customer.customer_id)
+
+    def test_admin_can_switch_exhibition(self):
+        """Test an admin session can be scoped to a past exhibition."""
+        session = self.client.session
+        session[EXHIBITION_SESSION_KEY] = self.past.pk
+        session.save()
+        response = self.client.get(reverse('admin:customers_customer_changelist'))
+        self.assertContains(response, self.old_customer.customer_id)
+        self.assertNotContains(response, self.customer.customer_id)
+
+    def test_admin_search_by_customer_id(self):
+        """Test a scanned Customer ID finds the customer and their bills."""
+        other = Customer.objects.create(name="Other Customer", email="other@example.com", phone="+3333333333")
+        Bill.objects.create(customer=self.customer, amount=10)
+        response = self.client.get(
+            reverse('admin:customers_customer_changelist'), {'q': self.customer.customer_id.lower()}
+        )
+        self.assertContains(response, self.customer.customer_id)
+        self.assertNotContains(response, other.customer_id)
+        response = self.client.get(
+            reverse('admin:customers_bill_changelist'), {'q': self.customer.customer_id}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class ArchiveDataCommandTest(TestCase):
+    """Test the archive_data management command."""
+
+    def setUp(self):
+        """Set up a closed exhibition with customers and bills."""
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        self.exhibition = Exhibition.objects.create(name="Old Expo", slug="old-expo", is_closed=True)
+        self.customers = [
+            Customer.objects.create(
+                name=f"Customer {i}",
+                email=f"customer{i}@example.com",
+                phone="+1234567890",
+                exhibition=self.exhibition
+            )
+            for i in range(5)
+        ]
+        Bill.objects.create(customer=self.customers[0], amount=100, description="Stand A")
+        Bill.objects.create(customer=self.customers[0], amount=25)
+        self.live_customer = Customer.objects.create(
+            name="Live Customer",
+            email="live@example.com",
+            phone="+1234567890",
+            exhibition=Exhibition.objects.create(name="Live Expo", slug="live-expo", is_active=True)
+        )
+
+    def test_archive_closed_exhibition(self):
+        """Test customers and bills move to the archive in chunks."""
+        with self.settings(ARCHIVE_ROOT=self.archive_dir.name):
+            call_command('archive_data', exhibition='old-expo', chunk_size=2, stdout=StringIO())
+
+            self.assertFalse(Customer.objects.filter(exhibition=self.exhibition).exists())
+            self.assertFalse(Bill.objects.filter(exhibition=self.exhibition).exists())
+            self.assertTrue(Customer.objects.filter(pk=self.live_customer.pk).exists())
+            self.assertEqual(ArchivedCustomer.objects.count(), 5)
+
+            archived = ArchivedCustomer.objects.get(customer_id=self.customers[0].customer_id)
+            self.assertEqual(archived.bill_count, 2)
+            self.assertEqual(archived.bill_total, 125)
+            record = read_archived_record(archived)
+            self.assertEqual(record['customer_id'], self.customers[0].customer_id)
+            self.assertEqual([bill['amount'] for bill in record['bills']], ['100.00', '25.00'])
+
+    def test_refuses_open_exhibition(self):
+        """Test an exhibition must be closed before it is archived."""
+        self.exhibition.is_closed = False
+        self.exhibition.save()
+        with self.assertRaises(CommandError):
+            call_command('archive_data', exhibition='old-expo', stdout=StringIO())
+
+
+@override_settings(
+    AUDIT_LOG_BACKGROUND=False,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class PurgeCustomersTest(TestCase):
+    """Test chunked deletion of customers and their bills."""
+
+    def setUp(self):
+        """Set up an exhibition with customers and bills."""
+        self.exhibition = Exhibition.objects.create(name="Old Expo", slug="old-expo")
+        self.customers = [
+            Customer.objects.create(
+                name=f"Customer {i}", email=f"c{i}@example.com", phone="+1", exhibition=self.exhibition
+            )
+            for i in range(3)
+        ]
+        for amount in (10, 20, 30, 40, 50):
+            Bill.objects.create(customer=self.customers[0], amount=amount)
+        self.other = Customer.objects.create(
+            name="Other", email="o@example.com", phone="+2",
+            exhibition=Exhibition.objects.create(name="Live Expo", slug="live-expo", is_active=True)
+        )
+        Bill.objects.create(customer=self.other, amount=5)
+
+    def test_purge_deletes_customers_and_bills(self):
+        """Test customers and bills are deleted in chunks and leave tombstones."""
+        queryset = Customer.objects.filter(exhibition=self.exhibition)
+        self.assertEqual(count_purge(queryset), (3, 5))
+
+        steps = list(purge_customers(queryset, chunk_size=2, bill_chunk_size=2))
+        self.assertEqual(sum(customers for customers, _ in steps), 3)
+        self.assertEqual(sum(bills for _, bills in steps), 5)
+        self.assertFalse(Customer.objects.filter(exhibition=self.exhibition).exists())
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual(Tombstone.objects.filter(object_type='customer').count(), 3)
+        self.assertEqual(Tombstone.objects.filter(object_type='bill').count(), 5)
+
+    def test_interrupted_purge_keeps_totals(self):
+        """Test totals match the remaining bills after each bill chunk."""
+        purge = purge_customers(Customer.objects.filter(pk=self.customers[0].pk), bill_chunk_size=2)
+        self.assertEqual(next(purge), (0, 2))
+        purge.close()
+
+        self.customers[0].refresh_from_db()
+        self.assertEqual((self.customers[0].bill_count, self.customers[0].bill_total), (3, Decimal('120.00')))
+
+    def test_totals_are_refreshed_once_per_customer(self):
+        """Test a customer whose bills span several chunks is refreshed (and fed) once."""
+        for amount in (1, 2, 3):
+            Bill.objects.create(customer=self.customers[1], amount=amount)
+        refreshed = []
+        refresh = Customer.objects.refresh_bill_totals
+        with patch.object(Customer.objects, 'refresh_bill_totals', lambda pks: (refreshed.extend(pks), refresh(pks))):
+            list(purge_customers(Customer.objects.filter(exhibition=self.exhibition), bill_chunk_size=2))
+        self.assertCountEqual(refreshed, [self.customers[0].pk, self.customers[1].pk])
+
+    def test_admin_delete_confirmation_shows_counts(self):
+        """Test the admin delete action confirms with counts and purges."""
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        session = self.client.session
+        session[EXHIBITION_SESSION_KEY] = self.exhibition.pk
+        session.save()
+        data = {
+            'action': 'delete_selected',
+            '_selected_action': [customer.pk for customer in self.customers],
+        }
+        url = reverse('admin:customers_customer_changelist')
+        response = self.client.post(url, data)
+        self.assertContains(response, '3 customer(s) and their 5 bill(s)')
+        self.assertNotContains(response, 'Customer 0')
+
+        response = self.client.post(url, {**data, 'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Customer.objects.filter(exhibition=self.exhibition).exists())
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_admin_delete_page_purges_outside_its_transaction(self):
+        """Test deleting one customer does not wrap the purge chunks in one transaction."""
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        session = self.client.session
+        session[EXHIBITION_SESSION_KEY] = self.exhibition.pk
+        session.save()
+        depths = []
+
+        def purge(queryset, **kwargs):
+            depths.append(len(connection.atomic_blocks))
+            yield from purge_customers(queryset, **kwargs)
+
+        outer = len(connection.atomic_blocks)
+        url = reverse('admin:customers_customer_delete', args=[self.customers[0].pk])
+        with patch('customers.admin.purge_customers', purge):
+            response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(depths, [outer])
+        self.assertFalse(Customer.objects.filter(pk=self.customers[0].pk).exists())
+
+    def test_command_dry_run_and_purge(self):
+        """Test the purge_customers command reports counts and deletes."""
+        out = StringIO()
+        call_command('purge_customers', exhibition='old-expo', dry_run=True, stdout=out)
+        self.assertIn('3 customer(s) and 5 bill(s)', out.getvalue())
+        self.assertEqual(Customer.objects.filter(exhibition=self.exhibition).count(), 3)
+
+        call_command('purge_customers', exhibition='old-expo', interactive=False, stdout=StringIO())
+        self.assertFalse(Customer.objects.filter(exhibition=self.exhibition).exists())
+        self.assertTrue(AuditEvent.objects.filter(actor='system:purge_customers').exists())
+
+
+class StartupTest(TestCase):
+    """Test the startup phase checks."""
+
+    def test_no_pending_migrations(self):
+        """Test the test database reports no pending migrations."""
+        self.assertEqual(pending_migrations(), [])
+
+    def test_collectstatic_skipped_when_unchanged(self):
+        """Test collectstatic only runs when the static sources change."""
+        with tempfile.TemporaryDirectory() as static_root:
+            with self.settings(STATIC_ROOT=static_root):
+                self.assertTrue(collectstatic_if_changed())
+                self.assertFalse(collectstatic_if_changed())
+
+
+class ImportTimeBudgetTest(TestCase):
+    """Test that worker and CLI startup stay within an import-time budget."""
+
+    # Cumulative import time of django.setup() plus the admin modules.
+    # Override with IMPORT_TIME_BUDGET_MS on slow machines.
+    BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
+
+    LAZY_MODULES = ('openpyxl', 'qrcode', 'PIL', 'numpy')
+
+    def measure_imports(self):
+        """Run ``python -X importtime`` in a fresh interpreter and parse its report."""
+        script = (
+            "import django, sys; django.setup(); "
+            "import customers.admin, django.contrib.admin; "
+            "print(','.join(sorted(sys.modules)))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='exhibition_project.settings')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        total_us = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            # Only top-level imports; nested ones are part of their parent's cumulative time
+            if not name[1:].startswith(' '):
+                total_us += int(cumulative)
+        return total_us / 1000, set(result.stdout.strip().split(','))
+
+    def test_import_time_budget(self):
+        """Test heavy modules stay lazy and import time stays under budget."""
+        total_ms, modules = self.measure_imports()
+        for name in self.LAZY_MODULES:
+            self.assertNotIn(name, modules, f'{name} should only be imported on first use')
+        self.assertLess(
+            total_ms,
+            self.BUDGET_MS,
+            f'Import time {total_ms:.0f} ms exceeds budget of {self.BUDGET_MS} ms'
+        )
+
+
+@override_settings(
+    AUDIT_LOG_BACKGROUND=False,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class AuditLogTest(TestCase):
+    """Test the batched audit log."""
+
+    def setUp(self):
+        """Set up an admin user and an empty audit queue."""
+        audit_log.flush()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.customer = Customer.objects.create(
+            name="Test Customer",
+            email="test@example.com",
+            phone="+1234567890"
+        )
+
+    def test_events_are_queued_until_flush(self):
+        """Test recording does not write until the queue is flushed."""
+        audit_log.record('admin', AuditEvent.ACTION_UPDATE, self.customer)
+        self.assertEqual(AuditEvent.objects.count(), 0)
+        self.assertEqual(audit_log.flush(), 1)
+        event = AuditEvent.objects.get()
+        self.assertEqual(event.object_type, 'customer')
+        self.assertEqual(event.object_id, str(self.customer.pk))
+
+    def test_failed_batch_is_retried(self):
+        """Test events of a failed write are kept for the next flush."""
+        audit_log.record('admin', AuditEvent.ACTION_UPDATE, self.customer)
+        with patch.object(AuditEvent.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                audit_log.flush()
+        self.assertEqual(audit_log.flush(), 1)
+        self.assertEqual(AuditEvent.objects.count(), 1)
+
+    def test_batch_size_triggers_flush(self):
+        """Test a full batch is written without an explicit flush."""
+        with self.settings(AUDIT_LOG_BATCH_SIZE=3):
+            for _ in range(3):
+                audit_log.record('admin', AuditEvent.ACTION_EXPORT, object_type='customer')
+        self.assertEqual(AuditEvent.objects.count(), 3)
+
+    def test_admin_bill_creation_is_audited(self):
+        """Test adding a bill through the admin records who did it."""
+        self.client.post(reverse('admin:customers_bill_add'), {
+            'customer': self.customer.pk,
+            'amount': '42.00',
+            'description': 'Stand B',
+        })
+        audit_log.flush()
+        event = AuditEvent.objects.get(object_type='bill')
+        self.assertEqual(event.actor, 'admin')
+        self.assertEqual(event.action, AuditEvent.ACTION_CREATE)
+
+
+@override_settings(
+    AUDIT_LOG_BACKGROUND=False,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class DuplicateCustomerTest(TestCase):
+    """Test duplicate customer detection."""
+
+    def setUp(self):
+        """Set up an existing customer."""
+        self.customer = Customer.objects.create(
+            name="Test Customer",
+            email="Test@Example.com ",
+            phone="+1 (234) 567-890"
+        )
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+
+    def test_normalization(self):
+        """Test emails are lowercased and phones reduced to E.164 digits."""
+        self.assertEqual(normalize_email(' John@Example.COM'), 'john@example.com')
+        self.assertEqual(normalize_phone('+1 (234) 567-890'), '+1234567890')
+        self.assertEqual(normalize_phone('001234567890'), '+1234567890')
+        with self.settings(PHONE_DEFAULT_COUNTRY_CODE='91'):
+            self.assertEqual(normalize_phone('098765 43210'), '+919876543210')
+            long_phone = normalize_phone('1' * 20)
+        self.assertLessEqual(len(long_phone), Customer._meta.get_field('phone_normalized').max_length)
+        self.assertEqual(self.customer.email_normalized, 'test@example.com')
+        self.assertEqual(self.customer.phone_normalized, '+1234567890')
+
+    def test_admin_refuses_duplicate_registration(self):
+        """Test registering the same email again surfaces the existing ID."""
+        response = self.client.post(reverse('admin:customers_customer_add'), {
+            'name': 'Same Person',
+            'email': 'test@example.com',
+            'phone': '+999',
+            'bills-TOTAL_FORMS': '0',
+            'bills-INITIAL_FORMS': '0',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.customer.customer_id)
+        self.assertEqual(Customer.objects.count(), 1)
+
+    def test_admin_register_anyway(self):
+        """Test the desk can still register a duplicate on purpose."""
+        self.client.post(reverse('admin:customers_customer_add'), {
+            'name': 'Family Member',
+            'email': 'test@example.com',
+            'phone': '+1234567890',
+            'register_duplicate': 'on',
+            'bills-TOTAL_FORMS': '0',
+            'bills-INITIAL_FORMS': '0',
+        })
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_group_duplicates_links_email_and_phone(self):
+        """Test customers sharing an email with one and a phone with another form one group."""
+        rows = [
+            (1, 1, 'a@example.com', '+1'),
+            (2, 1, 'a@example.com', '+2'),
+            (3, 1, 'c@example.com', '+2'),
+            (4, 1, 'd@example.com', '+4'),
+            (5, 2, 'a@example.com', '+1'),
+        ]
+        self.assertEqual(group_duplicates(rows), [[1, 2, 3]])
+
+    def test_find_duplicates_command(self):
+        """Test the command reports duplicate groups."""
+        duplicate = Customer.objects.create(name="Again", email="test@example.com", phone="+555")
+        Customer.objects.filter(pk=duplicate.pk).update(
+            created_at=self.customer.created_at + timedelta(seconds=1)
+        )
+        out = StringIO()
+        call_command('find_duplicates', json=True, stdout=out)
+        groups = json.loads(out.getvalue())
+        self.assertEqual(
+            [[entry['customer_id'] for entry in group] for group in groups],
+            [[self.customer.customer_id, duplicate.customer_id]]
+        )
+
+
+class BadgeGenerationTest(TestCase):
+    """Test badge sheet rendering."""
+
+    def test_render_page_formats(self):
+        """Test a sheet renders as PDF and PNG."""
+        badges = [('1A2B3C4D', 'Test Customer'), ('5E6F7A8B', 'A Very Long Customer Name Indeed')]
+        self.assertTrue(render_page(badges, fmt='pdf').startswith(b'%PDF'))
+        self.assertTrue(render_page(badges, fmt='png').startswith(b'\x89PNG'))
+
+    def test_parallel_rendering_keeps_page_order(self):
+        """Test pages rendered in a process pool come back in order."""
+        badges = [(f'{i:08X}', f'Customer {i}') for i in range(5)]
+        serial = list(render_pages(badges, fmt='png', columns=1, rows=2))
+        parallel = list(render_pages(badges, fmt='png', columns=1, rows=2, workers=2))
+        self.assertEqual(len(serial), 3)
+        self.assertEqual(serial, parallel)
+
+    def test_generate_badges_command(self):
+        """Test the command writes a ZIP with one file per page."""
+        for i in range(13):
+            Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com", phone="+1234567890")
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = os.path.join(output_dir, 'badges.zip')
+            call_command('generate_badges', output=output, workers=1, stdout=StringIO())
+            with zipfile.ZipFile(output) as archive:
+                self.assertEqual(archive.namelist(), ['badges-0001.pdf', 'badges-0002.pdf'])
+                self.assertTrue(archive.read('badges-0002.pdf').startswith(b'%PDF'))
+
+    def test_generate_badges_rejects_malformed_ids(self):
+        """Test a mistyped Customer ID is a command error."""
+        with self.assertRaisesMessage(CommandError, '8 hexadecimal characters'):
+            call_command('generate_badges', ids=['1A2B3C4G'], output=os.devnull, stdout=StringIO())
+
+    @override_settings(
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+        BADGE_ADMIN_MAX_CUSTOMERS=1
+    )
+    def test_admin_action_refuses_large_selections(self):
+        """Test the admin sends selections above the limit to generate_badges."""
+        customers = [
+            Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com", phone="+1234567890")
+            for i in range(2)
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:customers_customer_changelist'), {
+            'action': 'print_badges',
+            '_selected_action': [customer.pk for customer in customers],
+        }, follow=True)
+        self.assertNotEqual(response.get('Content-Type'), 'application/zip')
+        self.assertContains(response, 'generate_badges --ids')
+
+    def test_stream_zip_is_valid(self):
+        """Test the streamed ZIP can be read back."""
+        data = b''.join(stream_zip([b'page one', b'page two'], fmt='png'))
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            self.assertEqual(archive.read('badges-0002.png'), b'page two')
+
+
+class ImportBillsCommandTest(TestCase):
+    """Test the import_bills management command."""
+
+    def setUp(self):
+        """Set up customers and a POS export."""
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com", phone="+111")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com", phone="+222")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.csv_path = os.path.join(self.tmp_dir.name, 'sales.csv')
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write(
+                'customer_id,amount,description,created_at\n'
+                f'{self.alice.customer_id},10.50,Coffee,2025-11-01T10:15:00\n'
+                f'{self.alice.customer_id},10.50,Coffee,2025-11-01T10:15:00\n'
+                f'{self.bob.customer_id.lower()},"$1,200.00",Sofa,2025-11-01T11:00:00\n'
+                'ZZZZZZZZ,5.00,Unknown,\n'
+                f'{self.bob.customer_id},abc,Broken,\n'
+            )
+
+    def run_import(self, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_bills', self.csv_path, batch_size=2, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_and_aggregates(self):
+        """Test valid lines are imported and customer totals refreshed."""
+        out, err = self.run_import()
+        self.assertIn('Imported 2 bill(s)', out)
+        self.assertIn('skipped 1 duplicate(s), rejected 2 line(s)', out)
+        self.assertIn('Unknown customer ID "ZZZZZZZZ"', err)
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.bill_count, self.alice.bill_total), (1, Decimal('10.50')))
+        self.assertEqual((self.bob.bill_count, self.bob.bill_total), (1, Decimal('1200.00')))
+        bill = self.alice.bills.get()
+        self.assertEqual(bill.created_at.hour, 10)
+        self.assertEqual(bill.created_by, 'pos-import')
+
+    def test_reimport_skips_existing_lines(self):
+        """Test importing the same file twice does not duplicate bills."""
+        self.run_import()
+        out, _ = self.run_import()
+        self.assertIn('Imported 0 bill(s)', out)
+        self.assertEqual(Bill.objects.count(), 2)
+
+    def test_reimport_without_sale_times(self):
+        """Test lines without created_at are still recognized on the next import."""
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write(f'customer_id,amount\n{self.alice.customer_id},3.00\n')
+        self.run_import()
+        out, _ = self.run_import()
+        self.assertIn('skipped 1 duplicate(s)', out)
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_out_of_range_amounts_are_rejected(self):
+        """Test non-finite and too large amounts are line errors, not a failed import."""
+        with open(self.csv_path, 'w') as csv_file:
+            csv_file.write(
+                'customer_id,amount\n'
+                f'{self.alice.customer_id},Infinity\n'
+                f'{self.alice.customer_id},NaN\n'
+                f'{self.alice.customer_id},100000000.00\n'
+                f'{self.alice.customer_id},99999999.99\n'
+            )
+        out, err = self.run_import()
+        self.assertIn('Imported 1 bill(s)', out)
+        self.assertIn('rejected 3 line(s)', out)
+        self.assertIn('Invalid amount "Infinity"', err)
+        self.assertIn('Invalid amount "100000000.00"', err)
+        self.assertEqual(self.alice.bills.get().amount, Decimal('99999999.99'))
+
+    def test_dry_run(self):
+        """Test a dry run inserts nothing."""
+        out, _ = self.run_import(dry_run=True)
+        self.assertIn('Would import 2 bill(s)', out)
+        self.assertEqual(Bill.objects.count(), 0)
+
+
+class BillTotalsTest(TestCase):
+    """Test the denormalized customer billing aggregates."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Test", email="t@example.com", phone="+1")
+        self.other = Customer.objects.create(name="Other", email="o@example.com", phone="+2")
+
+    def test_totals_follow_bill_changes(self):
+        """Test totals update on create, move between customers and delete."""
+        bill = Bill.objects.create(customer=self.customer, amount=Decimal('40.00'))
+        Bill.objects.create(customer=self.customer, amount=Decimal('2.50'))
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.bill_count, self.customer.bill_total), (2, Decimal('42.50')))
+
+        bill = Bill.objects.get(pk=bill.pk)
+        bill.customer = self.other
+        bill.save()
+        self.customer.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.customer.bill_total, Decimal('2.50'))
+        self.assertEqual(self.other.bill_total, Decimal('40.00'))
+
+        bill.delete()
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.bill_count, self.other.bill_total), (0, Decimal('0')))
+
+    def test_saving_a_stale_customer_keeps_totals(self):
+        """Test an edit loaded before a bill was added does not revert the totals."""
+        stale = Customer.objects.get(pk=self.customer.pk)
+        Bill.objects.create(customer=self.customer, amount=Decimal('12.00'))
+        stale.name = "Edited"
+        stale.save()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.name, "Edited")
+        self.assertEqual((self.customer.bill_count, self.customer.bill_total), (1, Decimal('12.00')))
+
+
+@override_settings(CHANGE_FEED_SETTLE_SECONDS=0, CHANGE_FEED_TOKEN='secret-token')
+class ChangeFeedTest(TestCase):
+    """Test the incremental change feed."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Feed", email="feed@example.com", phone="+1")
+        self.bill = Bill.objects.create(customer=self.customer, amount=Decimal('9.99'))
+
+    def test_changes_after_cursor(self):
+        """Test only rows changed after the cursor are returned, in order."""
+        records, cursor = read_changes(0)
+        # The bill refreshed the customer's totals, which moved it after the bill
+        self.assertEqual([(r['type'], r['op']) for r in records], [('bill', 'upsert'), ('customer', 'upsert')])
+        self.assertEqual(records[0]['data']['customer_id'], self.customer.customer_id)
+
+        self.assertEqual(read_changes(cursor), ([], cursor))
+
+        self.customer.name = "Renamed"
+        self.customer.save()
+        records, cursor = read_changes(cursor)
+        self.assertEqual([r['data']['name'] for r in records], ["Renamed"])
+
+    def test_bill_save_with_update_fields_bumps_sequence(self):
+        """Test partial saves still appear in the feed."""
+        _, cursor = read_changes(0)
+        self.bill.description = "Updated"
+        self.bill.save(update_fields=['description'])
+        records, _ = read_changes(cursor)
+        self.assertEqual([r['data']['id'] for r in records if r['type'] == 'bill'], [self.bill.pk])
+
+    def test_bill_totals_refresh_moves_customer_forward(self):
+        """Test a customer whose totals change is not left behind the cursor."""
+        other = Customer.objects.create(name="Other", email="other@example.com", phone="+2")
+        _, cursor = read_changes(0)
+        Bill.objects.create(customer=other, amount=1)
+        Bill.objects.create(customer=self.customer, amount=2)
+        records, _ = read_changes(cursor)
+        seqs = {(r['type'], r['data'].get('customer_id')): r['seq'] for r in records}
+        self.assertGreater(seqs[('customer', self.customer.customer_id)], seqs[('customer', other.customer_id)])
+        self.assertEqual(len(records), 4)
+
+    def test_deletes_leave_tombstones(self):
+        """Test deleting a bill is reported as a delete."""
+        _, cursor = read_changes(0)
+        bill_pk = self.bill.pk
+        self.bill.delete()
+        records, _ = read_changes(cursor)
+        deletes = [r for r in records if r['op'] == 'delete']
+        self.assertEqual(deletes, [{
+            'seq': Tombstone.objects.get().change_seq,
+            'type': 'bill',
+            'op': 'delete',
+            'key': str(bill_pk),
+            'reason': 'deleted',
+        }])
+
+    def test_settle_window_holds_back_recent_changes(self):
+        """Test changes younger than the settle window are not served yet."""
+        with self.settings(CHANGE_FEED_SETTLE_SECONDS=60):
+            self.assertEqual(read_changes(0), ([], 0))
+
+    def test_endpoint_requires_token(self):
+        """Test the HTTP feed needs the bearer token and paginates with a cursor."""
+        url = reverse('change_feed')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, {'limit': 1}, HTTP_AUTHORIZATION='Bearer secret-token')
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(response['X-Has-More'], '1')
+        response = self.client.get(
+            url, {'cursor': response['X-Next-Cursor']}, HTTP_AUTHORIZATION='Bearer secret-token'
+        )
+        self.assertEqual(json.loads(response.content)['type'], 'customer')
+
+    def test_export_changes_command(self):
+        """Test the command writes JSON lines and remembers the cursor."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cursor_file = os.path.join(tmp_dir, 'cursor')
+            out = StringIO()
+            call_command('export_changes', cursor_file=cursor_file, stdout=out, stderr=StringIO())
+            self.assertEqual(len(out.getvalue().splitlines()), 2)
+            out = StringIO()
+            call_command('export_changes', cursor_file=cursor_file, stdout=out, stderr=StringIO())
+            self.assertEqual(out.getvalue(), '')
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    AUDIT_LOG_BACKGROUND=False
+)
+class LoadTestCommandTest(TransactionTestCase):
+    """Test the loadtest management command."""
+
+    def test_percentile_and_mix(self):
+        """Test nearest-rank percentiles and mix parsing."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(parse_mix('bill=3,lookup'), {'bill': 3, 'lookup': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('checkout=1')
+
+    def test_inprocess_run_reports_and_cleans_up(self):
+        """Test a short in-process run succeeds and removes its data."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'results.json')
+            call_command(
+                'loadtest',
+                requests=12,
+                concurrency=1,
+                seed_customers=5,
+                mix='bill=1,lookup=1,changelist=1,export=1',
+                output=output,
+                interactive=False,
+                stdout=StringIO()
+            )
+            with open(output) as f:
+                results = json.load(f)
+        self.assertEqual(results['total']['requests'], 12)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertIn('p99', results['scenarios']['bill']['latency_ms'])
+        self.assertFalse(Exhibition.objects.filter(slug__startswith='loadtest-').exists())
+        self.assertFalse(Customer.objects.exists())
+
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    CHANGE_FEED_SETTLE_SECONDS=0
+)
+class CustomerIndexTest(TestCase):
+    """Test the shared memory-mapped customer index."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'customer_index.bin')
+        self.customer = Customer.objects.create(name="Indexed Ünicode", email="i@example.com", phone="+1")
+        Bill.objects.create(customer=self.customer, amount=Decimal('12.50'))
+        Customer.objects.filter(pk=self.customer.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(build_index(self.path), 1)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lookup_from_mapped_file(self):
+        """Test a lookup is answered from the file without querying."""
+        index = CustomerIndex(self.path, refresh_seconds=3600)
+        self.assertTrue(index.available)
+        with self.assertNumQueries(0):
+            entry = index.get(self.customer.customer_id.lower())
+            self.assertIsNone(index.get('00000000'))
+        self.assertEqual(
+            entry[:5],
+            (self.customer.customer_id, self.customer.exhibition_id, "Indexed Ünicode", "i@example.com", "+1")
+        )
+        self.assertEqual((entry.bill_count, entry.bill_total), (1, Decimal('12.50')))
+        self.assertIsNone(index.get(self.customer.customer_id, exhibition_id=self.customer.exhibition_id + 1))
+
+    def test_overlay_serves_changes_since_build(self):
+        """Test new customers, new bills and deletions show up before a rebuild."""
+        index = CustomerIndex(self.path, refresh_seconds=0)
+        new = Customer.objects.create(name="New", email="n@example.com", phone="+2")
+        Bill.objects.create(customer=self.customer, amount=Decimal('7.50'))
+        self.assertEqual(index.get(new.customer_id).name, "New")
+        self.assertEqual(index.get(self.customer.customer_id).bill_total, Decimal('20.00'))
+        new.delete()
+        self.customer.delete()
+        self.assertIsNone(index.get(new.customer_id))
+        self.assertIsNone(index.get(self.customer.customer_id))
+
+    def test_rebuild_is_picked_up(self):
+        """Test readers switch to a file replaced by a rebuild."""
+        index = CustomerIndex(self.path, refresh_seconds=3600)
+        self.assertTrue(index.available)
+        other = Customer.objects.create(name="Other", email="o@example.com", phone="+3")
+        self.assertIsNone(index.get(other.customer_id))
+        build_index(self.path)
+        index.invalidate()
+        self.assertEqual(index.get(other.customer_id).name, "Other")
+        self.assertEqual(index._mapping.count, 2)
+
+    def test_overlay_is_loaded_incrementally(self):
+        """Test a refresh only reads changes it has not seen yet."""
+        index = CustomerIndex(self.path, refresh_seconds=0)
+        new = Customer.objects.create(name="New", email="n@example.com", phone="+2")
+        self.assertEqual(index.get(new.customer_id).name, "New")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(index.get(new.customer_id).name, "New")
+        customer_reads = [q['sql'] for q in queries.captured_queries if 'customers_customer' in q['sql']]
+        self.assertEqual(len(customer_reads), 1)
+        self.assertIn(str(new.change_seq), customer_reads[0])
+
+    def test_scanner_lookup_endpoint(self):
+        """Test the JSON lookup needs a staff session and is scoped to the exhibition."""
+        url = reverse('customer_lookup', args=[self.customer.customer_id])
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.settings(CUSTOMER_INDEX_PATH=self.path):
+            response = self.client.get(url)
+            self.assertEqual(response.json()['bill_total'], '12.50')
+            self.assertEqual(
+                self.client.get(reverse('customer_lookup', args=['00000000'])).status_code, 404
+            )
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+)
+class StatementTest(TestCase):
+    """Test the cached self-service statement page."""
+
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(name="Statement", email="s@example.com", phone="+1")
+        Bill.objects.create(customer=self.customer, amount=Decimal('1200.00'), description="Sofa")
+        self.url = reverse('customer_statement', args=[statement_token(self.customer.customer_id)])
+
+    def test_statement_is_cached_and_revalidated(self):
+        """Test the page lists bills, is served from cache and honours If-None-Match."""
+        response = self.client.get(self.url)
+        self.assertContains(response, "Sofa")
+        self.assertContains(response, "$1,200.00")
+        self.assertIn('private', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_bill_change_invalidates_statement(self):
+        """Test a new bill is shown on the next request."""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Bill.objects.create(customer=self.customer, amount=Decimal('5.00'), description="Lamp")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Lamp")
+        self.assertContains(response, "$1,205.00")
+
+    def test_render_overlapping_a_bill_change_is_not_kept(self):
+        """Test a statement rendered from rows read before a bill committed is not served later."""
+        original = render_to_string
+
+        def render_then_commit_bill(*args, **kwargs):
+            html = original(*args, **kwargs)
+            with self.captureOnCommitCallbacks(execute=True):
+                Bill.objects.create(customer=self.customer, amount=Decimal('5.00'), description="Lamp")
+            return html
+
+        with patch('customers.statements.render_to_string', render_then_commit_bill):
+            self.assertNotIn("Lamp", get_statement(self.customer.customer_id)[1])
+        self.assertIn("Lamp", get_statement(self.customer.customer_id)[1])
+
+    def test_tampered_token_is_rejected(self):
+        """Test only signed tokens open a statement."""
+        other = Customer.objects.create(name="Other", email="o@example.com", phone="+2")
+        forged = statement_token(self.customer.customer_id).replace(self.customer.customer_id, other.customer_id)
+        self.assertEqual(self.client.get(reverse('customer_statement', args=[forged])).status_code, 404)
+
+    def test_welcome_email_links_statement(self):
+        """Test the welcome email carries the statement link."""
+        send_customer_welcome_email(self.customer)
+        self.assertIn(self.url, mail.outbox[0].body)
+
+
+class StructuredLoggingTest(TestCase):
+    """Test the background JSON logging pipeline."""
+
+    def make_record(self, level=logging.INFO, **extra):
+        record = logging.LogRecord('customers.test', level, __file__, 1, 'Hello %s', ('world',), None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_background_handler_writes_json_lines(self):
+        """Test records are written by the listener thread with request ID and extras."""
+        stream = StringIO()
+        handler = BackgroundHandler(stream=stream)
+        token = request_id_var.set('req-1')
+        try:
+            handler.handle(self.make_record(duration_ms=12.5))
+        finally:
+            request_id_var.reset(token)
+        handler.flush()
+        handler.close()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['message'], 'Hello world')
+        self.assertEqual(entry['request_id'], 'req-1')
+        self.assertEqual(entry['duration_ms'], 12.5)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test a stalled writer costs dropped records, not blocked callers."""
+        handler = BackgroundHandler(queue_size=1, stream=StringIO())
+        handler._ensure_listener()
+        handler._listener.stop()
+        for _ in range(3):
+            handler.handle(self.make_record())
+        self.assertEqual(handler.dropped, 2)
+        handler.queue.get_nowait()
+        handler.handle(self.make_record())
+        self.assertEqual(handler.dropped, 2)  # The "dropped" notice did not fit either
+
+    def test_sampling_keeps_warnings_and_slow_records(self):
+        """Test sampled-out records are only ordinary, fast ones."""
+        sampling = SamplingFilter(rate=0, slow_ms=500)
+        self.assertFalse(sampling.filter(self.make_record(duration_ms=10)))
+        self.assertTrue(sampling.filter(self.make_record(duration_ms=800)))
+        self.assertTrue(sampling.filter(self.make_record(level=logging.WARNING)))
+
+    def test_request_id_header(self):
+        """Test responses carry the request ID, reusing a sane incoming one."""
+        response = self.client.get(reverse('change_feed'), HTTP_X_REQUEST_ID='lb-1234')
+        self.assertEqual(response['X-Request-ID'], 'lb-1234')
+        response = self.client.get(reverse('change_feed'), HTTP_X_REQUEST_ID='bad id\n')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+        formatted = json.loads(JsonFormatter().format(self.make_record()))
+        self.assertNotIn('request_id', formatted)
+
+
+class FakeConnection:
+    """Stands in for a DB-API connection in pool tests."""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    """Test the per-process database connection pool."""
+
+    def test_connections_are_reused(self):
+        """Test a returned connection is handed out again without reconnecting."""
+        pool = ConnectionPool(max_size=2)
+        first = pool.checkout(FakeConnection, lambda connection: True)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(FakeConnection, lambda connection: True), first)
+        self.assertEqual((pool.opened, pool.checkouts), (1, 2))
+
+    def test_full_pool_waits_then_times_out(self):
+        """Test checkouts beyond the pool size wait and fail after the timeout."""
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        pool.checkout(FakeConnection, lambda connection: True)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection, lambda connection: True)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        """Test an idle connection failing its health check is closed and replaced."""
+        pool = ConnectionPool(max_size=1, health_check_seconds=0)
+        stale = pool.checkout(FakeConnection, lambda connection: True)
+        pool.checkin(stale)
+        fresh = pool.checkout(FakeConnection, lambda connection: False)
+        self.assertIsNot(fresh, stale)
+        self.assertTrue(stale.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_connection_of_finished_thread_is_reclaimed(self):
+        """Test a connection never returned by a dead thread counts as a leak."""
+        pool = ConnectionPool(max_size=1, timeout=1)
+        leaked = []
+        thread = threading.Thread(target=lambda: leaked.append(pool.checkout(FakeConnection, bool)))
+        thread.start()
+        thread.join()
+        connection = pool.checkout(FakeConnection, lambda connection: True)
+        self.assertIsNot(connection, leaked[0])
+        self.assertTrue(leaked[0].closed)
+        stats = pool.stats()
+        self.assertEqual((stats['leaks'], stats['in_use']), (1, 1))
+
+    def test_background_thread_returns_connections(self):
+        """Test background threads close their connections when they finish."""
+        closed = []
+        with patch('customers.pool.connections.close_all', lambda: closed.append(True)):
+            start_background_thread(lambda: None).join()
+        self.assertEqual(closed, [True])
+
+    def test_stats_endpoint_requires_staff(self):
+        """Test pool stats are only shown to staff."""
+        self.assertEqual(self.client.get(reverse('db_pool_stats')).status_code, 401)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.json()['pid'], os.getpid())
+
+
+@override_settings(
+    AUDIT_LOG_BACKGROUND=False,
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+)
+class KioskRegistrationTest(TestCase):
+    """Test the registration kiosk endpoint."""
+
+    def setUp(self):
+        audit_log.flush()
+        self.exhibition = Exhibition.objects.create(name="Expo", slug="expo", is_active=True)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.url = reverse('register_customer')
+
+    def test_html_registration(self):
+        """Test the form registers a customer and shows its ID and QR code."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'autofocus')
+        response = self.client.post(self.url, {'name': 'Walk In', 'email': 'walk@example.com', 'phone': '+1555'})
+        customer = Customer.objects.get(email='walk@example.com')
+        self.assertEqual(customer.exhibition, self.exhibition)
+        self.assertEqual(customer.phone_normalized, '+1555')
+        self.assertContains(response, customer.customer_id)
+        self.assertContains(response, 'data:image/png;base64,')
+        self.assertNotContains(response, 'walk@example.com')  # Empty form for the next one
+
+    def test_json_registration_uses_one_insert(self):
+        """Test the JSON variant creates the customer with a single INSERT."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url,
+                json.dumps({'name': 'Walk In', 'email': 'walk@example.com', 'phone': '+1555'}),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertTrue(Customer.objects.filter(pk=data['customer_id']).exists())
+        self.assertTrue(data['qr_code'].startswith('data:image/png;base64,'))
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "customers_customer"')]
+        self.assertEqual(len(inserts), 1)
+        audit_log.flush()
+        self.assertTrue(AuditEvent.objects.filter(object_id=data['customer_id'], actor='admin').exists())
+
+    def test_json_duplicate_is_refused(self):
+        """Test an already registered email is refused unless confirmed."""
+        Customer.objects.create(name="First", email="walk@example.com", phone="+1", exhibition=self.exhibition)
+        body = {'name': 'Walk In', 'email': 'WALK@example.com', 'phone': '+2'}
+        response = self.client.post(self.url, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors']['__all__'][0]['code'], 'duplicate')
+        response = self.client.post(
+            self.url, json.dumps({**body, 'register_duplicate': True}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_json_get_is_refused(self):
+        """Test a JSON GET gets a 405 instead of registering nothing."""
+        response = self.client.get(self.url, CONTENT_TYPE='application/json')
+        self.assertEqual(response.status_code, 405)
+
+    def test_id_collision_is_retried(self):
+        """Test a randomly drawn ID that is taken is redrawn."""
+        taken = Customer.objects.create(name="First", email="a@example.com", phone="+1")
+        with patch('customers.models.secrets.randbits', side_effect=[int(taken.customer_id, 16), 1]):
+            customer = Customer.objects.register(self.exhibition, 'Second', 'b@example.com', '+2')
+        self.assertEqual(customer.customer_id, '00000001')
+        self.assertGreater(customer.change_seq, taken.change_seq)
+
+    def test_archived_ids_are_not_reused(self):
+        """Test an ID held by an archived customer is redrawn."""
+        ArchivedCustomer.objects.create(
+            customer_id='00000002', name='Gone', email='g@example.com', phone='+3',
+            registered_at=timezone.now(), archive_file='old.jsonl.gz', archive_line=1
+        )
+        with patch('customers.models.secrets.randbits', side_effect=[2, 3, 2, 4]):
+            registered = Customer.objects.register(self.exhibition, 'Second', 'b@example.com', '+2')
+            created = Customer.objects.create(name='Third', email='c@example.com', phone='+4')
+        self.assertEqual((registered.customer_id, created.customer_id), ('00000003', '00000004'))
+
+    def test_requires_staff(self):
+        """Test anonymous users are sent to the login page."""
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        response = self.client.post(self.url, '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    RECEIPT_DIGEST_WINDOW_SECONDS=0
+)
+class ReceiptDigestTest(TestCase):
+    """Test opt-in receipt digests."""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            name="Opted In", email="in@example.com", phone="+1", receipts_opt_in=True
+        )
+        self.other = Customer.objects.create(name="Opted Out", email="out@example.com", phone="+2")
+
+    def test_only_opted_in_bills_are_queued(self):
+        """Test bill saves queue receipts for opted-in customers only."""
+        bill = Bill.objects.create(customer=self.customer, amount=10)
+        Bill.objects.create(customer=self.other, amount=20)
+        bill.description = "Edited"
+        bill.save()
+        self.assertEqual(list(PendingReceipt.objects.values_list('bill_id', flat=True)), [bill.pk])
+
+    def test_bills_are_coalesced_into_one_digest(self):
+        """Test all pending bills of a customer go out in one email."""
+        Bill.objects.create(customer=self.customer, amount=Decimal('10.00'), description="Coffee")
+        Bill.objects.create(customer=self.customer, amount=Decimal('5.50'))
+        customer = Customer.objects.create(name="Second", email="second@example.com", phone="+3", receipts_opt_in=True)
+        Bill.objects.create(customer=customer, amount=Decimal('1.00'))
+
+        result = send_receipt_digests(batch_size=1)
+        self.assertEqual((result.digests, result.bills), (2, 3))
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ['in@example.com'])
+        self.assertIn('Coffee', digest.body)
+        self.assertIn('15.50', digest.body)
+        self.assertFalse(PendingReceipt.objects.exists())
+
+    def test_window_holds_back_recent_bills(self):
+        """Test digests wait until the first pending bill is older than the window."""
+        Bill.objects.create(customer=self.customer, amount=10)
+        self.assertEqual(send_receipt_digests(window=3600).digests, 0)
+        self.assertEqual(PendingReceipt.objects.count(), 1)
+
+    def test_deleted_bills_and_opt_outs_are_dropped(self):
+        """Test receipts of deleted bills and opted-out customers are discarded."""
+        Bill.objects.create(customer=self.customer, amount=10).delete()
+        result = send_receipt_digests()
+        self.assertEqual((result.digests, result.skipped), (0, 1))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(PendingReceipt.objects.exists())
+
+    @override_settings(RECEIPT_DIGEST_MAX_ATTEMPTS=2)
+    def test_failed_digests_back_off_and_are_dropped(self):
+        """Test a digest that keeps failing waits before retrying and is dropped at last."""
+        Bill.objects.create(customer=self.customer, amount=10)
+        with patch('django.core.mail.EmailMessage.send', side_effect=OSError):
+            self.assertEqual(send_receipt_digests().failed, 1)
+            receipt = PendingReceipt.objects.get()
+            self.assertEqual(receipt.attempts, 1)
+            self.assertGreater(receipt.next_attempt_at, timezone.now())
+            self.assertEqual(send_receipt_digests().failed, 0)
+
+            PendingReceipt.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_receipt_digests().abandoned, 1)
+        self.assertFalse(PendingReceipt.objects.exists())
+
+    def test_imported_bills_are_queued(self):
+        """Test bulk-imported bills queue receipts too."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        csv_path = os.path.join(tmp_dir.name, 'sales.csv')
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write(
+                'customer_id,amount\n'
+                f'{self.customer.customer_id},12.00\n'
+                f'{self.other.customer_id},3.00\n'
+            )
+        call_command('import_bills', csv_path, stdout=StringIO())
+        self.assertEqual(list(PendingReceipt.objects.values_list('customer_id', flat=True)), [self.customer.pk])
+
+        out = StringIO()
+        call_command('send_receipt_digests', stdout=out)
+        self.assertIn('Sent 1 digest(s) covering 1 bill(s)', out.getvalue())
+
+
+@unittest.skipUnless(numpy_available(), 'numpy is not installed')
+@override_settings(TIME_ZONE='UTC')
+class BillingAnalyticsTest(TestCase):
+    """Test the vectorized billing reports."""
+
+    def setUp(self):
+        self.exhibition = Exhibition.objects.create(name="Expo", slug="expo", is_active=True)
+        start = datetime(2025, 11, 1, 10, 15, tzinfo=dt_timezone.utc)
+        self.big = Customer.objects.create(name="Big", email="big@example.com", phone="+1")
+        self.small = Customer.objects.create(name="Small", email="small@example.com", phone="+2")
+        for customer, amount, when, created_by in [
+            (self.big, '100.00', start, 'desk'),
+            (self.big, '50.00', start + timedelta(days=1), 'desk'),
+            (self.small, '10.00', start + timedelta(minutes=20), 'vendor'),
+            (self.small, '2.50', start + timedelta(hours=1), 'vendor'),
+        ]:
+            Bill.objects.create(customer=customer, amount=Decimal(amount), created_at=when, created_by=created_by)
+
+    def test_columns_are_loaded_in_cents(self):
+        """Test bills are loaded as aligned arrays."""
+        columns = load_columns(self.exhibition.pk)
+        self.assertEqual(len(columns), 4)
+        self.assertEqual(sorted(columns.cents.tolist()), [250, 1000, 5000, 10000])
+        self.assertEqual(set(columns.creator_labels), {'desk', 'vendor'})
+
+    def test_report(self):
+        """Test percentiles, cohorts, top spenders and repeat visits."""
+        report = build_report(load_columns(self.exhibition.pk))
+        self.assertEqual(report['summary']['revenue'], '162.50')
+        self.assertEqual(report['summary']['customers'], 2)
+        self.assertEqual(report['amount_percentiles']['p50'], '30.00')
+        self.assertEqual(sum(row['customers'] for row in report['spend_histogram']), 2)
+
+        first_hour = report['hourly_cohorts'][0]
+        self.assertEqual(first_hour['hour'], '2025-11-01T10:00:00+00:00')
+        self.assertEqual((first_hour['bills'], first_hour['new_customers']), (2, 2))
+        self.assertEqual(first_hour['cohort_spend'], '162.50')
+
+        self.assertEqual(
+            [(row['customer_id'], row['spend']) for row in report['top_spenders']],
+            [(self.big.customer_id, '150.00'), (self.small.customer_id, '12.50')]
+        )
+        self.assertEqual(report['repeat_visits']['repeat_buyer_rate'], 1.0)
+        self.assertEqual(report['repeat_visits']['repeat_visit_rate'], 0.5)
+        self.assertEqual(report['by_creator'][0], {'created_by': 'desk', 'bills': 2, 'revenue': '150.00'})
+        self.assertIn(('summary', '', 'bills', 4), list(report_rows(report)))
+
+    def test_snapshot_is_cached_until_bills_change(self):
+        """Test the column snapshot is reused until a bill is added."""
+        columns = get_columns(self.exhibition.pk)
+        self.assertIs(get_columns(self.exhibition.pk), columns)
+        Bill.objects.create(customer=self.small, amount=1)
+        self.assertEqual(len(get_columns(self.exhibition.pk)), 5)
+
+    def test_command_writes_csv(self):
+        """Test the billing_report command exports CSV."""
+        out = StringIO()
+        call_command('billing_report', exhibition='expo', format='csv', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'section,key,metric,value')
+        self.assertIn(f'top_spenders,{self.big.customer_id},spend,150.00', lines)
+
+
+@override_settings(TICKER_POLL_SECONDS=60, TICKER_MIN_INTERVAL_SECONDS=0, TICKER_KEEPALIVE_SECONDS=60)
+class LiveTickerTest(TestCase):
+    """Test the live registration and revenue ticker."""
+
+    def setUp(self):
+        self.exhibition = Exhibition.objects.create(name="Expo", slug="expo", is_active=True)
+        self.customer = Customer.objects.create(name="Walk In", email="walk@example.com", phone="+1")
+
+    def test_snapshot(self):
+        """Test per-minute rates only count the last minute."""
+        Bill.objects.create(customer=self.customer, amount=Decimal('20.00'))
+        Bill.objects.create(
+            customer=self.customer, amount=Decimal('5.00'), created_at=timezone.now() - timedelta(hours=1)
+        )
+        snapshot = ticker_snapshot(self.exhibition.pk)
+        self.assertEqual(snapshot['registrations_per_minute'], 1)
+        self.assertEqual(snapshot['bills_per_minute'], 1)
+        self.assertEqual(snapshot['revenue_per_minute'], '20.00')
+        self.assertEqual((snapshot['bills'], snapshot['revenue']), (2, '25.00'))
+
+    def test_hub_fans_out_one_snapshot(self):
+        """Test every dashboard of an exhibition shares one computed snapshot."""
+        calls = []
+
+        def snapshot(exhibition_id):
+            calls.append(exhibition_id)
+            return {'registrations': len(calls)}
+
+        async def watch():
+            hub = TickerHub()
+            queues = [hub.subscribe(self.exhibition.pk) for _ in range(3)]
+            received = [await asyncio.wait_for(queue.get(), 5) for queue in queues]
+            for queue in queues:
+                hub.unsubscribe(self.exhibition.pk, queue)
+            await asyncio.wait_for(hub._task, 5)
+            return received, hub.subscriber_count
+
+        with patch('customers.ticker.ticker_snapshot', snapshot):
+            received, subscribers = asyncio.run(watch())
+        self.assertEqual(calls, [self.exhibition.pk])
+        self.assertEqual(received, [{'registrations': 1}] * 3)
+        self.assertEqual(subscribers, 0)
+
+    def run_app(self, headers=()):
+        """Request the stream and disconnect after the first ticker event."""
+        messages = []
+
+        async def request():
+            got_event = asyncio.Event()
+
+            async def receive():
+                await got_event.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if b'event: ticker' in message.get('body', b''):
+                    got_event.set()
+
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': '/api/live/', 'query_string': b'',
+                'headers': list(headers),
+            }
+            await asyncio.wait_for(ticker_application(scope, receive, send), 5)
+
+        asyncio.run(request())
+        return messages
+
+    def test_stream_requires_authorization(self):
+        """Test anonymous clients are refused."""
+        messages = self.run_app()
+        self.assertEqual(messages[0]['status'], 401)
+
+    def test_stream_sends_events_until_disconnect(self):
+        """Test an authorized client gets ticker events and is unsubscribed on disconnect."""
+        with patch('customers.ticker.authorize', return_value=self.exhibition.pk), \
+                patch('customers.ticker.ticker_snapshot', return_value={'registrations': 7}):
+            messages = self.run_app()
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        self.assertEqual(messages[-1]['body'], b'event: ticker\ndata: {"registrations":7}\n\n')
+
+    def test_dashboard_requires_staff(self):
+        """Test the dashboard page redirects anonymous users to the login."""
+        response = self.client.get(reverse('live_dashboard'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,289 @@
+"""
+Live registration and revenue ticker streamed as server-sent events.
+
+``ticker_application`` is a small ASGI application mounted at TICKER_PATH
+by ``exhibition_project.asgi`` (Django 4.2's own handler does not notice
+when a streaming client goes away). Every connected dashboard subscribes to
+the process's ``TickerHub``, which computes one snapshot per exhibition
+being watched and fans it out to all subscribers, so fifty open screens
+cost the same queries as one.
+
+The hub refreshes when the data changes and at least every
+TICKER_INTERVAL_SECONDS (the per-minute figures move with the clock). On
+PostgreSQL it learns about changes from ``LISTEN customers_ticker``: the
+customer and bill tables notify that channel from a statement-level
+trigger. Other databases are polled every TICKER_POLL_SECONDS instead.
+"""
+import asyncio
+import io
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .middleware import get_request_exhibition
+from .models import Bill, Customer
+from .views import _feed_authorized
+
+
+logger = logging.getLogger(__name__)
+
+TICKER_PATH = '/api/live/'
+CHANNEL = 'customers_ticker'
+
+
+def _money(amount):
+    return f'{amount or 0:.2f}'
+
+
+def ticker_snapshot(exhibition_id):
+    """Registrations, bills and revenue of the last minute and in total."""
+    now = timezone.now()
+    minute_ago = now - timedelta(minutes=1)
+    customers = Customer.objects.filter(exhibition_id=exhibition_id)
+    totals = customers.aggregate(customers=Count('pk'), bills=Sum('bill_count'), revenue=Sum('bill_total'))
+    recent_bills = Bill.objects.filter(exhibition_id=exhibition_id, created_at__gte=minute_ago).aggregate(
+        bills=Count('pk'), revenue=Sum('amount')
+    )
+    return {
+        'time': now.isoformat(),
+        'registrations_per_minute': customers.filter(created_at__gte=minute_ago).count(),
+        'bills_per_minute': recent_bills['bills'],
+        'revenue_per_minute': _money(recent_bills['revenue']),
+        'registrations': totals['customers'],
+        'bills': totals['bills'] or 0,
+        'revenue': _money(totals['revenue']),
+    }
+
+
+def authorize(scope):
+    """
+    Return the exhibition ID a request may watch, or None. Staff sessions
+    (as for the admin) or the CHANGE_FEED_TOKEN bearer token are accepted.
+    """
+    request = ASGIRequest(scope, io.BytesIO())
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    request.user = get_user(request)
+    if not _feed_authorized(request):
+        return None
+    return get_request_exhibition(request).pk
+
+
+async def _in_thread(func, *args):
+    """Run ``func`` in an executor thread and return its database connections."""
+    def run():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+class _NotifyListener:
+    """Sets ``changed`` whenever a notification arrives on CHANNEL."""
+
+    def __init__(self, connection, loop, changed):
+        self.connection = connection
+        self.loop = loop
+        self.changed = changed
+        self.closed = False
+        loop.add_reader(connection.fileno(), self._on_readable)
+
+    @classmethod
+    async def start(cls, changed):
+        """Open a dedicated LISTEN connection, or return None where unsupported."""
+        wrapper = connections[DEFAULT_DB_ALIAS]
+        if wrapper.vendor != 'postgresql':
+            return None
+
+        def connect():
+            connection = wrapper.Database.connect(**wrapper.get_connection_params())
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            return connection
+
+        try:
+            connection = await sync_to_async(connect, thread_sensitive=False)()
+        except wrapper.Database.Error:
+            logger.warning('Ticker could not LISTEN for changes; polling instead', exc_info=True)
+            return None
+        return cls(connection, asyncio.get_running_loop(), changed)
+
+    def _on_readable(self):
+        try:
+            self.connection.poll()
+        except Exception:
+            logger.warning('Ticker change listener lost its connection', exc_info=True)
+            self.close()
+            self.changed.set()
+            return
+        if self.connection.notifies:
+            self.connection.notifies.clear()
+            self.changed.set()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.remove_reader(self.connection.fileno())
+        self.connection.close()
+
+
+class TickerHub:
+    """
+    One refresh loop per process (and event loop) feeding every subscribed
+    dashboard. Each subscriber queue holds only the latest snapshot, so a
+    slow client skips updates instead of piling them up.
+    """
+
+    def __init__(self):
+        self._loop = None
+
+    def _reset(self, loop):
+        self._loop = loop
+        self._subscribers = defaultdict(set)
+        self._latest = {}
+        self._changed = asyncio.Event()
+        self._task = None
+
+    @property
+    def subscriber_count(self):
+        if self._loop is None:
+            return 0
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, exhibition_id):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._reset(loop)
+        queue = asyncio.Queue(maxsize=1)
+        if exhibition_id in self._latest:
+            queue.put_nowait(self._latest[exhibition_id])
+        else:
+            self._changed.set()  # A new exhibition gets its first snapshot right away
+        self._subscribers[exhibition_id].add(queue)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, exhibition_id, queue):
+        queues = self._subscribers.get(exhibition_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[exhibition_id]
+            self._latest.pop(exhibition_id, None)
+        if not self._subscribers:
+            self._changed.set()  # Let the loop notice and stop
+
+    def _publish(self, exhibition_id, snapshot):
+        self._latest[exhibition_id] = snapshot
+        for queue in self._subscribers.get(exhibition_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    async def _run(self):
+        listener = await _NotifyListener.start(self._changed)
+        try:
+            while self._subscribers:
+                # Changes from here on are covered by the snapshots below
+                self._changed.clear()
+                for exhibition_id in list(self._subscribers):
+                    try:
+                        snapshot = await _in_thread(ticker_snapshot, exhibition_id)
+                    except DatabaseError:
+                        logger.exception('Could not compute the ticker snapshot')
+                        continue
+                    self._publish(exhibition_id, snapshot)
+
+                if listener is not None and listener.closed:
+                    listener = await _NotifyListener.start(self._changed)
+                timeout = settings.TICKER_POLL_SECONDS if listener is None else settings.TICKER_INTERVAL_SECONDS
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                # Coalesce a burst of changes into one refresh
+                await asyncio.sleep(settings.TICKER_MIN_INTERVAL_SECONDS)
+        finally:
+            if listener is not None:
+                listener.close()
+
+
+ticker_hub = TickerHub()
+
+
+def format_event(snapshot):
+    return f'event: ticker\ndata: {json.dumps(snapshot, separators=(",", ":"))}\n\n'.encode()
+
+
+async def _send_status(send, status, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def ticker_application(scope, receive, send):
+    """ASGI application streaming ticker snapshots to one dashboard."""
+    if scope['method'] != 'GET':
+        await _send_status(send, 405, [(b'allow', b'GET')])
+        return
+    exhibition_id = await _in_thread(authorize, scope)
+    if exhibition_id is None:
+        await _send_status(send, 401, [(b'www-authenticate', b'Bearer')])
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-store'),
+            (b'x-accel-buffering', b'no'),  # Stream through nginx unbuffered
+        ],
+    })
+    queue = ticker_hub.subscribe(exhibition_id)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            snapshot = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {snapshot, disconnected},
+                timeout=settings.TICKER_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                snapshot.cancel()
+                break
+            if snapshot in done:
+                body = format_event(snapshot.result())
+            else:
+                snapshot.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        ticker_hub.unsubscribe(exhibition_id, queue)
+        disconnected.cancel()
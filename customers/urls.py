@@ -0,0 +1,17 @@
+"""
+URL configuration for customers app.
+"""
+from django.urls import path
+
+from . import views
+
+
+urlpatterns = [
+    path('api/changes/', views.change_feed, name='change_feed'),
+    path('api/reports/billing/', views.billing_report, name='billing_report'),
+    path('api/db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('api/customers/<str:customer_id>/', views.customer_lookup, name='customer_lookup'),
+    path('live/', views.live_dashboard, name='live_dashboard'),
+    path('register/', views.register_customer, name='register_customer'),
+    path('statement/<str:token>/', views.customer_statement, name='customer_statement'),
+]
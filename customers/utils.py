@@ -1,21 +1,28 @@
 """
 Utility functions for customer management.
 """
-import qrcode
+import base64
+import logging
+import time
 from io import BytesIO
 from django.core.mail import EmailMessage
 from django.conf import settings
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from .lazy import qrcode, openpyxl, openpyxl_styles, openpyxl_utils
+from .pool import start_background_thread
+from .statements import statement_url
 from datetime import datetime
+from functools import lru_cache
 
 
-def generate_qr_code(customer_id):
-    """
-    Generate QR code for customer ID.
-    Returns a BytesIO buffer containing the PNG image.
-    """
+logger = logging.getLogger(__name__)
+
+# Rendered QR codes are cached per process; they never change for an ID.
+QR_CACHE_SIZE = 2048
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def _render_qr_png(customer_id):
+    """Render the QR code for a customer ID to PNG bytes."""
     # Create QR code instance
     qr = qrcode.QRCode(
         version=1,
@@ -34,9 +41,21 @@ def generate_qr_code(customer_id):
     # Save to BytesIO
     buffer = BytesIO()
     img.save(buffer, format='PNG')
-    buffer.seek(0)
     
-    return buffer
+    return buffer.getvalue()
+
+
+def generate_qr_code(customer_id):
+    """
+    Generate QR code for customer ID.
+    Returns a BytesIO buffer containing the PNG image.
+    """
+    return BytesIO(_render_qr_png(customer_id))
+
+
+def qr_code_data_uri(customer_id):
+    """QR code for a customer ID as a PNG data URI, for inline <img> tags and JSON."""
+    return 'data:image/png;base64,' + base64.b64encode(_render_qr_png(customer_id)).decode()
 
 
 def send_customer_welcome_email(customer):
@@ -44,7 +63,6 @@ def send_customer_welcome_email(customer):
     Send welcome email to customer with their unique ID and QR code.
     Generates QR code on-the-fly without saving to database.
     """
-    print(f"=== Attempting to send email to {customer.email} ===")
     subject = f'Welcome! Your Customer ID: {customer.customer_id}'
     
     # Create email body
@@ -57,6 +75,9 @@ def send_customer_welcome_email(customer):
 
     Please save this ID or use the attached QR code for future reference.
 
+    See your bills and running total at any time:
+    {statement_url(customer.customer_id)}
+
     Best regards,
     Exhibition Team
     """
@@ -78,16 +99,39 @@ def send_customer_welcome_email(customer):
     )
     
     # Send email
+    started = time.perf_counter()
     try:
-        print(f"=== Sending email with QR code to {customer.email} ===")
-        result = email.send()
-        print(f"=== Email send result: {result} ===")
-        return True
-    except Exception as e:
-        print(f"=== ERROR sending email: {e} ===")
-        import traceback
-        traceback.print_exc()
+        email.send()
+    except Exception:
+        logger.exception(
+            'Could not send welcome email',
+            extra={
+                'customer_id': customer.customer_id,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            }
+        )
         return False
+    logger.info(
+        'Welcome email sent',
+        extra={
+            'customer_id': customer.customer_id,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+    return True
+
+
+def queue_welcome_email(customer):
+    """
+    Send the welcome email from a background thread so registration does
+    not wait on SMTP, and mark the customer once it has been sent.
+    """
+    def send():
+        if send_customer_welcome_email(customer):
+            customer.email_sent = True
+            customer.save(update_fields=['email_sent'])
+
+    return start_background_thread(send, name='welcome-email')
 
 
 def export_customers_to_excel(customers_queryset):
@@ -96,7 +140,7 @@ def export_customers_to_excel(customers_queryset):
     Returns a BytesIO object containing the Excel file.
     """
     # Create workbook and worksheets
-    wb = Workbook()
+    wb = openpyxl.Workbook()
     
     # Remove default sheet
     wb.remove(wb.active)
@@ -108,6 +152,13 @@ def export_customers_to_excel(customers_queryset):
     ws_details = wb.create_sheet("Detailed Bills")
     
     # Define styles
+    Font = openpyxl_styles.Font
+    PatternFill = openpyxl_styles.PatternFill
+    Alignment = openpyxl_styles.Alignment
+    Border = openpyxl_styles.Border
+    Side = openpyxl_styles.Side
+    get_column_letter = openpyxl_utils.get_column_letter
+
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
     header_font = Font(bold=True, color="FFFFFF", size=12)
     border = Border(
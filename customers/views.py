@@ -1,9 +1,249 @@
 """
 Views for customers app.
-Currently, all functionality is handled through Django Admin.
+Day-to-day work happens in the Django Admin; these are the endpoints used
+by other systems and the customers' own statement page.
 """
+import csv
+import json
+import os
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.utils.safestring import mark_safe
+from django.utils.crypto import constant_time_compare
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .changefeed import read_changes
+from .customer_index import customer_index
+from .analytics import build_report, get_columns, numpy_available, report_rows
+from .audit import audit_log
+from .forms import RegistrationForm
+from .models import AuditEvent, Customer, Exhibition
+from .pool import pool_stats
+from .statements import customer_id_from_token, get_statement
+from .utils import qr_code_data_uri, queue_welcome_email
+
+
+MAX_CHANGES_PER_PAGE = 5000
+
+
+def _feed_authorized(request):
+    """Staff sessions, or the CHANGE_FEED_TOKEN bearer token."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    header = request.headers.get('Authorization', '')
+    token = settings.CHANGE_FEED_TOKEN
+    return bool(token) and header.startswith('Bearer ') and constant_time_compare(header[7:], token)
+
+
+@require_GET
+def change_feed(request):
+    """
+    Cursor-paginated change feed as JSON lines.
+
+    ``GET /api/changes/?cursor=<seq>&limit=<n>[&exhibition=<slug>]`` returns
+    one JSON object per changed customer, bill or tombstone, ordered by
+    sequence. The ``X-Next-Cursor`` header holds the cursor for the next call;
+    ``X-Has-More`` is ``1`` when the page was full.
+    """
+    if not _feed_authorized(request):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+    try:
+        cursor = int(request.GET.get('cursor', 0))
+        limit = min(int(request.GET.get('limit', 1000)), MAX_CHANGES_PER_PAGE)
+    except ValueError:
+        return HttpResponseBadRequest('cursor and limit must be integers')
+    if cursor < 0 or limit < 1:
+        return HttpResponseBadRequest('cursor must be >= 0 and limit >= 1')
+
+    exhibition = None
+    if request.GET.get('exhibition'):
+        exhibition = Exhibition.objects.filter(slug=request.GET['exhibition']).first()
+        if exhibition is None:
+            return HttpResponseBadRequest('unknown exhibition')
+
+    records, next_cursor = read_changes(cursor, limit, exhibition)
+    body = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    response = HttpResponse(body, content_type='application/x-ndjson')
+    response['X-Next-Cursor'] = str(next_cursor)
+    response['X-Has-More'] = '1' if len(records) == limit else '0'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_GET
+def customer_lookup(request, customer_id):
+    """
+    Scanner lookup of a Customer ID in the exhibition being viewed.
+
+    ``GET /api/customers/<customer_id>/`` answers from the shared customer
+    index, so a scan costs no database query (staff sessions only).
+    """
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse(status=401)
+    entry = customer_index.get(customer_id, exhibition_id=request.exhibition.pk)
+    if entry is None:
+        return JsonResponse({'error': 'unknown customer ID'}, status=404)
+    response = JsonResponse({
+        'customer_id': entry.customer_id,
+        'name': entry.name,
+        'phone': entry.phone,
+        'bill_count': entry.bill_count,
+        'bill_total': str(entry.bill_total),
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_GET
+def customer_statement(request, token):
+    """
+    Public statement page (bills and running total) behind a signed link.
+
+    The body comes from the per-customer cache and carries an ETag, so a
+    phone refreshing the page is answered with 304 Not Modified until a bill
+    changes.
+    """
+    customer_id = customer_id_from_token(token)
+    statement = get_statement(customer_id) if customer_id else None
+    if statement is None:
+        raise Http404('Unknown statement')
+    etag, body = statement
+    etag = f'"{etag}"'
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = render(request, 'customers/statement.html', {'statement': mark_safe(body)})
+    response['ETag'] = etag
+    # Personal data: browsers may keep it, shared caches must not
+    patch_cache_control(response, private=True, max_age=settings.STATEMENT_MAX_AGE)
+    return response
+
+
+@require_http_methods(['GET', 'POST'])
+def register_customer(request):
+    """
+    Registration kiosk for walk-ins (staff sessions only).
+
+    ``/register/`` is a bare HTML form: submitting it registers the customer
+    in the exhibition being viewed, shows the new Customer ID and QR code and
+    puts the cursor back in an empty form. POST a JSON object with ``name``,
+    ``email`` and ``phone`` (and optionally ``receipts_opt_in`` and
+    ``register_duplicate``) to get
+    the new customer back as JSON (201), or the form errors (400).
+    """
+    wants_json = request.content_type == 'application/json'
+    if not (request.user.is_authenticated and request.user.is_staff):
+        if wants_json:
+            return JsonResponse({'error': 'staff login required'}, status=401)
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+    if wants_json and request.method != 'POST':
+        return JsonResponse({'error': 'POST the customer as JSON'}, status=405, headers={'Allow': 'POST'})
+
+    registered = None
+    form = RegistrationForm()
+    if request.method == 'POST':
+        if wants_json:
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'expected a JSON object'}, status=400)
+        else:
+            data = request.POST
+        form = RegistrationForm(data)
+        form.exhibition = request.exhibition
+        if form.is_valid():
+            registered = Customer.objects.register(
+                request.exhibition,
+                form.cleaned_data['name'],
+                form.cleaned_data['email'],
+                form.cleaned_data['phone'],
+                form.cleaned_data['receipts_opt_in']
+            )
+            audit_log.record(request.user.username, AuditEvent.ACTION_CREATE, registered, source='kiosk')
+            queue_welcome_email(registered)
+            form = RegistrationForm()
+        elif wants_json:
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+    qr_code = qr_code_data_uri(registered.customer_id) if registered else None
+    if wants_json:
+        return JsonResponse({
+            'customer_id': registered.customer_id,
+            'name': registered.name,
+            'email': registered.email,
+            'phone': registered.phone,
+            'receipts_opt_in': registered.receipts_opt_in,
+            'qr_code': qr_code,
+        }, status=201)
+    return render(request, 'customers/register.html', {
+        'form': form,
+        'registered': registered,
+        'qr_code': qr_code,
+        'exhibition': request.exhibition,
+    })
+
+
+@require_GET
+def billing_report(request):
+    """
+    Post-event billing report for the exhibition being viewed.
+
+    ``GET /api/reports/billing/[?format=csv]`` (staff sessions or the
+    CHANGE_FEED_TOKEN bearer token). The bill columns are cached per worker
+    until bills change, so repeated requests only recompute the report.
+    """
+    if not _feed_authorized(request):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    if not numpy_available():
+        return HttpResponse('Reports need numpy installed', status=501, content_type='text/plain')
+
+    exhibition = getattr(request, 'exhibition', None) or Exhibition.objects.get_active()
+    report = build_report(get_columns(exhibition.pk))
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="billing-{exhibition.slug}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['section', 'key', 'metric', 'value'])
+        writer.writerows(report_rows(report))
+    else:
+        response = JsonResponse(report)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_GET
+def live_dashboard(request):
+    """
+    Full-screen revenue and registration ticker for the exhibition being
+    viewed (staff sessions only). The figures arrive from the /api/live/
+    event stream, which only the ASGI application serves.
+    """
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+    return render(request, 'customers/live.html', {'exhibition': request.exhibition})
+
 
-# All views are handled through Django Admin
-# This file is here for future API endpoints if needed
+@require_GET
+def db_pool_stats(request):
+    """
+    Connection pool counters of the worker process answering the request.
 
+    ``GET /api/db-pool/`` (staff sessions or the CHANGE_FEED_TOKEN bearer
+    token). Each gunicorn worker has its own pool, so monitoring should
+    sample it repeatedly and group by ``pid``.
+    """
+    if not _feed_authorized(request):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    response = JsonResponse({'pid': os.getpid(), 'pools': pool_stats()})
+    response['Cache-Control'] = 'no-store'
+    return response
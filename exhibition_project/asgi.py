@@ -1,5 +1,9 @@
 """
 ASGI config for exhibition_project.
+
+Serves the whole site, and in addition streams the live ticker
+(``customers.ticker``) at /api/live/, which needs a long-lived connection
+per dashboard. Run with e.g. ``uvicorn exhibition_project.asgi:application``.
 """
 
 import os
@@ -8,5 +12,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exhibition_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imports models, so only after Django is set up
+from customers.ticker import TICKER_PATH, ticker_application  # noqa: E402
+
 
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == TICKER_PATH:
+        await ticker_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
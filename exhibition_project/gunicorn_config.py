@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration for exhibition_project.
+Usage: gunicorn -c python:exhibition_project.gunicorn_config exhibition_project.wsgi:application
+
+The application is preloaded in the master and warmed up once before the
+workers fork, so every worker starts with heavy modules imported and caches
+populated. Each worker then opens its own database connection before it
+accepts its first request.
+"""
+import os
+import time
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = True
+# Requests are logged as JSON by customers.middleware.RequestLogMiddleware
+accesslog = None
+errorlog = '-'
+
+_started = time.perf_counter()
+
+
+def when_ready(server):
+    """Warm up the preloaded application in the master, before forking."""
+    from django.db import DatabaseError
+    from customers.startup import warmup
+
+    server.log.info(f'[startup] master ready after {(time.perf_counter() - _started) * 1000:.0f} ms')
+    try:
+        warmup(log=server.log.info)
+    except DatabaseError as e:
+        server.log.warning(f'[startup] warmup skipped, database unavailable: {e}')
+
+
+def post_fork(server, worker):
+    """Connect the new worker to the database before it accepts requests."""
+    from django.db import DatabaseError
+    from customers.startup import connect_worker
+
+    try:
+        connect_worker(log=server.log.info)
+    except DatabaseError as e:
+        server.log.warning(f'[startup] worker {worker.pid} could not connect: {e}')
+
+
+def worker_exit(server, worker):
+    """Write queued audit events before the worker goes away."""
+    from customers.audit import audit_log
+
+    audit_log.stop()
@@ -4,6 +4,7 @@ Django settings for exhibition_project.
 
 from pathlib import Path
 import os
+import sys
 import environ
 import dj_database_url
 
@@ -41,12 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'customers.middleware.RequestLogMiddleware',  # Request IDs and structured request log
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'customers.middleware.ExhibitionMiddleware',  # Scope queries to the active exhibition
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,6 +78,17 @@ WSGI_APPLICATION = 'exhibition_project.wsgi.application'
 # Priority: DATABASE_URL (Railway/Heroku) > Individual DB vars (local/VPS)
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# PostgreSQL connections come from a bounded per-worker pool (customers.pool).
+# Django returns them to the pool at the end of each request, so CONN_MAX_AGE is 0.
+DB_POOL = {
+    'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=5),
+    # Seconds to wait for a free connection before the request fails
+    'TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),
+    # Idle connections unused this long are checked with SELECT 1 before reuse
+    'HEALTH_CHECK_SECONDS': env.int('DB_POOL_HEALTH_CHECK_SECONDS', default=30),
+    'MAX_LIFETIME': env.int('DB_POOL_MAX_LIFETIME', default=3600),
+}
+
 if DATABASE_URL:
     # Railway, Heroku, or any platform that provides DATABASE_URL
     DATABASES = {
@@ -97,6 +111,14 @@ else:
         }
     }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'customers.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'POOL': DB_POOL,
+    })
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -130,6 +152,9 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cold archive files written by the archive_data command
+ARCHIVE_ROOT = env('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -142,6 +167,107 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@exhibition.com')
 
+# Startup: number of recent customers whose QR codes are rendered before workers fork
+STARTUP_WARM_QR_CODES = env.int('STARTUP_WARM_QR_CODES', default=200)
+
+# Largest selection the "Print badges" admin actions render (serially, within the request
+# timeout); larger runs go through the generate_badges command
+BADGE_ADMIN_MAX_CUSTOMERS = env.int('BADGE_ADMIN_MAX_CUSTOMERS', default=600)
+
+# Country code (digits only, e.g. '91') assumed for phone numbers entered without one
+PHONE_DEFAULT_COUNTRY_CODE = env('PHONE_DEFAULT_COUNTRY_CODE', default='')
+
+# Audit log: events are queued in-process and written in batches
+AUDIT_LOG_BACKGROUND = env.bool('AUDIT_LOG_BACKGROUND', default=True)
+AUDIT_LOG_QUEUE_SIZE = env.int('AUDIT_LOG_QUEUE_SIZE', default=10000)
+AUDIT_LOG_BATCH_SIZE = env.int('AUDIT_LOG_BATCH_SIZE', default=200)
+AUDIT_LOG_FLUSH_INTERVAL = env.float('AUDIT_LOG_FLUSH_INTERVAL', default=2.0)
+
+# Change feed: changes younger than this are held back so no lower sequence can still appear
+CHANGE_FEED_SETTLE_SECONDS = env.int('CHANGE_FEED_SETTLE_SECONDS', default=5)
+# Bearer token for downstream systems pulling /api/changes/ (staff sessions work too)
+CHANGE_FEED_TOKEN = env('CHANGE_FEED_TOKEN', default='')
+
+# Shared memory-mapped customer index (built by build_customer_index) and how often
+# workers look for a rebuilt file and reload the overlay of recent changes
+CUSTOMER_INDEX_PATH = env('CUSTOMER_INDEX_PATH', default=str(BASE_DIR / 'customer_index.bin'))
+CUSTOMER_INDEX_REFRESH_SECONDS = env.float('CUSTOMER_INDEX_REFRESH_SECONDS', default=2.0)
+
+# Cache shared by all workers on a host (set CACHE_URL, e.g. redis://..., for several hosts)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache:///tmp/exhibition-cache'),
+}
+
+# Customer statement page: how long rendered statements stay cached (they are also
+# dropped whenever a bill changes) and how long phones may reuse a page without asking
+STATEMENT_CACHE_SECONDS = env.int('STATEMENT_CACHE_SECONDS', default=3600)
+STATEMENT_MAX_AGE = env.int('STATEMENT_MAX_AGE', default=30)
+
+# Receipt digests: new bills of opted-in customers are collected for this long and then
+# mailed as one digest by send_receipt_digests (run it every minute from cron)
+RECEIPT_DIGEST_WINDOW_SECONDS = env.int('RECEIPT_DIGEST_WINDOW_SECONDS', default=900)
+# Customers loaded and mailed per batch (all batches of a run share one SMTP connection)
+RECEIPT_DIGEST_BATCH_SIZE = env.int('RECEIPT_DIGEST_BATCH_SIZE', default=100)
+# A digest that fails is retried after this delay, doubled on every further failure,
+# and dropped after RECEIPT_DIGEST_MAX_ATTEMPTS failures
+RECEIPT_DIGEST_RETRY_SECONDS = env.int('RECEIPT_DIGEST_RETRY_SECONDS', default=300)
+RECEIPT_DIGEST_MAX_ATTEMPTS = env.int('RECEIPT_DIGEST_MAX_ATTEMPTS', default=6)
+
+# Live ticker (/api/live/, served by the ASGI app): snapshots are refreshed on every change
+# (PostgreSQL LISTEN/NOTIFY) and at least this often, as the per-minute rates move with time
+TICKER_INTERVAL_SECONDS = env.float('TICKER_INTERVAL_SECONDS', default=10.0)
+# Refresh interval on databases without LISTEN/NOTIFY (or while it is unavailable)
+TICKER_POLL_SECONDS = env.float('TICKER_POLL_SECONDS', default=3.0)
+# Minimum gap between refreshes, so a burst of changes costs one set of queries
+TICKER_MIN_INTERVAL_SECONDS = env.float('TICKER_MIN_INTERVAL_SECONDS', default=1.0)
+# Comment lines sent on an idle stream to keep proxies from closing it
+TICKER_KEEPALIVE_SECONDS = env.float('TICKER_KEEPALIVE_SECONDS', default=15.0)
+
+# Logging: JSON lines on stderr (away from management command output), written by a
+# background thread (customers.logs). Test runs only log warnings unless LOG_LEVEL is set
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+LOG_LEVEL = env('LOG_LEVEL', default='WARNING' if TESTING else 'INFO')
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+# Fraction of ordinary requests that are logged; errors and slow requests always are
+LOG_REQUEST_SAMPLE_RATE = env.float('LOG_REQUEST_SAMPLE_RATE', default=1.0)
+LOG_SLOW_REQUEST_MS = env.int('LOG_SLOW_REQUEST_MS', default=1000)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'customers.logs.JsonFormatter'},
+    },
+    'filters': {
+        'sample_requests': {
+            '()': 'customers.logs.SamplingFilter',
+            'rate': LOG_REQUEST_SAMPLE_RATE,
+            'slow_ms': LOG_SLOW_REQUEST_MS,
+        },
+    },
+    'handlers': {
+        'background': {
+            '()': 'customers.logs.BackgroundHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'formatter': 'json',
+        },
+    },
+    'root': {
+        'handlers': ['background'],
+        'level': LOG_LEVEL,
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['background'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'customers.requests': {
+            'filters': ['sample_requests'],
+        },
+    },
+}
+
 # Application URL
 APP_URL = env('APP_URL', default='http://localhost:8000')
 
@@ -2,12 +2,13 @@
 URL configuration for exhibition_project.
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('', include('customers.urls')),
 ]
 
 if settings.DEBUG:
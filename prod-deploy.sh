@@ -42,12 +42,8 @@ echo "⏳ Waiting for database to be ready..."
 sleep 10
 
 echo ""
-echo "🔄 Running database migrations..."
-docker-compose -f docker-compose.prod.yml run --rm web python manage.py migrate
-
-echo ""
-echo "📁 Collecting static files..."
-docker-compose -f docker-compose.prod.yml run --rm web python manage.py collectstatic --noinput
+echo "🔄 Running migrations and collecting static files (only when needed)..."
+docker-compose -f docker-compose.prod.yml run --rm web python manage.py startup
 
 echo ""
 echo "🌐 Starting all services..."
@@ -20,12 +20,8 @@ echo "📦 Rebuilding Docker images..."
 docker-compose -f docker-compose.prod.yml build
 
 echo ""
-echo "🔄 Running migrations..."
-docker-compose -f docker-compose.prod.yml run --rm web python manage.py migrate
-
-echo ""
-echo "📁 Collecting static files..."
-docker-compose -f docker-compose.prod.yml run --rm web python manage.py collectstatic --noinput
+echo "🔄 Running migrations and collecting static files (only when needed)..."
+docker-compose -f docker-compose.prod.yml run --rm web python manage.py startup
 
 echo ""
 echo "♻️  Restarting services..."